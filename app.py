@@ -1,8 +1,8 @@
 import streamlit as st
-import asyncio
+import time
 import pandas as pd
 import matplotlib.pyplot as plt
-from simulation import run_simulation
+from job_runner import JobExecutor, JobRejected
 
 st.set_page_config(page_title="CrowdSim AI", layout="wide")
 
@@ -45,29 +45,74 @@ st.sidebar.divider()
 st.sidebar.subheader("Agent Configuration")
 num_agents = st.sidebar.slider("Number of Agents", min_value=3, max_value=25, value=5)
 age_range = st.sidebar.slider("Age Range", min_value=19, max_value=60, value=(19, 60))
-
-# Combine document and text area context
-full_context = f"{document_content}\n\n{additional_context}".strip()
+panel_mix = st.sidebar.selectbox("Panel Mix", ["Random", "Match age distribution", "Match occupation distribution"])
+panel_seed = st.sidebar.number_input("Panel Seed (0 = random)", min_value=0, value=0, step=1,
+    help="Use the same non-zero seed to get the same panel again.")
+sampling = {
+    "Random": None,
+    "Match age distribution": {"method": "stratified", "by": "age_band"},
+    "Match occupation distribution": {"method": "stratified", "by": "occupation"},
+}[panel_mix]
+max_concurrency = st.sidebar.slider("Parallel Agent Calls", min_value=1, max_value=25, value=5,
+    help="How many agents may answer at the same time. 1 runs agents one after another.")
+
+@st.cache_resource
+def get_job_executor():
+    """One executor per server process, shared by every browser session and rerun."""
+    return JobExecutor()
+
+executor = get_job_executor()
 
 if st.sidebar.button("Run Simulation"):
-    with st.spinner("Running simulation... This may take a moment."):
-        # Run the async simulation loop
-        try:
-            results = asyncio.run(run_simulation(
-                pitch_inputs, 
-                full_context, 
-                num_agents=num_agents, 
-                min_age=age_range[0], 
-                max_age=age_range[1]
-            ))
-            
-            if "error" in results:
-                st.error(f"Simulation failed: {results['error']}")
-            else:
-                st.session_state['results'] = results
-                st.success("Simulation Complete!")
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
+    try:
+        job_id = executor.submit(
+            pitch_inputs, 
+            additional_context.strip(), 
+            document=document_content or None,
+            num_agents=num_agents, 
+            min_age=age_range[0], 
+            max_age=age_range[1],
+            max_concurrency=max_concurrency,
+            sampling=sampling,
+            seed=panel_seed or None
+        )
+        # Remember the job across reruns and page reloads
+        st.session_state['job_id'] = job_id
+        st.query_params['job'] = job_id
+        st.session_state.pop('results', None)
+    except JobRejected as e:
+        st.error(f"Simulation not started: {e}")
+
+job_id = st.session_state.get('job_id') or st.query_params.get('job')
+job = executor.get(job_id) if job_id else None
+if job is not None and job_id != st.session_state.get('shown_job_id'):
+    if job["status"] in ("queued", "running"):
+        progress = job["progress"]
+        done = progress["responses"] / max(1, progress["expected_responses"])
+        st.progress(min(done, 1.0), text=f"Simulation {job['status']}: {progress['responses']} of "
+                    f"{progress['expected_responses']} answers, {progress['questions_done']} of {progress['questions']} questions analyzed")
+        for event in job["events"]:
+            if event["type"] == "AgentResponse":
+                st.markdown(f"**Q{event['question_index'] + 1} · {event['agent']}:** {event['response']}")
+            elif event["type"] == "QuestionSentiment":
+                st.info(f"Q{event['question_index'] + 1} sentiment: {event['score']}/10 ({event['label']})")
+            elif event["type"] == "BudgetExceeded":
+                st.warning(f"Stopping early: {event['reason']}")
+        if st.button("Cancel Simulation"):
+            executor.cancel(job_id)
+        # Poll until the job finishes
+        time.sleep(1)
+        st.rerun()
+    elif job["status"] == "done":
+        st.session_state['results'] = job["result"]
+        st.session_state['shown_job_id'] = job_id
+        st.success("Simulation Complete!")
+    elif job["status"] == "error":
+        st.session_state['shown_job_id'] = job_id
+        st.error(f"Simulation failed: {job['error']}")
+    else:
+        st.session_state['shown_job_id'] = job_id
+        st.warning("Simulation cancelled.")
 
 # --- Dashboard Section ---
 if 'results' in st.session_state:
@@ -85,6 +130,19 @@ if 'results' in st.session_state:
     with col3:
         st.metric("Questions Analyzed", len(results.get("question_details", [])))
         
+    if "stopped_early" in results:
+        st.warning(f"Stopped early: {results['stopped_early']['reason']} "
+                   f"({results['stopped_early']['questions_skipped']} question(s) skipped).")
+    if "usage" in results:
+        usage = results["usage"]["total"]
+        u_col1, u_col2, u_col3 = st.columns(3)
+        with u_col1:
+            st.metric("LLM Calls", usage["calls"])
+        with u_col2:
+            st.metric("Tokens", f"{usage['total_tokens']:,}")
+        with u_col3:
+            st.metric("Estimated Cost", f"${usage['cost_usd']:.4f}")
+
     # Quality Metrics Row
     if "quality_metrics" in results:
         st.subheader("🏆 Quality Assurance Scores")
@@ -96,6 +154,10 @@ if 'results' in st.session_state:
             st.metric("Coherence", f"{metrics.get('coherence', 0)}/5")
         with q_col3:
             st.metric("Persona Fidelity", f"{metrics.get('fidelity', 0)}/5")
+        if "evaluation" in results:
+            tiers = results["evaluation"]["tiers"]
+            st.caption(f"Scored by {tiers['local']} local heuristics, {tiers['judge']} LLM judge calls for uncertain "
+                       f"responses and {tiers['audit']} audit judgments.")
 
     # Charts
     st.subheader("Sentiment Trend")
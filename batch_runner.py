@@ -0,0 +1,180 @@
+"""
+Batch runner for many simulation variants.
+
+A matrix file lists the values to combine; every combination is one variant:
+
+    {
+        "questions": [["What do you think of X?", "Would you pay $10?"], ["What about Y?"]],
+        "contexts": ["", "Launches in May."],
+        "age_ranges": [[19, 35], [36, 60]],
+        "panel_sizes": [5, 25],
+        "options": {"max_concurrency": 4, "sampling": {"method": "stratified"}, "token_budget": 200000}
+    }
+
+Variants run across a process pool. Each worker gets an equal share of the LLM rate
+budget, and all of them share the on-disk response cache. Results go to one JSONL
+file with a row per variant, including its token usage and cost (a `token_budget` or
+`cost_budget` option caps each variant). Failed variants are retried on their own, and
+re-running the same command skips the variants that already succeeded.
+
+    python batch_runner.py matrix.json --out batch_results.jsonl --workers 4
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def expand_matrix(matrix):
+    """Returns the variants of `matrix`, each with a stable `variant_id`."""
+    question_sets = [[q] if isinstance(q, str) else list(q) for q in matrix.get("questions", [])]
+    variants = []
+    for questions, context, age_range, panel_size in itertools.product(
+            question_sets, matrix.get("contexts", [""]), matrix.get("age_ranges", [[19, 60]]),
+            matrix.get("panel_sizes", [5])):
+        variant = {"questions": questions, "context": context, "min_age": age_range[0],
+                   "max_age": age_range[1], "num_agents": panel_size}
+        variant["variant_id"] = hashlib.sha256(json.dumps(variant, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        variants.append(variant)
+    return variants
+
+
+def split_budget(workers):
+    """Environment giving each of `workers` processes an equal share of the rate limits."""
+    env = {
+        "LLM_REQUESTS_PER_MINUTE": str(float(os.getenv("LLM_REQUESTS_PER_MINUTE", "15")) / workers),
+        "LLM_TOKENS_PER_MINUTE": str(float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000")) / workers),
+    }
+    limits = os.getenv("LLM_RATE_LIMITS")
+    if limits:
+        try:
+            env["LLM_RATE_LIMITS"] = json.dumps({
+                model: {key: value / workers for key, value in budget.items()}
+                for model, budget in json.loads(limits).items()
+            })
+        except (json.JSONDecodeError, AttributeError, TypeError):
+            pass    # the limiter warns about it
+    return env
+
+
+def _init_worker(env):
+    # Runs before the worker imports llm_client / rate_limiter, which read the budget at import
+    os.environ.update(env)
+    sys.path.insert(0, REPO_DIR)
+
+
+def run_variant(variant, options):
+    """Runs one variant in a worker process and returns its result row."""
+    import asyncio
+    from simulation import run_simulation
+
+    start = time.perf_counter()
+    try:
+        results = asyncio.run(run_simulation(
+            variant["questions"], variant["context"], num_agents=variant["num_agents"],
+            min_age=variant["min_age"], max_age=variant["max_age"], **options))
+    except Exception as e:
+        results = {"error": f"{type(e).__name__}: {e}"}
+    row = dict(variant, wall_time=round(time.perf_counter() - start, 3))
+    if "error" in results:
+        return dict(row, status="error", error=results["error"])
+    return dict(
+        row,
+        status="ok",
+        session_id=results.get("session_id"),
+        agents=results.get("agents", []),
+        overall_sentiment=results.get("overall_sentiment"),
+        quality_metrics=results.get("quality_metrics", {}),
+        usage=results.get("usage", {}).get("total"),
+        stopped_early=results.get("stopped_early"),
+        question_details=[{k: qd[k] for k in ("question", "score", "label", "summary")}
+                          for qd in results.get("question_details", [])],
+    )
+
+
+def load_rows(path):
+    """The latest row per variant_id in an existing results file."""
+    rows = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    row = json.loads(line)
+                    rows[row["variant_id"]] = row
+    return rows
+
+
+def run_batch(matrix, out_path, workers=2, retries=2, options=None):
+    """
+    Runs every variant of `matrix` not already in `out_path` with status "ok".
+    Each finished attempt is appended to `out_path` as it completes, so an interrupted
+    batch loses at most the variants in flight; at the end the file is rewritten with
+    one row per variant. Returns the rows in matrix order.
+    """
+    variants = expand_matrix(matrix)
+    options = dict(matrix.get("options", {}), **(options or {}))
+    rows = load_rows(out_path)
+    pending = [v for v in variants if rows.get(v["variant_id"], {}).get("status") != "ok"]
+    print(f"{len(variants)} variants, {len(variants) - len(pending)} already done, {len(pending)} to run")
+
+    attempts = {v["variant_id"]: rows.get(v["variant_id"], {}).get("attempts", 0) for v in pending}
+    tries = dict.fromkeys(attempts, 0)     # this invocation only; retries start over on resume
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(split_budget(workers),)) as pool, open(out_path, "a", encoding="utf-8") as out:
+        running = {pool.submit(run_variant, v, options): v for v in pending}
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                variant = running.pop(future)
+                try:
+                    row = future.result()
+                except Exception as e:
+                    # The worker process itself died
+                    row = dict(variant, status="error", error=f"{type(e).__name__}: {e}")
+                attempts[variant["variant_id"]] += 1
+                tries[variant["variant_id"]] += 1
+                row["attempts"] = attempts[variant["variant_id"]]
+                rows[variant["variant_id"]] = row
+                out.write(json.dumps(row) + "\n")
+                out.flush()
+                print(f"  {variant['variant_id']}: {row['status']} (attempt {row['attempts']})")
+                if row["status"] != "ok" and tries[variant["variant_id"]] <= retries:
+                    running[pool.submit(run_variant, variant, options)] = variant
+
+    ordered = [rows[v["variant_id"]] for v in variants if v["variant_id"] in rows]
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for row in ordered:
+            f.write(json.dumps(row) + "\n")
+    os.replace(tmp_path, out_path)
+    failed = sum(1 for row in ordered if row["status"] != "ok")
+    print(f"Batch results written to {out_path} ({len(ordered) - failed} ok, {failed} failed)")
+    return ordered
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a matrix of simulation variants.")
+    parser.add_argument("matrix", help="JSON file with questions, contexts, age_ranges, panel_sizes, options")
+    parser.add_argument("--out", default="batch_results.jsonl")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes (the rate budget is split between them)")
+    parser.add_argument("--retries", type=int, default=2, help="Extra attempts for a failed variant")
+    parser.add_argument("--backend", choices=["gemini", "mock"], help="LLM backend (default: LLM_BACKEND or gemini)")
+    args = parser.parse_args()
+    if args.backend:
+        os.environ["LLM_BACKEND"] = args.backend
+
+    with open(args.matrix, "r", encoding="utf-8") as f:
+        matrix = json.load(f)
+    run_batch(matrix, args.out, workers=args.workers, retries=args.retries)
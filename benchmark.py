@@ -0,0 +1,214 @@
+"""
+End-to-end benchmark for run_simulation.
+
+Sweeps panel size, question count and context size, runs each case in a fresh
+process (so peak RSS is per case) against the mock LLM backend by default, and
+writes one JSON file per sweep. Two result files can be compared with --compare.
+
+    python benchmark.py --agents 5,25,100,500 --questions 1,3 --context 0,5000 --out bench.json
+    python benchmark.py --compare bench_before.json bench_after.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+QUESTIONS = [
+    "What do you think of a subscription service for coffee beans?",
+    "Would you pay $15 a month for it?",
+    "What would make you cancel the subscription?",
+    "How does it compare to buying beans at the supermarket?",
+    "Would you recommend it to a friend?",
+    "What should the packaging look like?",
+    "Which feature matters most to you?",
+]
+
+
+def make_personas(count, seed=0):
+    """Builds `count` synthetic personas by varying the ones in personas.json."""
+    with open(os.path.join(REPO_DIR, "personas.json"), "r") as f:
+        base = json.load(f)
+    rng = random.Random(seed)
+    personas = []
+    for i in range(count):
+        persona = dict(base[i % len(base)])
+        persona["name"] = f"{persona['name']}_{i}"
+        persona["age"] = rng.randint(19, 60)
+        personas.append(persona)
+    return personas
+
+
+def make_context(chars):
+    if chars <= 0:
+        return ""
+    with open(os.path.join(REPO_DIR, "dataset.txt"), "r", encoding="utf-8", errors="replace") as f:
+        text = f.read() or "Lorem ipsum dolor sit amet. "
+    return (text * (chars // len(text) + 1))[:chars]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_case(case, options):
+    """Runs one benchmark case. Meant to be called in a fresh worker process."""
+    os.environ["LLM_BACKEND"] = options["backend"]
+    os.environ["MOCK_LLM_LATENCY"] = options["latency"]
+    os.environ["LLM_CACHE"] = "1" if options["cache"] else "0"
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(options["rpm"])
+    sys.path.insert(0, REPO_DIR)
+
+    # Sessions and logs go to a scratch directory, not the repo
+    workdir = tempfile.mkdtemp(prefix="crowdsim_bench_")
+    os.chdir(workdir)
+    personas_file = os.path.join(workdir, "personas.json")
+    with open(personas_file, "w") as f:
+        json.dump(make_personas(case["agents"], options["seed"]), f)
+
+    import llm_client
+    from simulation import run_simulation
+
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(case["questions"])]
+    start = time.perf_counter()
+    results = asyncio.run(run_simulation(
+        questions,
+        make_context(case["context_chars"]),
+        num_agents=case["agents"],
+        max_concurrency=options["max_concurrency"],
+        personas_file=personas_file,
+    ))
+    wall_time = time.perf_counter() - start
+
+    if "error" in results:
+        return dict(case, status="error", error=results["error"])
+
+    responses = len(results["agents"]) * len(results["question_details"])
+    call_stats = llm_client.call_stats()
+    model_calls = sum(c["model_calls"] for c in call_stats.values())
+    return dict(
+        case,
+        status="ok",
+        wall_time=round(wall_time, 4),
+        phase_timings=results.get("phase_timings", {}),
+        peak_rss_mb=peak_rss_mb(),
+        responses=responses,
+        llm_calls=call_stats,
+        llm_calls_per_response=round(model_calls / responses, 3) if responses else 0,
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def run_sweep(args):
+    options = {
+        "backend": args.backend,
+        "latency": args.latency,
+        "cache": args.cache,
+        "rpm": args.rpm,
+        "seed": args.seed,
+        "max_concurrency": args.max_concurrency,
+    }
+    cases = [
+        {"agents": a, "questions": q, "context_chars": c, "repeat": r}
+        for a in args.agents for q in args.questions for c in args.context for r in range(args.repeat)
+    ]
+
+    rows = []
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        print(f"Running {case}...")
+        # One process per case so peak RSS and module-level state never leak between cases
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                row = pool.submit(run_case, case, options).result()
+            except Exception as e:
+                row = dict(case, status="error", error=str(e))
+        print(f"  -> {row.get('status')} {row.get('wall_time', '')}s")
+        rows.append(row)
+
+    output = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "options": options,
+        "results": rows,
+    }
+    with open(args.out, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Benchmark results written to {args.out}")
+
+
+def summarize(path):
+    """Median wall time and phase split per (agents, questions, context) case."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    grouped = {}
+    for row in data["results"]:
+        if row.get("status") == "ok":
+            grouped.setdefault((row["agents"], row["questions"], row["context_chars"]), []).append(row)
+    return data.get("commit"), {
+        key: {
+            "wall_time": statistics.median(r["wall_time"] for r in rows),
+            "peak_rss_mb": max(r["peak_rss_mb"] for r in rows),
+            "llm_calls_per_response": rows[0]["llm_calls_per_response"],
+            "phases": {p: statistics.median(r["phase_timings"].get(p, 0) for r in rows) for p in rows[0]["phase_timings"]},
+        }
+        for key, rows in grouped.items()
+    }
+
+
+def compare(before_path, after_path):
+    before_commit, before = summarize(before_path)
+    after_commit, after = summarize(after_path)
+    print(f"Comparing {before_commit or before_path} -> {after_commit or after_path}")
+    print(f"{'agents':>7} {'questions':>9} {'context':>8} {'before(s)':>10} {'after(s)':>10} {'change':>8}  calls/resp")
+    for key in sorted(set(before) & set(after)):
+        b, a = before[key], after[key]
+        change = (a["wall_time"] - b["wall_time"]) / b["wall_time"] * 100 if b["wall_time"] else 0.0
+        print(f"{key[0]:>7} {key[1]:>9} {key[2]:>8} {b['wall_time']:>10.3f} {a['wall_time']:>10.3f} {change:>+7.1f}%"
+              f"  {b['llm_calls_per_response']} -> {a['llm_calls_per_response']}")
+        for phase in a["phases"]:
+            print(f"{'':>27} {phase:<14} {b['phases'].get(phase, 0):>8.3f} -> {a['phases'][phase]:.3f}")
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark run_simulation end to end.")
+    parser.add_argument("--agents", type=int_list, default=[5, 25, 100, 500], help="Panel sizes, e.g. 5,25,100,500")
+    parser.add_argument("--questions", type=int_list, default=[1, 3], help="Question counts")
+    parser.add_argument("--context", type=int_list, default=[0, 5000], help="Context sizes in characters")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case")
+    parser.add_argument("--max_concurrency", type=int, default=1, help="Passed to run_simulation")
+    parser.add_argument("--backend", choices=["mock", "gemini"], default="mock")
+    parser.add_argument("--latency", default="0.05", help="Mock latency spec (see mock_llm.parse_latency)")
+    parser.add_argument("--rpm", type=int, default=1000000, help="Requests/min budget for the rate limiter (gemini backend; mock calls are never limited)")
+    parser.add_argument("--cache", action="store_true", help="Enable the LLM response cache")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        run_sweep(args)
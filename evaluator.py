@@ -1,15 +1,88 @@
 import google.generativeai as genai
+import asyncio
 import json
 import os
+import random
+import re
 from dotenv import load_dotenv
-from TinyTroupe.utils import generate_content_with_retry
+import llm_client
+from llm_client import generate_content_async
+from retrieval import tokenize
 
 load_dotenv()
 
+# "cascade": local heuristics, the LLM judge for uncertain responses and an audit sample;
+# "llm": the judge for every response; "local": heuristics only
+EVAL_MODE = os.getenv("EVAL_MODE", "cascade")
+# Responses whose mean heuristic score falls in this band go to the judge
+EVAL_UNCERTAIN_BAND = tuple(float(v) for v in os.getenv("EVAL_UNCERTAIN_BAND", "2.5,3.5").split(","))
+# Share of the remaining responses also sent to the judge, to check the heuristics
+EVAL_AUDIT_RATE = float(os.getenv("EVAL_AUDIT_RATE", "0.1"))
+EVAL_AUDIT_SEED = int(os.getenv("EVAL_AUDIT_SEED", "0"))
+
+CRITERIA = ("relevance", "coherence", "fidelity")
+# Words that show the response takes a position
+OPINION_WORDS = {"think", "like", "love", "hate", "prefer", "buy", "pay", "try", "use", "want", "need",
+                 "worth", "price", "expensive", "cheap", "yes", "no", "not", "never", "maybe", "probably",
+                 "definitely", "convinced", "interested", "recommend", "good", "bad", "great", "useful"}
+# Question boilerplate that says nothing about the topic
+QUESTION_WORDS = {"think", "about", "feel", "opinion", "thoughts", "could", "should", "there"}
+FIRST_PERSON = {"i", "i'm", "i'd", "i've", "i'll", "me", "my", "mine", "we", "our"}
+
+
+def _stems(words):
+    # Crude stemming: "prices"/"priced"/"price" share their first five letters
+    return {w[:5] for w in words if len(w) > 2}
+
+
+def heuristic_scores(question, response, persona):
+    """
+    Scores a response 1-5 on each criterion without an LLM:
+    relevance from the question's content words found in the answer and whether it takes
+    a position, coherence from length, word variety and sentence form, and fidelity from
+    a first-person voice and echoes of the persona's own words. `overall` is the unrounded
+    mean, used to decide whether the judge should look at the response.
+    """
+    text = str(response or "").strip()
+    words = re.findall(r"[a-z0-9$']+", text.lower())
+    answer = _stems(tokenize(text))
+    if not words:
+        return {"relevance": 1, "coherence": 1, "fidelity": 1, "overall": 1.0}
+
+    topic = _stems(w for w in tokenize(question) if w not in QUESTION_WORDS | OPINION_WORDS)
+    overlap = len(topic & answer) / len(topic) if topic else 0.5
+    relevance = 1 + 3 * overlap + (1 if OPINION_WORDS & set(words) else 0)
+
+    length = 1.0 if 6 <= len(words) <= 200 else len(words) / 6 if len(words) < 6 else max(0.3, 200 / len(words))
+    variety = min(1.0, len(set(words)) / len(words) / 0.5)
+    sentence = 1.0 if text[-1] in ".!?\"'" else 0.75
+    coherence = 1 + 4 * length * variety * sentence
+
+    persona_words = _stems(tokenize(persona or ""))
+    echo = min(1.0, len(persona_words & answer) / min(3, len(persona_words))) if persona_words else 0.0
+    fidelity = 2 + (1.5 if FIRST_PERSON & set(words) else 0) + 1.5 * echo
+
+    raw = {"relevance": relevance, "coherence": coherence, "fidelity": fidelity}
+    scores = {key: int(min(5, max(1, round(value)))) for key, value in raw.items()}
+    scores["overall"] = round(sum(raw.values()) / len(raw), 2)
+    return scores
+
+
 class Evaluator:
-    def __init__(self):
+    def __init__(self, use_cache=True, mode=EVAL_MODE, uncertain_band=EVAL_UNCERTAIN_BAND,
+                 audit_rate=EVAL_AUDIT_RATE, audit_seed=EVAL_AUDIT_SEED):
+        if mode not in ("cascade", "llm", "local"):
+            print(f"WARNING: Unknown evaluation mode '{mode}', using 'cascade'.")
+            mode = "cascade"
+        self.use_cache = use_cache
+        self.mode = mode
+        self.uncertain_band = uncertain_band
+        self.audit_rate = audit_rate
+        self.audit_seed = audit_seed
         api_key = os.getenv("GEMINI_API_KEY")
-        if api_key:
+        if llm_client.get_backend() == "mock":
+            self.model = llm_client.get_model('gemini-2.0-flash-lite-preview-02-05')
+        elif api_key:
             genai.configure(api_key=api_key)
             self.model = genai.GenerativeModel('gemini-2.0-flash-lite-preview-02-05')
         else:
@@ -41,15 +114,109 @@ class Evaluator:
         """
         
         try:
-            result = generate_content_with_retry(self.model, prompt)
-            text = result.text.strip()
-            if text.startswith("```json"):
-                text = text[7:-3]
-            elif text.startswith("```"):
-                text = text[3:-3]
-            
-            scores = json.loads(text)
+            result = await generate_content_async(self.model, prompt, kind="judge", use_cache=self.use_cache)
+            scores = self._parse_json(result.text)
             return scores
         except Exception as e:
             print(f"Evaluation failed: {e}")
             return {"relevance": 3, "coherence": 3, "fidelity": 3} # Default fallback
+
+    async def evaluate_batch(self, question, items, chunk_size=10):
+        """
+        Evaluates several responses to the same question with one judge call per chunk.
+        `items` is a list of {"response": ..., "persona": ...} dicts; the returned list of
+        scores is in the same order. Entries the judge drops or mangles are re-scored alone.
+        """
+        if not self.model:
+            return [{"relevance": 0, "coherence": 0, "fidelity": 0} for _ in items]
+
+        scores = [None] * len(items)
+        chunk_size = max(1, chunk_size)
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            if len(chunk) == 1:
+                continue  # a single response gains nothing from the batch prompt
+
+            entries = ""
+            for offset, item in enumerate(chunk):
+                entries += f"""
+        Response {start + offset}:
+        - Agent Persona: {item["persona"]}
+        - Agent Response: "{item["response"]}"
+        """
+
+            prompt = f"""
+        You are an expert judge evaluating AI agents' responses in a focus group simulation.
+        
+        All responses below answer the question: "{question}"
+        {entries}
+        Evaluate each response on a scale of 1-5 for the following criteria:
+        1. Relevance: Does the answer directly address the question?
+        2. Coherence: Is the response logical, grammatical, and easy to understand?
+        3. Fidelity: Does the response sound like it came from the described persona?
+        
+        Provide the output as a valid JSON array with one object per response, each with keys:
+        "id" (the response number), "relevance", "coherence", "fidelity".
+        Do not include markdown formatting.
+        """
+
+            try:
+                result = await generate_content_async(self.model, prompt, kind="judge", use_cache=self.use_cache)
+                parsed = self._parse_json(result.text)
+            except Exception as e:
+                print(f"Batch evaluation failed, scoring chunk individually: {e}")
+                parsed = []
+
+            for entry in parsed if isinstance(parsed, list) else []:
+                try:
+                    index = int(entry["id"])
+                    entry_scores = {key: int(entry[key]) for key in ("relevance", "coherence", "fidelity")}
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if start <= index < start + len(chunk) and all(1 <= v <= 5 for v in entry_scores.values()):
+                    scores[index] = entry_scores
+
+        # Anything the batch did not score cleanly is retried on its own, concurrently
+        missing = [index for index, score in enumerate(scores) if score is None]
+        retried = await asyncio.gather(*(self.evaluate_response(question, items[index]["response"], items[index]["persona"])
+                                         for index in missing))
+        for index, score in zip(missing, retried):
+            scores[index] = score
+
+        return scores
+
+    async def evaluate(self, question, items, chunk_size=10):
+        """
+        Scores `items` (dicts with "response", "persona" and optionally "agent") by tier:
+        every response gets local heuristic scores; in "cascade" mode those in the
+        uncertain band, plus a seeded random audit sample of the rest, are re-scored by
+        the LLM judge (batched). Each returned score dict says which `tier` produced it
+        ("local", "judge" or "audit") and keeps the `heuristic` scores for comparison.
+        """
+        local = [heuristic_scores(question, item["response"], item["persona"]) for item in items]
+        tiers = []
+        for item, heuristic in zip(items, local):
+            if self.mode == "local" or not self.model:
+                tiers.append("local")
+            elif self.mode == "llm" or self.uncertain_band[0] <= heuristic["overall"] <= self.uncertain_band[1]:
+                tiers.append("judge")
+            else:
+                # Seeded per response, so reruns audit the same responses (and hit the cache)
+                draw = random.Random(f"{self.audit_seed}:{question}:{item.get('agent')}:{item['response']}").random()
+                tiers.append("audit" if draw < self.audit_rate else "local")
+
+        judged_indexes = [i for i, tier in enumerate(tiers) if tier != "local"]
+        judged = await self.evaluate_batch(question, [items[i] for i in judged_indexes], chunk_size) if judged_indexes else []
+        scores = [{key: heuristic[key] for key in CRITERIA} for heuristic in local]
+        for index, judge_scores in zip(judged_indexes, judged):
+            scores[index] = {key: judge_scores.get(key, 0) for key in CRITERIA}
+        return [dict(score, tier=tier, heuristic=heuristic) for score, tier, heuristic in zip(scores, tiers, local)]
+
+    @staticmethod
+    def _parse_json(text):
+        text = text.strip()
+        if text.startswith("```json"):
+            text = text[7:-3]
+        elif text.startswith("```"):
+            text = text[3:-3]
+        return json.loads(text)
@@ -0,0 +1,158 @@
+"""
+Background simulation jobs.
+
+A JobExecutor runs simulations on a bounded pool of worker threads, each with its
+own event loop, so a long run never blocks the Streamlit script thread. Jobs get an
+ID; callers poll `get(job_id)` for status, progress, the events so far and the
+result. Finished jobs are also written to `jobs/<id>.json`, so their results
+survive a restart of the process.
+"""
+import asyncio
+import dataclasses
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+from simulation import stream_simulation
+from simulation_events import AgentResponse, QuestionSentiment, SimulationComplete, SimulationError
+
+load_dotenv()
+
+JOB_DIR = "jobs"
+# Worker threads, and the most work one worker takes on per job
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_AGENTS = int(os.getenv("JOB_MAX_AGENTS", "25"))
+JOB_MAX_CONCURRENCY = int(os.getenv("JOB_MAX_CONCURRENCY", "5"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "20"))
+# Finished jobs kept in memory (older ones are still on disk)
+MAX_FINISHED_JOBS = 100
+
+FINISHED = ("done", "error", "cancelled")
+
+
+class JobRejected(Exception):
+    """Raised when a job exceeds the worker limits or the queue is full."""
+
+
+class JobExecutor:
+    def __init__(self, workers=None, max_agents=None, max_concurrency=None, max_queued=None, job_dir=JOB_DIR):
+        self.max_agents = max_agents or JOB_MAX_AGENTS
+        self.max_concurrency = max_concurrency or JOB_MAX_CONCURRENCY
+        self.max_queued = max_queued or JOB_MAX_QUEUED
+        self.job_dir = job_dir
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._workers = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                         for i in range(workers or JOB_WORKERS)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, questions, additional_context="", **options):
+        """Queues a simulation (run_simulation arguments) and returns its job ID."""
+        num_agents = options.get("num_agents", 5)
+        if num_agents > self.max_agents:
+            raise JobRejected(f"A job may use at most {self.max_agents} agents (asked for {num_agents}).")
+        # Each worker keeps its own share of the LLM budget
+        options["max_concurrency"] = min(options.get("max_concurrency", 1), self.max_concurrency)
+        questions = [questions] if isinstance(questions, str) else list(questions)
+
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            if sum(1 for j in self._jobs.values() if j["status"] == "queued") >= self.max_queued:
+                raise JobRejected("Too many jobs are waiting; try again shortly.")
+            self._jobs[job_id] = {
+                "job_id": job_id, "status": "queued", "submitted_at": time.time(),
+                "started_at": None, "finished_at": None,
+                "progress": {"questions_done": 0, "questions": len(questions),
+                             "responses": 0, "expected_responses": num_agents * len(questions)},
+                "events": [], "result": None, "error": None, "cancel": False,
+            }
+        self._queue.put((job_id, questions, additional_context, options))
+        return job_id
+
+    def get(self, job_id):
+        """A snapshot of the job, or None if it is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job, progress=dict(job["progress"]), events=list(job["events"]))
+        return self._load(job_id)
+
+    def list_jobs(self):
+        with self._lock:
+            return [{k: job[k] for k in ("job_id", "status", "submitted_at", "progress")} for job in self._jobs.values()]
+
+    def cancel(self, job_id):
+        """Stops a queued job, or a running one at its next event."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] in FINISHED:
+                return False
+            job["cancel"] = True
+            if job["status"] == "queued":
+                job["status"] = "cancelled"
+                job["finished_at"] = time.time()
+            return True
+
+    def _work(self):
+        while True:
+            job_id, questions, additional_context, options = self._queue.get()
+            with self._lock:
+                job = self._jobs[job_id]
+                if job["status"] == "cancelled":
+                    continue
+                job["status"], job["started_at"] = "running", time.time()
+            try:
+                asyncio.run(self._run(job, questions, additional_context, options))
+            except Exception as e:
+                self._finish(job, "error", error=str(e))
+
+    async def _run(self, job, questions, additional_context, options):
+        stream = stream_simulation(questions, additional_context, **options)
+        try:
+            async for event in stream:
+                if job["cancel"]:
+                    self._finish(job, "cancelled")
+                    return
+                if isinstance(event, SimulationError):
+                    self._finish(job, "error", error=event.error)
+                    return
+                if isinstance(event, SimulationComplete):
+                    self._finish(job, "done", result=event.results)
+                    return
+                self._record(job, event)
+        finally:
+            await stream.aclose()
+        self._finish(job, "error", error="Simulation ended without results.")
+
+    def _record(self, job, event):
+        with self._lock:
+            job["events"].append(dict(dataclasses.asdict(event), type=type(event).__name__))
+            if isinstance(event, AgentResponse):
+                job["progress"]["responses"] += 1
+            elif isinstance(event, QuestionSentiment):
+                job["progress"]["questions_done"] += 1
+
+    def _finish(self, job, status, result=None, error=None):
+        with self._lock:
+            job.update(status=status, result=result, error=error, finished_at=time.time())
+            finished = [j for j in self._jobs.values() if j["status"] in FINISHED]
+            for old in sorted(finished, key=lambda j: j["finished_at"])[:-MAX_FINISHED_JOBS]:
+                del self._jobs[old["job_id"]]
+            record = {k: v for k, v in job.items() if k != "cancel"}
+        os.makedirs(self.job_dir, exist_ok=True)
+        tmp_path = os.path.join(self.job_dir, f"{job['job_id']}.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, os.path.join(self.job_dir, f"{job['job_id']}.json"))
+
+    def _load(self, job_id):
+        path = os.path.join(self.job_dir, f"{os.path.basename(job_id)}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
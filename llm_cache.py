@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite")
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "200")) * 1024 * 1024
+CACHE_TTL = float(os.getenv("LLM_CACHE_TTL_HOURS", "168")) * 3600
+# Call kinds that use the cache unless the caller says otherwise. Agent turns are left out
+# by default, so re-running a pitch samples the panel again instead of replaying it.
+CACHE_KINDS = set(os.getenv("LLM_CACHE_KINDS", "judge,sentiment,summary").split(","))
+
+
+class CachedResponse:
+    """Stands in for a Gemini response object when the answer comes from the cache."""
+
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+        self.cached = True
+
+
+def cache_key(model_name, prompt, options=None):
+    if isinstance(prompt, str):
+        body = prompt
+    else:
+        body = json.dumps(prompt, sort_keys=True, default=str)
+    material = f"{model_name}\0{body}\0{json.dumps(options or {}, sort_keys=True, default=str)}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    On-disk, content-addressed cache of LLM responses, keyed by a hash of model + prompt.
+    Entries expire after `ttl` seconds and the least recently used are evicted beyond `max_bytes`.
+    The SQLite file may be shared by several processes.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                text TEXT,
+                size INTEGER,
+                created_at REAL,
+                accessed_at REAL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key, kind="agent"):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT text, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > self.ttl:
+                self._delete([key])
+                row = None
+            if row is None:
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+            return CachedResponse(row[0])
+
+    def put(self, key, model_name, text):
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, model, text, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, text, size, now, now))
+            self._conn.commit()
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other processes may have written too, so start from the real total
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        expired = [r[0] for r in self._conn.execute(
+            "SELECT key FROM entries WHERE created_at < ?", (time.time() - self.ttl,))]
+        self._delete(expired)
+        # Trim to 90% of the cap so eviction does not run on every put
+        target = self.max_bytes * 0.9
+        cursor = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at")
+        victims = []
+        total = self._total_bytes
+        for key, size in cursor:
+            if total <= target:
+                break
+            victims.append(key)
+            total -= size
+        self._delete(victims)
+
+    def _delete(self, keys):
+        if not keys:
+            return
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            freed = self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM entries WHERE key IN ({placeholders})", batch).fetchone()[0]
+            self._conn.execute(f"DELETE FROM entries WHERE key IN ({placeholders})", batch)
+            self._total_bytes -= freed
+        self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            hits = sum(self.hits.values())
+            misses = sum(self.misses.values())
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                "by_kind": {k: {"hits": self.hits.get(k, 0), "misses": self.misses.get(k, 0)}
+                            for k in sorted(set(self.hits) | set(self.misses))},
+                "entries": entries,
+                "bytes": self._total_bytes,
+            }
+
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Returns the process-wide cache, or None when disabled with LLM_CACHE=0."""
+    global _llm_cache
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            _llm_cache = LLMCache()
+        return _llm_cache
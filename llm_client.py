@@ -0,0 +1,244 @@
+import asyncio
+import contextlib
+import contextvars
+import os
+import sys
+import threading
+import time
+from dotenv import load_dotenv
+from rate_limiter import get_rate_limiter
+from llm_cache import CACHE_KINDS, cache_key, get_llm_cache
+from shared_context import get_shared_context
+from observability import current_agent, get_metrics
+from tracing import span
+from usage import current_tracker
+
+load_dotenv()
+
+MAX_RETRIES = 5
+
+# "gemini" (default) or "mock" for the offline backend in mock_llm.py
+_backend = os.getenv("LLM_BACKEND", "gemini")
+_mock_options = {}
+_mock_models = {}
+_mock_lock = threading.Lock()
+
+# Per call kind: "requests" made to this module and "model_calls" that reached the backend
+_call_counts = {}
+_call_counts_lock = threading.Lock()
+
+# Calls that do not say what they are (i.e. TinyTroupe's agent turns) are "agent" calls
+_call_kind = contextvars.ContextVar("llm_call_kind", default="agent")
+_cache_enabled = contextvars.ContextVar("llm_cache_enabled", default=None)
+
+
+@contextlib.contextmanager
+def cache_enabled(enabled):
+    """Turns the response cache on or off for LLM calls made inside this block (and threads it starts)."""
+    token = _cache_enabled.set(enabled)
+    try:
+        yield
+    finally:
+        _cache_enabled.reset(token)
+
+
+def set_backend(backend, **mock_options):
+    """Switches every LLM call in the process to "gemini" or "mock" (options go to MockModel)."""
+    global _backend, _mock_options
+    _backend = backend
+    with _mock_lock:
+        _mock_models.clear()
+        _mock_options = mock_options
+
+
+def get_backend():
+    return _backend
+
+
+def get_model(name):
+    """Returns a model for `name` from the active backend."""
+    if _backend == "mock":
+        return _get_mock_model(name)
+    import google.generativeai as genai
+    return genai.GenerativeModel(name)
+
+
+def _get_mock_model(name):
+    from mock_llm import MockModel
+    with _mock_lock:
+        if name not in _mock_models:
+            _mock_models[name] = MockModel(name, **_mock_options)
+        return _mock_models[name]
+
+
+def _count(kind, field):
+    with _call_counts_lock:
+        counts = _call_counts.setdefault(kind, {"requests": 0, "model_calls": 0})
+        counts[field] += 1
+
+
+def call_stats():
+    with _call_counts_lock:
+        return {kind: dict(counts) for kind, counts in _call_counts.items()}
+
+
+def reset_call_stats():
+    with _call_counts_lock:
+        _call_counts.clear()
+
+
+def model_name(model):
+    """Returns a model's short name, e.g. 'gemini-2.0-flash-lite-preview-02-05'."""
+    name = getattr(model, "model_name", None) or type(model).__name__
+    return name.split("/")[-1]
+
+
+def estimate_tokens(prompt):
+    """Rough token count (~4 characters per token) used before the real usage is known."""
+    return max(1, len(str(prompt)) // 4)
+
+
+def is_rate_limit_error(error):
+    text = str(error)
+    return type(error).__name__ == "ResourceExhausted" or "429" in text or "quota" in text.lower()
+
+
+# Server-side errors worth retrying; anything else (bad request, auth, safety block, bugs) is raised at once
+TRANSIENT_ERRORS = {"ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "GatewayTimeout",
+                    "MockRateLimitError"}
+
+
+def is_transient_error(error):
+    return (type(error).__name__ in TRANSIENT_ERRORS or isinstance(error, (ConnectionError, TimeoutError))
+            or is_rate_limit_error(error))
+
+
+def generate_content_with_retry(model, prompt, max_retries=MAX_RETRIES, kind=None, use_cache=None, **kwargs):
+    """
+    Calls `model.generate_content(prompt)` under the process-wide rate limiter.
+    429s slow the limiter down and are retried; other transient errors get exponential
+    backoff, and the rest are raised immediately.
+    `kind` ("agent", "judge", "sentiment", ...) labels the call; `use_cache` overrides
+    whether the on-disk response cache is consulted for it. Shared context references
+    in the prompt are expanded here, after the cache lookup. Every call's latency is
+    recorded in the crowdsim_llm_call_seconds histogram, and its token usage goes to
+    the current run's UsageTracker (see usage.py).
+    """
+    name = model_name(model)
+    kind = kind or _call_kind.get()
+    start = time.perf_counter()
+    outcome = "error"
+    with span("llm.call", kind=kind, model=name) as current:
+        try:
+            response, outcome = _generate(model, name, kind, prompt, max_retries, use_cache, **kwargs)
+            tracker = current_tracker()
+            if tracker:
+                cache_hit = outcome == "cache_hit"
+                entry = tracker.record(name, kind, None if cache_hit else getattr(response, "usage_metadata", None),
+                                       agent=current_agent(), cache_hit=cache_hit)
+                if current:
+                    current.set(tokens=entry["total_tokens"])
+            return response
+        finally:
+            get_metrics().record("crowdsim_llm_call_seconds", time.perf_counter() - start,
+                                 {"model": name, "kind": kind, "agent": current_agent(), "outcome": outcome})
+            if current:
+                current.set(outcome=outcome)
+
+
+async def generate_content_async(model, prompt, max_retries=MAX_RETRIES, kind=None, use_cache=None, **kwargs):
+    """
+    generate_content_with_retry for coroutines: the call (and any wait for the rate
+    limiter) runs in a worker thread, so the event loop keeps serving other agents.
+    """
+    return await asyncio.to_thread(generate_content_with_retry, model, prompt, max_retries, kind, use_cache, **kwargs)
+
+
+def _generate(model, name, kind, prompt, max_retries, use_cache, **kwargs):
+    """Returns (response, "cache_hit" or "ok")."""
+    if _backend == "mock":
+        # Also catches models TinyTroupe built itself for the agents
+        model = _get_mock_model(name)
+    _count(kind, "requests")
+
+    if use_cache is None:
+        use_cache = _cache_enabled.get()
+    if use_cache is None:
+        use_cache = kind in CACHE_KINDS
+    cache = get_llm_cache() if use_cache else None
+    if cache:
+        # Mock replies must never be served to real runs
+        key = cache_key(f"{_backend}/{name}", prompt, kwargs)
+        cached = cache.get(key, kind)
+        if cached is not None:
+            return cached, "cache_hit"
+
+    if _backend == "mock":
+        prompt = get_shared_context().expand(prompt)
+    else:
+        model, prompt = get_shared_context().prepare(model, name, prompt, estimate_tokens)
+    response = _call_model(model, name, kind, prompt, max_retries, **kwargs)
+    if cache and not _has_function_call(response):
+        try:
+            text = response.text
+        except Exception:
+            text = None  # blocked or non-text responses are not cached
+        if text:
+            cache.put(key, name, text)
+    return response, "ok"
+
+
+def _has_function_call(response):
+    """A cached response only keeps its text, so replies with tool calls are not cached."""
+    for candidate in getattr(response, "candidates", None) or []:
+        for part in getattr(getattr(candidate, "content", None), "parts", None) or []:
+            if getattr(part, "function_call", None):
+                return True
+    return False
+
+
+def _call_model(model, name, kind, prompt, max_retries, **kwargs):
+    # The mock backend has no quota to respect, so offline runs are never paced
+    limiter = None if _backend == "mock" else get_rate_limiter()
+    estimated = estimate_tokens(prompt)
+
+    for attempt in range(max_retries + 1):
+        if limiter:
+            limiter.acquire(name, estimated)
+        _count(kind, "model_calls")
+        try:
+            response = model.generate_content(prompt, **kwargs)
+        except Exception as e:
+            if attempt == max_retries or not is_transient_error(e):
+                raise
+            if is_rate_limit_error(e):
+                if limiter:
+                    limiter.report_throttled(name)
+            else:
+                print(f"LLM call to {name} failed ({e}), retrying...")
+                time.sleep(min(30, 2 ** attempt))
+            continue
+
+        if limiter:
+            limiter.report_success(name)
+            usage = getattr(response, "usage_metadata", None)
+            actual = getattr(usage, "total_token_count", None)
+            if actual:
+                limiter.settle(name, estimated, actual)
+        return response
+
+
+def install():
+    """
+    Routes TinyTroupe's own LLM calls (the agent turns) through this module, so agents
+    share the same limiter as the evaluator and sentiment analysis.
+    """
+    import TinyTroupe.utils
+
+    original = TinyTroupe.utils.generate_content_with_retry
+    if original is generate_content_with_retry:
+        return
+    # Modules that did `from TinyTroupe.utils import generate_content_with_retry` hold their own reference
+    for module_name, module in list(sys.modules.items()):
+        if module_name.split(".")[0] == "TinyTroupe" and getattr(module, "generate_content_with_retry", None) is original:
+            module.generate_content_with_retry = generate_content_with_retry
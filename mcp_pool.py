@@ -0,0 +1,241 @@
+"""
+Pooled MCP client sessions for tool calls.
+
+`MCPPool` keeps MCP_POOL_SIZE warm sessions to the tool server, either `mcp_server.py`
+started as stdio subprocesses or, with MCP_SERVER_URL, a remote server over SSE
+(`python mcp_server.py --transport sse`). The sessions live on a background asyncio
+loop. Concurrent `call_tool` requests are multiplexed over them (each goes to the
+session with the fewest calls in flight). A session that fails is reconnected, and
+a call it was carrying is retried once on another session.
+
+`tool_function(name)` returns a plain synchronous function, as TinyPerson.add_tool
+expects. With TOOL_BACKEND=mcp the simulation registers these instead of the
+in-process functions from mcp_server.py.
+"""
+import asyncio
+import atexit
+import os
+import sys
+import threading
+from dotenv import load_dotenv
+from mcp.shared.exceptions import McpError
+
+load_dotenv()
+
+# "inprocess" (call mcp_server's functions directly) or "mcp" (through this pool)
+TOOL_BACKEND = os.getenv("TOOL_BACKEND", "inprocess")
+POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+SERVER_URL = os.getenv("MCP_SERVER_URL", "")
+CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "60"))
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+# Idle sessions are pinged this often, so a dead server is noticed before the next call
+PING_INTERVAL = 15.0
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_server.py")
+
+
+class MCPPoolError(Exception):
+    pass
+
+
+class _Connection:
+    def __init__(self, slot):
+        self.slot = slot
+        self.session = None
+        self.in_flight = 0
+        self.broken = None     # asyncio.Event set to make the owner task reconnect
+
+
+class MCPPool:
+    def __init__(self, size=POOL_SIZE, url=SERVER_URL or None, command=sys.executable, args=None,
+                 call_timeout=CALL_TIMEOUT):
+        self.size = max(1, size)
+        self.url = url
+        self.command = command
+        self.args = args if args is not None else [SERVER_SCRIPT]
+        self.call_timeout = call_timeout
+        self.tools = {}            # name -> input schema property names, in order
+        self.calls = 0
+        self.reconnects = 0
+        self._connections = [_Connection(slot) for slot in range(self.size)]
+        self._loop = asyncio.new_event_loop()
+        self._ready = None         # asyncio.Condition, notified when a session (re)connects
+        self._stopping = None
+        self._tasks = []
+        self._thread = threading.Thread(target=self._loop.run_forever, name="mcp-pool", daemon=True)
+        self._thread.start()
+        self._submit(self._start()).result()
+
+    def _submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    async def _start(self):
+        self._ready = asyncio.Condition()
+        self._stopping = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._keep_connected(c)) for c in self._connections]
+
+    def _transport(self):
+        if self.url:
+            from mcp.client.sse import sse_client
+            return sse_client(self.url)
+        from mcp import StdioServerParameters
+        from mcp.client.stdio import stdio_client
+        return stdio_client(StdioServerParameters(command=self.command, args=self.args, env=os.environ.copy()))
+
+    async def _keep_connected(self, connection):
+        """Owns one session: opens it, holds it open until it breaks or the pool closes, and reopens it."""
+        from mcp import ClientSession
+
+        delay = RECONNECT_DELAY
+        while not self._stopping.is_set():
+            connection.broken = asyncio.Event()
+            try:
+                async with self._transport() as streams, ClientSession(streams[0], streams[1]) as session:
+                    await session.initialize()
+                    if not self.tools:
+                        listed = await session.list_tools()
+                        self.tools = {tool.name: list((tool.inputSchema or {}).get("properties", {}))
+                                      for tool in listed.tools}
+                    async with self._ready:
+                        connection.session = session
+                        self._ready.notify_all()
+                    delay = RECONNECT_DELAY
+                    while not connection.broken.is_set():
+                        try:
+                            await asyncio.wait_for(connection.broken.wait(), PING_INTERVAL)
+                        except asyncio.TimeoutError:
+                            await asyncio.wait_for(session.send_ping(), PING_INTERVAL)
+            except Exception as e:
+                print(f"MCP session {connection.slot} failed ({type(e).__name__}: {e}), reconnecting in {delay:.0f}s...")
+            finally:
+                connection.session = None
+                # Calls still waiting on this session give up and retry elsewhere
+                connection.broken.set()
+            if self._stopping.is_set():
+                break
+            self.reconnects += 1
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(MAX_RECONNECT_DELAY, delay * 2)
+
+    @staticmethod
+    def _usable(connection):
+        return connection.session is not None and not connection.broken.is_set()
+
+    async def _acquire(self):
+        async with self._ready:
+            await self._ready.wait_for(lambda: any(self._usable(c) for c in self._connections))
+            connection = min((c for c in self._connections if self._usable(c)), key=lambda c: c.in_flight)
+            connection.in_flight += 1
+            return connection
+
+    async def _call(self, name, arguments):
+        for attempt in range(2):
+            connection = await self._acquire()
+            broken = connection.broken
+            call = asyncio.ensure_future(connection.session.call_tool(name, arguments=arguments))
+            lost = asyncio.ensure_future(broken.wait())
+            try:
+                await asyncio.wait([call, lost], timeout=self.call_timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not call.done():
+                    raise ConnectionError("session lost" if broken.is_set() else "no reply")
+                if call.cancelled():
+                    raise ConnectionError("call cancelled by the session")
+                result = call.result()
+            except McpError as e:
+                # The server answered (e.g. invalid arguments); the session is fine
+                raise MCPPoolError(f"Tool call {name} failed: {e}") from e
+            except Exception as e:
+                # Transport errors and silence leave the session unusable; have its owner reconnect it
+                broken.set()
+                if attempt == 1:
+                    raise MCPPoolError(f"Tool call {name} failed: {e}") from e
+                continue
+            finally:
+                # Also runs when the caller gives up on us; the request must not outlive it
+                call.cancel()
+                lost.cancel()
+                connection.in_flight -= 1
+            self.calls += 1
+            text = "\n".join(getattr(item, "text", str(item)) for item in result.content)
+            if result.isError:
+                # The tool itself failed (or does not exist); retrying elsewhere would fail the same way
+                raise MCPPoolError(f"Tool call {name} failed: {text}")
+            return text
+
+    def call_tool(self, name, arguments=None, timeout=None):
+        """
+        Calls tool `name` on a pooled session and returns its text output (blocking).
+        The default deadline leaves room for a retry and a reconnect after a silent session.
+        """
+        timeout = timeout or self.call_timeout * 2 + MAX_RECONNECT_DELAY
+        future = self._submit(asyncio.wait_for(self._call(name, arguments or {}), timeout))
+        try:
+            return future.result()
+        except asyncio.TimeoutError:
+            raise MCPPoolError(f"Tool call {name} timed out after {timeout}s")
+
+    def wait_ready(self, timeout=None):
+        """Blocks until at least one session is connected (and the tool list is known)."""
+        async def connected():
+            async with self._ready:
+                await self._ready.wait_for(lambda: any(self._usable(c) for c in self._connections))
+
+        try:
+            self._submit(asyncio.wait_for(connected(), timeout or self.call_timeout)).result()
+        except asyncio.TimeoutError:
+            raise MCPPoolError("No MCP session could be opened")
+        return self
+
+    def tool_function(self, name):
+        """A synchronous function for TinyPerson.add_tool; positional arguments follow the tool's schema."""
+        self.wait_ready()
+        if name not in self.tools:
+            raise MCPPoolError(f"The MCP server has no tool named {name}")
+
+        def tool(*args, **kwargs):
+            arguments = dict(zip(self.tools[name], args))
+            arguments.update(kwargs)
+            return self.call_tool(name, arguments)
+
+        tool.__name__ = name
+        return tool
+
+    def stats(self):
+        return {"sessions": sum(1 for c in self._connections if self._usable(c)), "size": self.size,
+                "calls": self.calls, "reconnects": self.reconnects}
+
+    def close(self):
+        if not self._loop.is_running():
+            return
+
+        async def stop():
+            self._stopping.set()
+            for connection in self._connections:
+                if connection.broken:
+                    connection.broken.set()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        try:
+            self._submit(stop()).result(10)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_mcp_pool():
+    """Returns the process-wide pool, started on first use and closed at exit."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = MCPPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -3,10 +3,15 @@ from pydantic import Field
 from duckduckgo_search import DDGS
 from textblob import TextBlob
 import json
+import sys
+from search_cache import get_search_cache
 
 # Initialize FastMCP server
 mcp = FastMCP("CrowdSimAI_Tools")
 
+def _ddg_search(query, limit):
+    return DDGS().text(query, max_results=limit)
+
 @mcp.tool()
 def web_search(query: str, limit: int = 3) -> str:
     """
@@ -17,9 +22,11 @@ def web_search(query: str, limit: int = 3) -> str:
         query: The search query string.
         limit: The number of results to return (default: 3).
     """
-    print(f"Executing Web Search: {query}")
+    # stdout carries the protocol when served over stdio
+    print(f"Executing Web Search: {query}", file=sys.stderr)
     try:
-        results = DDGS().text(query, max_results=limit)
+        # Repeated and concurrent searches for the same query share one request (see search_cache.py)
+        results = get_search_cache().search(query, limit, _ddg_search)
         if not results:
             return "No results found."
         
@@ -40,7 +47,7 @@ def get_sentiment(text: str) -> str:
     Args:
         text: The text to analyze.
     """
-    print(f"Analyzing Sentiment for text length: {len(text)}")
+    print(f"Analyzing Sentiment for text length: {len(text)}", file=sys.stderr)
     try:
         blob = TextBlob(text)
         polarity = blob.sentiment.polarity
@@ -77,4 +84,13 @@ def save_report(content: str, filename: str) -> str:
         return f"Error saving report: {str(e)}"
 
 if __name__ == "__main__":
-    mcp.run()
+    import argparse
+    parser = argparse.ArgumentParser(description="CrowdSim AI tool server")
+    parser.add_argument("--transport", choices=["stdio", "sse"], default="stdio",
+                        help="stdio for a local subprocess; sse to serve remote clients (MCP_SERVER_URL=http://host:port/sse)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    mcp.settings.host = args.host
+    mcp.settings.port = args.port
+    mcp.run(transport=args.transport)
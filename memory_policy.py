@@ -0,0 +1,102 @@
+"""
+Bounded episodic memory for long-lived agents.
+
+A MemoryPolicy keeps an agent's most recent events verbatim and folds older ones,
+a chunk at a time, into one rolling summary event at the front of its episodic
+memory. The prompt an agent builds from its memory therefore stays under a fixed
+token budget however many sessions the panel has been kept alive for.
+"""
+import json
+import os
+from dotenv import load_dotenv
+import llm_client
+from llm_client import generate_content_with_retry, estimate_tokens
+
+load_dotenv()
+
+SUMMARY_TYPE = "memory_summary"
+SUMMARY_MODEL = "gemini-2.0-flash-lite-preview-02-05"
+
+
+def is_summary(event):
+    return isinstance(event, dict) and event.get("type") == SUMMARY_TYPE
+
+
+def event_text(event):
+    content = event.get("content", event) if isinstance(event, dict) else event
+    return content if isinstance(content, str) else json.dumps(content, default=str)
+
+
+class MemoryPolicy:
+    """
+    recent_events: events kept verbatim. Once `chunk_events` more have piled up, the
+    oldest chunk is folded into the summary (one LLM call), so summarization happens
+    incrementally as events age out.
+    max_tokens: hard budget for the whole memory. Over it, more events are folded
+    (keeping at least `min_recent_events`), and finally the summary is truncated.
+    """
+
+    def __init__(self, recent_events=None, chunk_events=None, max_tokens=None, min_recent_events=4, use_cache=True):
+        self.recent_events = recent_events or int(os.getenv("MEMORY_RECENT_EVENTS", "40"))
+        self.chunk_events = max(1, chunk_events or int(os.getenv("MEMORY_SUMMARY_CHUNK", "20")))
+        self.max_tokens = max_tokens or int(os.getenv("MEMORY_MAX_TOKENS", "6000"))
+        self.min_recent_events = min_recent_events
+        self.use_cache = use_cache
+
+    def apply(self, agent):
+        """Enforces the policy on `agent` in place. Returns the number of events folded."""
+        memory = agent.episodic_memory.memory
+        summary = memory[0] if memory and is_summary(memory[0]) else None
+        events = memory[1:] if summary else list(memory)
+        folded = 0
+
+        while len(events) >= self.recent_events + self.chunk_events:
+            summary = self._fold(agent, summary, events[:self.chunk_events])
+            events = events[self.chunk_events:]
+            folded += self.chunk_events
+
+        while self._tokens(summary, events) > self.max_tokens and len(events) > self.min_recent_events:
+            count = min(self.chunk_events, len(events) - self.min_recent_events)
+            summary = self._fold(agent, summary, events[:count])
+            events = events[count:]
+            folded += count
+
+        truncated = False
+        if summary and self._tokens(summary, events) > self.max_tokens:
+            # Recent events are never cut, so the summary gives way
+            room = max(0, self.max_tokens - self._tokens(None, events)) * 4
+            summary = dict(summary, content=summary["content"][:room])
+            truncated = True
+
+        if folded or truncated:
+            memory[:] = ([summary] if summary else []) + events
+        return folded
+
+    def _fold(self, agent, summary, events):
+        """Returns a summary event covering `summary` plus `events`."""
+        previous = summary["content"] if summary else ""
+        lines = "\n".join(f"- {event_text(e)}" for e in events)
+        prompt = f"""
+        Condense these memories of {agent.name} into a short first-person summary that keeps
+        names, opinions, numbers and anything {agent.name} committed to.
+
+        Earlier summary:
+        {previous or "(none)"}
+
+        New memories:
+        {lines}
+
+        Reply with the updated summary only.
+        """
+        try:
+            model = llm_client.get_model(SUMMARY_MODEL)
+            text = generate_content_with_retry(model, prompt, kind="summary", use_cache=self.use_cache).text.strip()
+        except Exception as e:
+            print(f"Memory summarization failed for {agent.name} ({e}), keeping a truncated log instead.")
+            text = (previous + "\n" + lines).strip()
+        return {"role": "system", "type": SUMMARY_TYPE, "content": text}
+
+    @staticmethod
+    def _tokens(summary, events):
+        total = estimate_tokens(summary["content"]) if summary else 0
+        return total + sum(estimate_tokens(event_text(e)) for e in events)
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OPINIONS = [
+    "I really like {topic}. It seems genuinely useful for someone like me.",
+    "{topic} sounds interesting, but I would need to see the price first.",
+    "Honestly, I'm not convinced about {topic}. It feels like a gimmick.",
+    "I could see myself trying {topic} if friends recommended it.",
+    "{topic} is not for me. I'd rather keep what I already have.",
+    "I have mixed feelings about {topic}; the idea is good but the value is unclear.",
+]
+
+STOPWORDS = {"what", "do", "you", "think", "of", "the", "a", "an", "this", "that", "about", "is", "are",
+             "would", "your", "how", "for", "to", "and", "in", "on", "it", "be", "we", "should"}
+
+
+class MockRateLimitError(Exception):
+    """Raised for injected throttling; looks like a Gemini 429 to llm_client."""
+
+
+class MockUsage:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class MockResponse:
+    def __init__(self, text, prompt_tokens):
+        self.text = text
+        self.usage_metadata = MockUsage(prompt_tokens, max(1, len(text) // 4))
+
+
+def parse_latency(spec):
+    """
+    Parses a latency spec into a sampler taking a `random.Random`:
+    "0.5" (fixed seconds), "uniform:LOW:HIGH" or "lognormal:MEDIAN:SIGMA".
+    """
+    spec = str(spec).strip()
+    kind, _, params = spec.partition(":")
+    if not params:
+        fixed = float(spec)
+        return lambda rng: fixed
+    values = [float(v) for v in params.split(":")]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockModel:
+    """
+    Offline stand-in for `genai.GenerativeModel`. Replies are chosen from the prompt:
+    judge prompts get score JSON (single or batched), sentiment prompts get sentiment
+    JSON, memory summarization prompts get a one-line summary, everything else gets a short in-character answer. Output, latency and
+    injected 429s are derived from `seed` + prompt, so runs repeat exactly even when
+    calls are made concurrently.
+    """
+
+    def __init__(self, model_name="mock-gemini", latency=None, error_rate=None, seed=None):
+        self.model_name = model_name
+        self.latency = parse_latency(latency if latency is not None else os.getenv("MOCK_LLM_LATENCY", "0"))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("MOCK_LLM_429_RATE", "0"))
+        self.seed = seed if seed is not None else int(os.getenv("MOCK_LLM_SEED", "0"))
+        self.calls = 0
+        self._attempts = {}       # prompt digest -> failed attempts so far
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        text = prompt if isinstance(prompt, str) else json.dumps(prompt, default=str)
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            self.calls += 1
+            attempt = self._attempts.get(digest, 0)
+        # The reply depends only on the prompt; latency and errors also on the retry number
+        reply_rng = random.Random(f"{self.seed}:{digest}")
+        call_rng = random.Random(f"{self.seed}:{digest}:{attempt}")
+
+        time.sleep(max(0.0, self.latency(call_rng)))
+        if call_rng.random() < self.error_rate:
+            with self._lock:
+                self._attempts[digest] = attempt + 1
+            raise MockRateLimitError("429 Resource has been exhausted (mock backend)")
+        # Only prompts in the middle of their retries are tracked
+        if attempt:
+            with self._lock:
+                self._attempts.pop(digest, None)
+
+        return MockResponse(self._reply(text, reply_rng), max(1, len(text) // 4))
+
+    def _reply(self, prompt, rng):
+        if '"relevance"' in prompt and "JSON array" in prompt:
+            ids = [int(i) for i in re.findall(r"Response (\d+):", prompt)]
+            return json.dumps([dict(id=i, **self._scores(rng)) for i in ids])
+        if '"relevance"' in prompt:
+            return json.dumps(self._scores(rng))
+        if "'score' (1-10)" in prompt:
+            score = rng.randint(2, 9)
+            label = "Positive" if score >= 7 else "Negative" if score <= 4 else "Neutral"
+            return json.dumps({"score": score, "label": label,
+                               "summary": f"Participants were mostly {label.lower()} (mock analysis)."})
+        if "Condense these memories" in prompt:
+            return f"I remember discussing {self._topic(prompt)} with the group (mock summary)."
+        template = rng.choice(OPINIONS)
+        return template.format(topic=self._topic(prompt))
+
+    @staticmethod
+    def _scores(rng):
+        return {"relevance": rng.randint(3, 5), "coherence": rng.randint(3, 5), "fidelity": rng.randint(2, 5)}
+
+    @staticmethod
+    def _topic(prompt):
+        questions = re.findall(r"Question \d+: ([^\n\"]+)", prompt)
+        source = questions[-1] if questions else prompt[-200:]
+        words = [w for w in re.findall(r"[A-Za-z$0-9']+", source) if w.lower() not in STOPWORDS]
+        return " ".join(words[:5]) or "this idea"
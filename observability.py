@@ -1,57 +1,326 @@
-import logging
+import atexit
+import bisect
+import contextlib
+import contextvars
+import functools
+import glob
+import gzip
+import http.server
 import json
+import os
+import queue
+import shutil
+import threading
 import time
 import uuid
-import os
+from tracing import span
+
+LOG_PATH = os.getenv("LOG_PATH", "logs/simulation.jsonl")
+LOG_MAX_BYTES = int(float(os.getenv("LOG_MAX_MB", "50")) * 1024 * 1024)
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))
+# Past this many unwritten records new ones are dropped (and counted) rather than
+# letting a stalled disk grow memory without bound
+LOG_MAX_QUEUE = int(os.getenv("LOG_MAX_QUEUE", "100000"))
+LOG_BATCH_SIZE = 500
+
+
+class LogWriter:
+    """
+    Appends JSON log records to `path` from a background thread, in batches. Once the
+    file passes `max_bytes` it is gzipped to `<name>-<timestamp>.jsonl.gz` and a new
+    file is started; only the newest `backups` archives are kept.
+    """
+
+    def __init__(self, path=LOG_PATH, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS, max_queue=LOG_MAX_QUEUE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, entry):
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Blocks until every record queued so far is on disk."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"WARNING: Could not write {len(batch)} log records to {self.path}: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(json.dumps(entry, default=str) + "\n" for entry in batch))
+        self._file.flush()
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        base, ext = os.path.splitext(self.path)
+        archive = f"{base}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}{ext}.gz"
+        with open(self.path, "rb") as src, gzip.open(archive, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+        for old in sorted(glob.glob(f"{base}-*{ext}.gz"), key=os.path.getmtime)[:-self.backups or None]:
+            os.remove(old)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_log_writer():
+    """Returns the writer shared by every StructuredLogger in this process."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = LogWriter()
+            atexit.register(_writer.flush)
+        return _writer
+
 
 class StructuredLogger:
-    def __init__(self, name="CrowdSimAI"):
-        self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.INFO)
-        
-        # Create logs directory if it doesn't exist
-        if not os.path.exists("logs"):
-            os.makedirs("logs")
-            
-        # File handler for JSON logs
-        handler = logging.FileHandler("logs/simulation.jsonl")
-        formatter = logging.Formatter('%(message)s')
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
-        
-        self.trace_id = str(uuid.uuid4())
+    """
+    Logs events for one run. Each instance carries its own `trace_id`; records go to
+    the process-wide LogWriter, so creating loggers never adds handlers or file handles.
+    """
+
+    def __init__(self, name="CrowdSimAI", trace_id=None):
+        self.name = name
+        self.trace_id = trace_id or str(uuid.uuid4())
+        self._writer = get_log_writer()
 
     def log(self, event_type, details):
         """Logs an event with a trace ID and timestamp."""
-        entry = {
+        self._writer.put({
             "timestamp": time.time(),
             "trace_id": self.trace_id,
             "event_type": event_type,
             "details": details
+        })
+
+# Histogram bucket upper bounds in seconds: 1ms to ~5min, each 25% wider than the last,
+# so quantiles are within about 12% however many values are recorded
+LATENCY_BUCKETS = tuple(round(0.001 * 1.25 ** i, 6) for i in range(57))
+# Series beyond this (e.g. from very large panels tagged by agent) lose their agent tag
+MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", "10000"))
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+_current_agent = contextvars.ContextVar("metrics_agent", default="")
+
+
+@contextlib.contextmanager
+def agent_context(name):
+    """Tags metrics recorded inside this block (and threads it starts) with agent `name`."""
+    token = _current_agent.set(name)
+    try:
+        yield
+    finally:
+        _current_agent.reset(token)
+
+
+def current_agent():
+    return _current_agent.get()
+
+
+class Histogram:
+    """Fixed-bucket streaming histogram: constant memory, approximate quantiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                value = lower + (upper - lower) * (rank - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max if self.count else 0.0,
         }
-        self.logger.info(json.dumps(entry))
-        # Also print to console for immediate feedback (optional)
-        # print(f"[{event_type}] {json.dumps(details)}")
+
 
 class Metrics:
+    """
+    Histograms keyed by metric name and tags. `get_metrics()` returns the process-wide
+    instance that llm_client and the tool wrappers record into.
+    """
+
     def __init__(self):
-        self.metrics = []
+        self.metrics = {}
+        self._lock = threading.Lock()
 
     def record(self, name, value, tags=None):
-        self.metrics.append({
-            "name": name,
-            "value": value,
-            "tags": tags or {},
-            "timestamp": time.time()
-        })
+        tags = tags or {}
+        key = (name, tuple(sorted(tags.items())))
+        with self._lock:
+            histogram = self.metrics.get(key)
+            if histogram is None and len(self.metrics) >= MAX_SERIES and "agent" in tags:
+                key = (name, tuple(sorted(dict(tags, agent="other").items())))
+                histogram = self.metrics.get(key)
+            if histogram is None:
+                histogram = self.metrics[key] = Histogram()
+            histogram.observe(value)
+
+    def reset(self):
+        """Drops every recorded series."""
+        with self._lock:
+            self.metrics.clear()
 
     def get_summary(self):
-        # Simple summary: average of values per metric name
-        summary = {}
-        for m in self.metrics:
-            name = m["name"]
-            if name not in summary:
-                summary[name] = []
-            summary[name].append(m["value"])
-        
-        return {k: sum(v)/len(v) for k, v in summary.items()}
+        """Count, mean, p50/p95/p99 and max per metric name (all tags combined)."""
+        merged = {}
+        with self._lock:
+            for (name, _), histogram in self.metrics.items():
+                total = merged.setdefault(name, Histogram(histogram.buckets))
+                total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+                total.count += histogram.count
+                total.sum += histogram.sum
+                total.min = min(total.min, histogram.min)
+                total.max = max(total.max, histogram.max)
+        return {name: histogram.summary() for name, histogram in merged.items()}
+
+    def series(self):
+        """(name, tags, summary) for every tagged series."""
+        with self._lock:
+            return [(name, dict(tags), histogram.summary()) for (name, tags), histogram in self.metrics.items()]
+
+    def to_prometheus(self):
+        """All histograms in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            items = sorted(self.metrics.items(), key=lambda item: item[0])
+            for i, ((name, tags), histogram) in enumerate(items):
+                if i == 0 or items[i - 1][0][0] != name:
+                    lines.append(f"# TYPE {name} histogram")
+                labels = ",".join(f'{k}="{_escape(v)}"' for k, v in tags)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{name}_bucket{{{labels + ',' if labels else ''}{le}}} {cumulative}")
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve_prometheus(self, port, host="127.0.0.1"):
+        """Serves /metrics on a background thread. Returns the server."""
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+        return server
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Returns the process-wide Metrics, serving it on METRICS_PORT if that is set."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = Metrics()
+            if METRICS_PORT:
+                try:
+                    _metrics.serve_prometheus(METRICS_PORT)
+                except OSError as e:
+                    print(f"WARNING: Could not serve metrics on port {METRICS_PORT}: {e}")
+        return _metrics
+
+
+def timed_tool(name, fn):
+    """Wraps tool function `fn` so every call records tool_call_seconds and a "tool.call" span."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            with span("tool.call", tool=name, agent=current_agent()):
+                return fn(*args, **kwargs)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            get_metrics().record("crowdsim_tool_call_seconds", time.perf_counter() - start,
+                                 {"tool": name, "agent": current_agent(), "status": status})
+    return wrapper
@@ -0,0 +1,206 @@
+"""
+Columnar, indexed persona population.
+
+A store can be built in memory from the legacy personas.json list, or memory-mapped
+from a directory written by `convert` (numeric columns as .npy files, persona
+records as one UTF-8 blob). Filters on age, occupation and interests use sorted
+indexes and posting lists, so they never walk the whole population in Python.
+
+    python persona_store.py personas.json personas_store/
+"""
+import json
+import os
+import sys
+import threading
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+class PersonaStore:
+    def __init__(self, columns, occupations, interests, records, record_offsets):
+        self.ages = columns["ages"]
+        self.occupation_codes = columns["occupation_codes"]
+        self.interest_offsets = columns["interest_offsets"]    # CSR: persona -> interest codes
+        self.interest_codes = columns["interest_codes"]
+        self.occupations = occupations
+        self.interests = interests
+        self._occupation_lookup = {name: code for code, name in enumerate(occupations)}
+        self._interest_lookup = {name: code for code, name in enumerate(interests)}
+        self._records = records
+        self._record_offsets = record_offsets
+
+        # Indexes: age sort order, and posting lists (grouped persona ids) per occupation / interest
+        self._age_order = columns["age_order"]
+        self._ages_sorted = columns["ages_sorted"]
+        self._occupation_order = columns["occupation_order"]
+        self._occupation_postings = columns["occupation_postings"]
+        self._interest_order = columns["interest_order"]
+        self._interest_postings = columns["interest_postings"]
+
+    def __len__(self):
+        return len(self.ages)
+
+    @classmethod
+    def from_personas(cls, personas):
+        occupations, interests = {}, {}
+        occupation_codes = np.fromiter(
+            (occupations.setdefault(p.get("occupation", ""), len(occupations)) for p in personas),
+            dtype=np.int32, count=len(personas))
+        interest_lists = [[interests.setdefault(i, len(interests)) for i in p.get("interests", [])] for p in personas]
+        interest_offsets = np.zeros(len(personas) + 1, dtype=np.int64)
+        np.cumsum([len(codes) for codes in interest_lists], out=interest_offsets[1:])
+        interest_codes = np.fromiter((c for codes in interest_lists for c in codes), dtype=np.int32,
+                                     count=int(interest_offsets[-1]))
+        ages = np.fromiter((p["age"] for p in personas), dtype=np.int16, count=len(personas))
+
+        encoded = [json.dumps(p, separators=(",", ":")).encode("utf-8") for p in personas]
+        record_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=record_offsets[1:])
+
+        columns = {"ages": ages, "occupation_codes": occupation_codes,
+                   "interest_offsets": interest_offsets, "interest_codes": interest_codes}
+        columns.update(cls._build_indexes(columns, len(occupations), len(interests)))
+        return cls(columns, list(occupations), list(interests), b"".join(encoded), record_offsets)
+
+    @staticmethod
+    def _build_indexes(columns, occupation_count, interest_count):
+        occupation_codes = columns["occupation_codes"]
+        interest_codes = columns["interest_codes"]
+        # Persona id owning each entry of interest_codes
+        interest_owner = np.repeat(np.arange(len(occupation_codes), dtype=np.int64), np.diff(columns["interest_offsets"]))
+        interest_sort = np.argsort(interest_codes, kind="stable")
+        age_order = np.argsort(columns["ages"], kind="stable")
+        return {
+            "age_order": age_order,
+            "ages_sorted": columns["ages"][age_order],
+            "occupation_order": np.argsort(occupation_codes, kind="stable"),
+            "occupation_postings": np.concatenate(([0], np.cumsum(np.bincount(occupation_codes, minlength=occupation_count)))),
+            "interest_order": interest_owner[interest_sort],
+            "interest_postings": np.concatenate(([0], np.cumsum(np.bincount(interest_codes, minlength=interest_count)))),
+        }
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_personas(json.load(f))
+
+    @classmethod
+    def open(cls, directory):
+        """Memory-maps a store written by `save`; nothing is read until it is used."""
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported persona store version in {directory}: {meta.get('version')}")
+        columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in meta["columns"]}
+        records_path = os.path.join(directory, "records.bin")
+        records = np.memmap(records_path, dtype=np.uint8, mode="r") if os.path.getsize(records_path) else b""
+        record_offsets = columns.pop("record_offsets")
+        return cls(columns, meta["occupations"], meta["interests"], records, record_offsets)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        columns = {
+            "ages": self.ages, "occupation_codes": self.occupation_codes,
+            "interest_offsets": self.interest_offsets, "interest_codes": self.interest_codes,
+            "age_order": self._age_order, "ages_sorted": self._ages_sorted,
+            "occupation_order": self._occupation_order, "occupation_postings": self._occupation_postings,
+            "interest_order": self._interest_order, "interest_postings": self._interest_postings,
+            "record_offsets": self._record_offsets,
+        }
+        for name, values in columns.items():
+            np.save(os.path.join(directory, f"{name}.npy"), np.asarray(values))
+        with open(os.path.join(directory, "records.bin"), "wb") as f:
+            f.write(bytes(self._records))
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "count": len(self), "columns": list(columns),
+                       "occupations": self.occupations, "interests": self.interests}, f)
+
+    def get(self, index):
+        """Materializes one persona as the dict it was stored from."""
+        start, end = int(self._record_offsets[index]), int(self._record_offsets[index + 1])
+        return json.loads(bytes(self._records[start:end]).decode("utf-8"))
+
+    def get_many(self, indices):
+        return [self.get(int(i)) for i in indices]
+
+    def age_range(self, min_age=None, max_age=None):
+        """Ids of personas with min_age <= age <= max_age (binary search on the age index)."""
+        lo = 0 if min_age is None else np.searchsorted(self._ages_sorted, min_age, side="left")
+        hi = len(self) if max_age is None else np.searchsorted(self._ages_sorted, max_age, side="right")
+        if (hi - lo) * 16 > len(self):
+            # Wide ranges: one vectorized scan beats sorting a large slice of the index
+            ages = self.ages
+            mask = np.ones(len(self), dtype=bool)
+            if min_age is not None:
+                mask &= ages >= min_age
+            if max_age is not None:
+                mask &= ages <= max_age
+            return np.flatnonzero(mask)
+        return np.sort(self._age_order[lo:hi])
+
+    def with_occupation(self, occupations):
+        return self._postings(occupations, self._occupation_lookup, self._occupation_order, self._occupation_postings)
+
+    def with_interest(self, interests):
+        return self._postings(interests, self._interest_lookup, self._interest_order, self._interest_postings)
+
+    @staticmethod
+    def _postings(values, lookup, order, postings):
+        if isinstance(values, str):
+            values = [values]
+        parts = [order[postings[code]:postings[code + 1]] for code in (lookup.get(v) for v in values) if code is not None]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(parts))
+
+    def filter(self, min_age=None, max_age=None, occupations=None, interests=None):
+        """
+        Sorted ids of personas matching every given criterion. `occupations` and
+        `interests` match any of the listed values.
+        """
+        result = None
+        if min_age is not None or max_age is not None:
+            result = self.age_range(min_age, max_age)
+        for ids in (self.with_occupation(occupations) if occupations else None,
+                    self.with_interest(interests) if interests else None):
+            if ids is not None:
+                result = ids if result is None else np.intersect1d(result, ids, assume_unique=True)
+        return np.arange(len(self)) if result is None else result
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_persona_store(path="personas.json"):
+    """
+    Returns the store for `path` (a personas JSON file or a converted store directory),
+    loading it at most once per process unless the file changes.
+    """
+    if os.path.isdir(path):
+        stamp = os.path.getmtime(os.path.join(path, "meta.json"))
+    else:
+        stamp = os.path.getmtime(path)
+    key = os.path.abspath(path)
+    with _stores_lock:
+        cached = _stores.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        store = PersonaStore.open(path) if os.path.isdir(path) else PersonaStore.from_json(path)
+        _stores[key] = (stamp, store)
+        return store
+
+
+def convert(json_path, directory):
+    store = PersonaStore.from_json(json_path)
+    store.save(directory)
+    return store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python persona_store.py <personas.json> <output_directory>")
+        sys.exit(1)
+    store = convert(sys.argv[1], sys.argv[2])
+    print(f"Converted {len(store)} personas to {sys.argv[2]}")
@@ -0,0 +1,144 @@
+import json
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Defaults apply to any model without an explicit entry in LLM_RATE_LIMITS,
+# e.g. LLM_RATE_LIMITS={"gemini-2.0-flash-lite-preview-02-05": {"rpm": 30, "tpm": 1000000}}
+DEFAULT_RPM = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "15"))
+DEFAULT_TPM = float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000"))
+
+MIN_RATE_FACTOR = 0.1   # never throttle below 10% of the configured budget
+RECOVERY_STEP = 0.05    # additive recovery per successful call after a 429
+MAX_COOLDOWN = 60.0     # seconds
+
+
+class TokenBucket:
+    """A bucket refilled continuously at `per_minute` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now, factor=1.0):
+        rate = self.per_minute * factor / 60.0
+        self.tokens = min(self.per_minute, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_time(self, amount, factor=1.0):
+        # Requests larger than the whole bucket are let through once it is full
+        amount = min(amount, self.per_minute)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / (self.per_minute * factor / 60.0)
+
+
+class _ModelBudget:
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.factor = 1.0
+        self.cooldown_until = 0.0
+        self.consecutive_throttles = 0
+
+
+class RateLimiter:
+    """
+    Process-wide requests/min and tokens/min budgets, one pair of token buckets per model.
+    On a 429 the model's effective rate is halved and calls pause for a cooldown;
+    each later success recovers the rate additively back to the configured budget.
+    """
+
+    def __init__(self, limits=None, default_rpm=DEFAULT_RPM, default_tpm=DEFAULT_TPM):
+        self.limits = limits if limits is not None else self._limits_from_env()
+        self.default_rpm = default_rpm
+        self.default_tpm = default_tpm
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _limits_from_env():
+        raw = os.getenv("LLM_RATE_LIMITS")
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            print("WARNING: LLM_RATE_LIMITS is not valid JSON, using default limits.")
+            return {}
+
+    def _budget(self, model_name):
+        budget = self._budgets.get(model_name)
+        if budget is None:
+            limits = self.limits.get(model_name, {})
+            budget = _ModelBudget(limits.get("rpm", self.default_rpm), limits.get("tpm", self.default_tpm))
+            self._budgets[model_name] = budget
+        return budget
+
+    def _try_acquire(self, model_name, tokens):
+        """Takes one request and `tokens` tokens if available; otherwise returns how long to wait."""
+        with self._lock:
+            budget = self._budget(model_name)
+            now = time.monotonic()
+            if now < budget.cooldown_until:
+                return budget.cooldown_until - now
+            budget.requests.refill(now, budget.factor)
+            budget.tokens.refill(now, budget.factor)
+            wait = max(budget.requests.wait_time(1, budget.factor), budget.tokens.wait_time(tokens, budget.factor))
+            if wait <= 0:
+                budget.requests.tokens -= 1
+                budget.tokens.tokens -= min(tokens, budget.tokens.per_minute)
+            return wait
+
+    def acquire(self, model_name, tokens=0):
+        """Blocks the calling thread until the model's budget allows one more call."""
+        while True:
+            wait = self._try_acquire(model_name, tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def settle(self, model_name, estimated_tokens, actual_tokens):
+        """Charges (or refunds) the difference once a call reports its real token usage."""
+        with self._lock:
+            budget = self._budget(model_name)
+            budget.tokens.tokens -= actual_tokens - estimated_tokens
+
+    def report_throttled(self, model_name):
+        with self._lock:
+            budget = self._budget(model_name)
+            budget.factor = max(MIN_RATE_FACTOR, budget.factor / 2)
+            budget.consecutive_throttles += 1
+            cooldown = min(MAX_COOLDOWN, 2 ** budget.consecutive_throttles)
+            budget.cooldown_until = time.monotonic() + cooldown
+        print(f"Rate limited on {model_name}: backing off {cooldown:.0f}s at {budget.factor:.0%} of budget.")
+
+    def report_success(self, model_name):
+        with self._lock:
+            budget = self._budget(model_name)
+            budget.consecutive_throttles = 0
+            budget.factor = min(1.0, budget.factor + RECOVERY_STEP)
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {"rate_factor": round(b.factor, 2), "requests_available": round(b.requests.tokens, 1)}
+                for name, b in self._budgets.items()
+            }
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Returns the limiter shared by every LLM call in this process."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
@@ -0,0 +1,97 @@
+"""
+Chunked lexical retrieval over an uploaded context document.
+
+The document is split into overlapping word windows and indexed with BM25, so each
+question only sends agents the few chunks that match it instead of the whole file.
+Indexes are cached per document hash for the life of the process.
+"""
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHUNK_WORDS = int(os.getenv("RETRIEVAL_CHUNK_WORDS", "200"))
+CHUNK_OVERLAP = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "40"))
+TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+MAX_CACHED_INDEXES = 16
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {"a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from", "how", "i", "if",
+             "in", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "what", "which",
+             "who", "why", "will", "with", "would", "you", "your"}
+
+
+def tokenize(text):
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Splits `text` into windows of `chunk_words` words, each overlapping the previous by `overlap`."""
+    words = text.split()
+    if len(words) <= chunk_words:
+        return [" ".join(words)] if words else []
+    step = max(1, chunk_words - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+class BM25Index:
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1, self.b = k1, b
+        self._lengths = []
+        self._postings = {}    # term -> [(chunk id, term frequency)]
+        for chunk_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            self._lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._postings.setdefault(term, []).append((chunk_id, tf))
+        self._avg_length = (sum(self._lengths) / len(chunks)) if chunks else 0.0
+        self._idf = {term: math.log(1 + (len(chunks) - len(p) + 0.5) / (len(p) + 0.5))
+                     for term, p in self._postings.items()}
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def search(self, query, k=TOP_K):
+        """Returns up to k (chunk id, score) pairs, best first. Only chunks sharing a term score."""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for chunk_id, tf in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / (self._avg_length or 1))
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def top_chunks(self, query, k=TOP_K):
+        """The k best chunks for `query` in document order, or the first k if nothing matches."""
+        ids = sorted(chunk_id for chunk_id, _ in self.search(query, k)) or list(range(min(k, len(self))))
+        return [self.chunks[i] for i in ids]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_document_index(text, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Returns the index for `text`, built at most once per process for the same document."""
+    key = (hashlib.sha256(text.encode("utf-8")).hexdigest(), chunk_words, overlap)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = BM25Index(chunk_text(text, chunk_words, overlap))
+            if len(_indexes) >= MAX_CACHED_INDEXES:
+                _indexes.pop(next(iter(_indexes)))
+            _indexes[key] = index
+        return index
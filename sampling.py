@@ -0,0 +1,164 @@
+"""
+Panel sampling over a PersonaStore.
+
+Everything works on arrays of persona ids, so selecting thousands of agents from
+millions of personas never loops over the population in Python. All samplers take
+a numpy Generator, and `sample_panel` builds one from `seed`, so a given seed always
+yields the same panel.
+"""
+import numpy as np
+
+# (lowest age, highest age) of each band used by `by="age_band"`
+AGE_BANDS = [(18, 29), (30, 39), (40, 49), (50, 59), (60, 120)]
+
+
+def make_rng(seed=None):
+    return np.random.default_rng(seed)
+
+
+def strata(store, by, age_bands=AGE_BANDS):
+    """
+    Returns (labels, code_of): the stratum labels for `by` ("age_band" or "occupation")
+    and a function mapping persona ids to stratum codes. Ids that fall in no
+    stratum get code len(labels).
+    """
+    if by == "age_band":
+        lows = np.array([lo for lo, _ in age_bands])
+        highs = np.array([hi for _, hi in age_bands])
+        labels = [f"{lo}-{hi}" for lo, hi in age_bands]
+
+        def code_of(ids):
+            ages = np.asarray(store.ages[ids])
+            codes = np.searchsorted(lows, ages, side="right") - 1
+            outside = (codes < 0) | (ages > highs[np.clip(codes, 0, None)])
+            codes[outside] = len(labels)
+            return codes
+        return labels, code_of
+    if by == "occupation":
+        return list(store.occupations), lambda ids: np.asarray(store.occupation_codes[ids], dtype=np.int64)
+    raise ValueError(f"Unknown stratification attribute: {by}")
+
+
+def allocate(n, shares):
+    """Splits n into integer counts proportional to `shares` (largest remainder method)."""
+    shares = np.asarray(shares, dtype=float)
+    if shares.sum() <= 0:
+        return np.zeros(len(shares), dtype=np.int64)
+    exact = shares / shares.sum() * n
+    counts = np.floor(exact).astype(np.int64)
+    remainder = n - counts.sum()
+    if remainder > 0:
+        counts[np.argsort(-(exact - counts), kind="stable")[:remainder]] += 1
+    return counts
+
+
+def sample_uniform(ids, n, rng):
+    ids = np.asarray(ids)
+    if n >= len(ids):
+        return rng.permutation(ids)
+    return ids[rng.choice(len(ids), n, replace=False)]
+
+
+def sample_weighted(ids, weights, n, rng):
+    """
+    Draws n ids without replacement with probability proportional to `weights`
+    (Efraimidis-Spirakis: the n smallest Exp(1)/w keys). Zero weights are never drawn.
+    """
+    ids = np.asarray(ids)
+    weights = np.asarray(weights, dtype=float)
+    with np.errstate(divide="ignore"):
+        keys = rng.exponential(size=len(ids)) / weights
+    eligible = int(np.count_nonzero(weights > 0))
+    n = min(n, eligible)
+    if n == 0:
+        return ids[:0]
+    chosen = np.argpartition(keys, n - 1)[:n] if n < len(ids) else np.arange(len(ids))
+    return rng.permutation(ids[chosen])
+
+
+def attribute_weights(store, ids, by, weights_by_label, default=1.0, age_bands=AGE_BANDS):
+    """Per-id weights from a {label: weight} mapping over an attribute's strata."""
+    labels, code_of = strata(store, by, age_bands)
+    table = np.full(len(labels) + 1, default, dtype=float)
+    for code, label in enumerate(labels):
+        table[code] = weights_by_label.get(label, default)
+    return table[code_of(ids)]
+
+
+def _take_quotas(candidates, codes, need):
+    """Keeps the first need[c] candidates of each stratum c, in candidate order."""
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    group_start = np.searchsorted(sorted_codes, np.arange(len(need)), side="left")
+    rank = np.arange(len(order)) - group_start[sorted_codes]
+    keep = rank < need[sorted_codes]
+    taken = np.bincount(sorted_codes[keep], minlength=len(need))
+    return order[keep], taken
+
+
+def sample_quota(store, ids, n, by="age_band", quotas=None, rng=None, age_bands=AGE_BANDS):
+    """
+    Draws n ids so each stratum gets its share of the panel, e.g.
+    quotas={"18-29": 0.4, "30-39": 0.3, "40-49": 0.3}. Strata missing from `quotas`
+    get no seats. If a stratum has too few members, its remaining seats go to
+    uniformly drawn ids from the other strata.
+    """
+    ids = np.asarray(ids)
+    rng = rng if rng is not None else make_rng()
+    labels, code_of = strata(store, by, age_bands)
+    need = np.zeros(len(labels) + 1, dtype=np.int64)
+    need[:len(labels)] = allocate(n, [quotas.get(label, 0) for label in labels])
+    return _fill_quotas(ids, code_of, need, n, rng)
+
+
+def sample_stratified(store, ids, n, by="age_band", rng=None, age_bands=AGE_BANDS):
+    """Proportional stratified draw: every stratum keeps its population share of the panel."""
+    ids = np.asarray(ids)
+    rng = rng if rng is not None else make_rng()
+    labels, code_of = strata(store, by, age_bands)
+    population = np.bincount(code_of(ids), minlength=len(labels) + 1)
+    return _fill_quotas(ids, code_of, allocate(n, population), n, rng)
+
+
+def _fill_quotas(ids, code_of, need, n, rng):
+    n = min(n, len(ids))
+    # A uniform random subset, scanned in random order, gives a uniform draw within each
+    # stratum. Start small and only grow to the full candidate set when a quota is short.
+    size = min(len(ids), max(4 * n, 1024))
+    while True:
+        candidates = ids[rng.choice(len(ids), size, replace=False)]
+        picked, taken = _take_quotas(candidates, code_of(candidates), need)
+        if (taken >= need).all() or size == len(ids):
+            break
+        size = min(len(ids), size * 4)
+
+    if len(picked) < n:
+        # Under-filled strata: top up with the next unpicked candidates (still uniform)
+        spare = np.ones(len(candidates), dtype=bool)
+        spare[picked] = False
+        picked = np.concatenate([picked, np.flatnonzero(spare)[:n - len(picked)]])
+    # Picks come grouped by stratum; shuffle so panel order (who speaks first) is random too
+    return rng.permutation(candidates[picked])
+
+
+def sample_panel(store, n, min_age=None, max_age=None, method="random", by="age_band",
+                 quotas=None, weights=None, seed=None, occupations=None, interests=None, age_bands=AGE_BANDS):
+    """
+    Selects a panel of up to n persona ids from `store`, in a random (seeded) order,
+    which is the order the agents speak in.
+
+    method: "random" (uniform), "quota" (fixed shares per `by` stratum, see sample_quota),
+    "stratified" (population shares per stratum) or "weighted" (`weights` is a
+    {label: weight} mapping over the `by` attribute).
+    """
+    rng = make_rng(seed)
+    ids = store.filter(min_age=min_age, max_age=max_age, occupations=occupations, interests=interests)
+    if method == "random":
+        return sample_uniform(ids, n, rng)
+    if method == "quota":
+        return sample_quota(store, ids, n, by=by, quotas=quotas or {}, rng=rng, age_bands=age_bands)
+    if method == "stratified":
+        return sample_stratified(store, ids, n, by=by, rng=rng, age_bands=age_bands)
+    if method == "weighted":
+        return sample_weighted(ids, attribute_weights(store, ids, by, weights or {}, age_bands=age_bands), n, rng)
+    raise ValueError(f"Unknown sampling method: {method}")
@@ -0,0 +1,158 @@
+"""
+Cache for the web_search tool.
+
+Results are kept in memory per normalized query (case, punctuation, word order and
+repeated words do not matter) for WEB_SEARCH_TTL_SECONDS, up to
+WEB_SEARCH_CACHE_SIZE queries (least recently used are dropped). When several agents
+search for the same thing at the same moment, only the first request goes out and
+the others wait for its result. Failed searches are not cached.
+
+WEB_SEARCH_MODE picks where results come from:
+    live    - DuckDuckGo (default)
+    record  - DuckDuckGo, and every result is also saved to WEB_SEARCH_FIXTURES
+    replay  - only WEB_SEARCH_FIXTURES; queries not recorded find no results (offline)
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SEARCH_TTL = float(os.getenv("WEB_SEARCH_TTL_SECONDS", "3600"))
+SEARCH_CACHE_SIZE = int(os.getenv("WEB_SEARCH_CACHE_SIZE", "512"))
+SEARCH_MODE = os.getenv("WEB_SEARCH_MODE", "live")
+SEARCH_FIXTURES = os.getenv("WEB_SEARCH_FIXTURES", "fixtures/web_search.json")
+
+
+def normalize_query(query):
+    """
+    'Smart  Mug, price?' becomes 'smart mug price'. Word order is kept: it changes what
+    a search engine returns ('flights paris london' vs 'flights london paris').
+    """
+    words = re.findall(r"[\w$%+#.-]+", str(query).lower())
+    return " ".join(w for w in (w.strip(".-") for w in words) if w)
+
+
+class SearchCache:
+    """Thread-safe TTL/LRU cache of search results with in-flight request coalescing."""
+
+    def __init__(self, ttl=SEARCH_TTL, max_entries=SEARCH_CACHE_SIZE, mode=SEARCH_MODE, fixtures_path=SEARCH_FIXTURES):
+        if mode not in ("live", "record", "replay"):
+            print(f"WARNING: Unknown WEB_SEARCH_MODE '{mode}', using live search.")
+            mode = "live"
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.mode = mode
+        self.fixtures_path = fixtures_path
+        self._entries = OrderedDict()    # key -> (stored_at, results)
+        self._in_flight = {}             # key -> Future
+        self._lock = threading.Lock()
+        self._fixtures = None
+        self._fixtures_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def search(self, query, limit, fetch):
+        """
+        Results (a list of dicts with title/href/body) for `query`. `fetch(query, limit)`
+        does the live search when the results are neither cached nor already being fetched.
+        """
+        key = f"{normalize_query(query)}\0{limit}"
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            pending = self._in_flight.get(key)
+            if pending is None:
+                self.misses += 1
+                pending = self._in_flight[key] = Future()
+                owner = True
+            else:
+                self.coalesced += 1
+                owner = False
+        if not owner:
+            return pending.result()
+
+        try:
+            results = self._fetch(query, limit, fetch)
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            pending.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            self._entries[key] = (time.time(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        pending.set_result(results)
+        return results
+
+    def _fetch(self, query, limit, fetch):
+        if self.mode == "replay":
+            return self._load_fixtures().get(normalize_query(query), [])[:limit]
+        results = list(fetch(query, limit) or [])
+        if self.mode == "record":
+            self._record(normalize_query(query), results)
+        return results
+
+    def _load_fixtures(self):
+        with self._fixtures_lock:
+            if self._fixtures is None:
+                try:
+                    with open(self.fixtures_path, "r", encoding="utf-8") as f:
+                        self._fixtures = json.load(f)
+                except FileNotFoundError:
+                    if self.mode == "replay":
+                        print(f"WARNING: {self.fixtures_path} not found; web_search will find no results.")
+                    self._fixtures = {}
+            return self._fixtures
+
+    def _record(self, normalized, results):
+        fixtures = self._load_fixtures()
+        with self._fixtures_lock:
+            fixtures[normalized] = results
+            directory = os.path.dirname(self.fixtures_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.fixtures_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(fixtures, f, indent=2, sort_keys=True)
+            os.replace(self.fixtures_path + ".tmp", self.fixtures_path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "mode": self.mode,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """Returns the process-wide search cache."""
+    global _search_cache
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SearchCache()
+        return _search_cache
@@ -0,0 +1,102 @@
+"""
+Local, batched sentiment scoring.
+
+`SentimentEngine.score(responses)` scores every agent's response to a question with
+TextBlob's sentiment analyzer (the one behind mcp_server.get_sentiment, so negations,
+modifiers and exclamations are handled exactly as there) and aggregates the panel in
+one vectorized pass. It returns per-agent scores, the aggregate on the 1-10 scale
+used by the reports, and a confidence estimate for the aggregate label. The simulation only asks
+the LLM for a sentiment summary when that confidence is below
+SENTIMENT_MIN_CONFIDENCE or a narrative summary is requested (SENTIMENT_MODE).
+"""
+import math
+import os
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "auto": local scores, LLM only when unsure; "llm": always the LLM's narrative summary; "local": never the LLM
+SENTIMENT_MODE = os.getenv("SENTIMENT_MODE", "auto")
+MIN_CONFIDENCE = float(os.getenv("SENTIMENT_MIN_CONFIDENCE", "0.6"))
+
+# Same thresholds as mcp_server.get_sentiment
+LABEL_THRESHOLD = 0.1
+
+
+def polarity_to_score(polarity):
+    """-1..1 polarity on the reports' 1-10 scale (0 -> 5)."""
+    return round(min(10.0, max(1.0, 5.0 + 5.0 * float(polarity))), 1)
+
+
+def polarity_label(polarity):
+    if polarity > LABEL_THRESHOLD:
+        return "Positive"
+    if polarity < -LABEL_THRESHOLD:
+        return "Negative"
+    return "Neutral"
+
+
+class SentimentEngine:
+    def __init__(self):
+        from textblob.en import sentiment as lexicon
+        lexicon.load()
+        self._lexicon = lexicon
+
+    def polarities(self, texts):
+        """(polarity, subjectivity, sentiment phrase count) arrays, one entry per text."""
+        scores = [self._lexicon(str(text)) for text in texts]
+        return (np.array([s[0] for s in scores], dtype=float),
+                np.array([s[1] for s in scores], dtype=float),
+                np.array([len(s.assessments) for s in scores], dtype=int))
+
+    def score(self, responses):
+        """
+        `responses` is a list of (agent, text). Returns per-agent scores, the aggregate
+        score/label, and `confidence` (0-1) that the aggregate label is right: how many
+        standard errors the mean polarity lies from the nearest label threshold, scaled
+        by the share of responses that contain any sentiment words.
+        """
+        if not responses:
+            return {"score": 5.0, "label": "Neutral", "polarity": 0.0, "confidence": 0.0, "agents": {}}
+        polarity, subjectivity, counts = self.polarities([text for _, text in responses])
+        mean = float(polarity.mean())
+        n = len(polarity)
+        stderr = max(float(polarity.std(ddof=1)) / math.sqrt(n) if n > 1 else 0.5, 0.05)
+        margin = min(abs(mean - LABEL_THRESHOLD), abs(mean + LABEL_THRESHOLD))
+        coverage = float((counts > 0).mean())
+        confidence = coverage * min(1.0, margin / stderr / 2.0)
+        return {
+            "score": polarity_to_score(mean),
+            "label": polarity_label(mean),
+            "polarity": round(mean, 3),
+            "confidence": round(confidence, 3),
+            "agents": {agent: {"score": polarity_to_score(p), "label": polarity_label(p),
+                               "polarity": round(float(p), 3), "subjectivity": round(float(s), 3)}
+                       for (agent, _), p, s in zip(responses, polarity, subjectivity)},
+        }
+
+    def summarize(self, scored):
+        """A one-line summary from the scores, used in place of the LLM's."""
+        agents = scored["agents"]
+        counts = {label: sum(a["label"] == label for a in agents.values()) for label in ("Positive", "Neutral", "Negative")}
+        summary = (f"Participants were mostly {scored['label'].lower()} "
+                   f"({counts['Positive']} positive, {counts['Neutral']} neutral, {counts['Negative']} negative).")
+        if len(agents) > 1:
+            ranked = sorted(agents, key=lambda name: agents[name]["polarity"])
+            summary += f" Most positive: {ranked[-1]}; most negative: {ranked[0]}."
+        return summary
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_sentiment_engine():
+    """Returns the process-wide engine (the lexicon is loaded once)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = SentimentEngine()
+        return _engine
@@ -1,48 +1,442 @@
 import os
 import json
+import gzip
+import hashlib
+import threading
 import uuid
 from TinyTroupe.agent import TinyPerson
+from sqlite_session_store import DB_FILE, SQLiteSessionStore
 
 SESSION_DIR = "sessions"
+# "journal" (files per session, the default) or "sqlite" (sqlite_session_store.py)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "journal")
+SNAPSHOT_FILE = "snapshot.json.gz"
+JOURNAL_FILE = "journal.jsonl.gz"
+FORK_FILE = "fork.json"      # in a child: {"parent": ..., "parent_seq": ...}
+PINS_FILE = "forks.json"     # in a parent: journal seqs its children were forked at
+
+# Fold the journal into a new snapshot once it has this many records,
+# or once it is larger than the snapshot itself
+COMPACT_AFTER_RECORDS = 50
+
+# Lists shorter than this are compared whole; longer ones (episodic memory) are compared
+# item by item, so appends and in-place edits are journaled without the unchanged items
+APPEND_ONLY_MIN_LENGTH = 32
+
+# Per session directory: shape of the last saved state, last journal seq, the seq folded
+# into the snapshot and the files' stamp. Shared by every SessionManager in the process.
+_saved = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+# Decoded parent states that forks are built on, keyed by (parent path, seq). Kept as
+# JSON text so each child gets its own copy from a cheap json.loads.
+_base_states = {}
+MAX_BASE_STATES = 8
+
+
+def _session_lock(path):
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def _fingerprint(value):
+    # A stable digest: shapes are compared across saves, and hash() of a str is salted per process
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode("utf-8")).digest()
+
+
+def _shape(value):
+    """A compact summary of `value` that is enough to diff a later version against it."""
+    if isinstance(value, dict):
+        return {"d": {k: _shape(v) for k, v in value.items()}}
+    if isinstance(value, list) and len(value) >= APPEND_ONLY_MIN_LENGTH:
+        return {"l": [_fingerprint(item) for item in value]}
+    return {"v": _fingerprint(value)}
+
+
+def _diff(shape, value):
+    """
+    Returns a patch turning the state summarized by `shape` into `value`, or None if
+    nothing changed. Long lists are patched with just their edited and new items.
+    """
+    if "d" in shape and isinstance(value, dict):
+        changes = {}
+        for key, item in value.items():
+            if key in shape["d"]:
+                patch = _diff(shape["d"][key], item)
+            else:
+                patch = {"set": item}
+            if patch is not None:
+                changes[key] = patch
+        removed = [key for key in shape["d"] if key not in value]
+        if not changes and not removed:
+            return None
+        patch = {"dict": changes}
+        if removed:
+            patch["del"] = removed
+        return patch
+    if "l" in shape and isinstance(value, list):
+        old = shape["l"]
+        if len(value) < len(old):
+            return {"set": value}
+        edits = {str(i): value[i] for i, digest in enumerate(old) if _fingerprint(value[i]) != digest}
+        if len(edits) > len(old) // 2:
+            return {"set": value}
+        patch = {}
+        if edits:
+            patch["edit"] = edits
+        if len(value) > len(old):
+            patch["append"] = value[len(old):]
+        return patch or None
+    if "v" in shape and _fingerprint(value) == shape["v"]:
+        return None
+    return {"set": value}
+
+
+def _apply(value, patch):
+    if "set" in patch:
+        return patch["set"]
+    if "edit" in patch or "append" in patch:
+        for index, item in patch.get("edit", {}).items():
+            value[int(index)] = item
+        value.extend(patch.get("append", []))
+        return value
+    for key, item_patch in patch.get("dict", {}).items():
+        value[key] = _apply(value.get(key), item_patch) if key in value else item_patch.get("set")
+    for key in patch.get("del", []):
+        value.pop(key, None)
+    return value
+
 
 class SessionManager:
-    def __init__(self):
-        if not os.path.exists(SESSION_DIR):
-            os.makedirs(SESSION_DIR)
-
-    def save_session(self, session_id, agents, world_state=None):
-        """Saves the current session state to a JSON file."""
-        data = {
-            "session_id": session_id,
-            "agents": [agent.to_dict() for agent in agents],
-            "world_state": world_state or {}
+    """
+    Stores each session as a compressed snapshot plus an append-only, compressed journal
+    of changes (`sessions/<id>/`). Saving appends only what changed since the last save,
+    which for agents is mostly their new episodic-memory events; a background thread
+    periodically folds the journal into a fresh snapshot. Loading replays both.
+    Sessions written by older versions as `sessions/<id>.json` are still readable and
+    are migrated on their next save.
+
+    `fork_session` creates a child that shares its parent's state as of the fork: the
+    child directory holds only a pointer to the parent's journal position plus the
+    child's own journal, and the parent keeps the journal records the child needs.
+
+    With backend="sqlite" the same API is served by SQLiteSessionStore instead, which
+    indexes session metadata and hydrates agents lazily.
+    """
+
+    def __init__(self, session_dir=SESSION_DIR, backend=None):
+        self.session_dir = session_dir
+        self.backend = backend or SESSION_BACKEND
+        if not os.path.exists(session_dir):
+            os.makedirs(session_dir)
+        self._store = SQLiteSessionStore(os.path.join(session_dir, DB_FILE)) if self.backend == "sqlite" else None
+
+    def _path(self, session_id, filename=None):
+        directory = os.path.join(self.session_dir, session_id)
+        return os.path.join(directory, filename) if filename else directory
+
+    def _legacy_path(self, session_id):
+        return os.path.join(self.session_dir, f"{session_id}.json")
+
+    @staticmethod
+    def _state(agents, world_state):
+        return {
+            "order": [agent.name for agent in agents],
+            "agents": {agent.name: agent.to_dict() for agent in agents},
+            "world_state": world_state or {},
         }
-        
-        filepath = os.path.join(SESSION_DIR, f"{session_id}.json")
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-        print(f"Session saved to {filepath}")
+
+    def save_session(self, session_id, agents, world_state=None, last_question=None):
+        """Saves the current session state, appending only the changes since the last save."""
+        if self._store:
+            return self._store.save_session(session_id, agents, world_state, last_question)
+        state = self._state(agents, world_state)
+        key = self._path(session_id)
+        with _session_lock(key):
+            saved = _saved.get(key)
+            if saved is not None and saved.get("stamp") != self._stamp(session_id):
+                saved = None  # another process wrote this session since we last did
+            if saved is None and self._exists(session_id):
+                _, saved = self._read(session_id)
+
+            if saved is None or not self._has_base(session_id):
+                # New (or legacy single-file) session: start with a full snapshot
+                self._write_snapshot(session_id, state, seq=0)
+                saved = {"seq": 0, "snapshot_seq": 0}
+                print(f"Session saved to {self._path(session_id)}")
+            else:
+                patch = _diff(saved["shape"], state)
+                if patch is not None:
+                    saved["seq"] += 1
+                    self._append(session_id, {"seq": saved["seq"], "patch": patch})
+                print(f"Session journaled to {self._path(session_id, JOURNAL_FILE)}")
+            saved["shape"] = _shape(state)
+
+            if os.path.exists(self._legacy_path(session_id)):
+                os.remove(self._legacy_path(session_id))
+            saved["stamp"] = self._stamp(session_id)
+            _saved[key] = saved
+            needs_compaction = self._needs_compaction(session_id, saved)
+
+        if needs_compaction:
+            threading.Thread(target=self.compact_session, args=(session_id,), daemon=True).start()
 
     def load_session(self, session_id):
-        """Loads a session from a JSON file."""
-        filepath = os.path.join(SESSION_DIR, f"{session_id}.json")
-        if not os.path.exists(filepath):
-            raise FileNotFoundError(f"Session file {filepath} not found.")
-        
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        
+        """Loads a session by replaying its snapshot and journal."""
+        if self._store:
+            return self._store.load_session(session_id)
+        if not self._exists(session_id):
+            raise FileNotFoundError(f"Session {session_id} not found in {self.session_dir}.")
+
+        key = self._path(session_id)
+        with _session_lock(key):
+            state, saved = self._read(session_id)
+            _saved[key] = saved
+
         agents = []
-        for agent_data in data["agents"]:
-            agents.append(TinyPerson.from_dict(agent_data))
-            
-        return agents, data.get("world_state", {})
+        for name in state["order"]:
+            agents.append(TinyPerson.from_dict(state["agents"][name]))
+
+        return agents, state.get("world_state", {})
 
     def list_sessions(self):
         """Lists all available session IDs."""
-        if not os.path.exists(SESSION_DIR):
+        if self._store:
+            return self._store.list_sessions()
+        if not os.path.exists(self.session_dir):
             return []
-        return [f.replace(".json", "") for f in os.listdir(SESSION_DIR) if f.endswith(".json")]
+        sessions = []
+        for entry in os.listdir(self.session_dir):
+            if entry.endswith(".json"):
+                sessions.append(entry.replace(".json", ""))
+            elif self._has_base(entry):
+                sessions.append(entry)
+        return sessions
 
     def create_session_id(self):
         return str(uuid.uuid4())
+
+    def session_info(self, limit=100, offset=0):
+        """Session metadata, newest first (indexed with the sqlite backend)."""
+        if self._store:
+            return self._store.session_info(limit, offset)
+        infos = []
+        for session_id in self.list_sessions():
+            path = self._path(session_id) if os.path.isdir(self._path(session_id)) else self._legacy_path(session_id)
+            infos.append({"session_id": session_id, "updated_at": os.path.getmtime(path)})
+        infos.sort(key=lambda info: info["updated_at"], reverse=True)
+        return infos[offset:offset + limit]
+
+    def fork_session(self, parent_id, child_id=None):
+        """
+        Creates a child session that starts from the parent's current state without
+        copying it. Returns the child's session ID.
+        """
+        if self._store:
+            return self._store.fork_session(parent_id, child_id or self.create_session_id())
+        if not self._exists(parent_id):
+            raise FileNotFoundError(f"Session {parent_id} not found in {self.session_dir}.")
+        child_id = child_id or self.create_session_id()
+
+        with _session_lock(self._path(parent_id)):
+            if not self._has_base(parent_id):
+                # Legacy single-file parent: give it a snapshot to fork from
+                state, _ = self._read(parent_id)
+                self._write_snapshot(parent_id, state, seq=0)
+                os.remove(self._legacy_path(parent_id))
+            parent_seq = self._current_seq(parent_id)
+            pins = self._pins(parent_id)
+            pins.append({"child": child_id, "seq": parent_seq})
+            self._write_json(self._path(parent_id, PINS_FILE), pins)
+
+        os.makedirs(self._path(child_id), exist_ok=True)
+        self._write_json(self._path(child_id, FORK_FILE), {"parent": parent_id, "parent_seq": parent_seq})
+        print(f"Forked session {parent_id} (seq {parent_seq}) into {child_id}")
+        return child_id
+
+    def compact_session(self, session_id):
+        """
+        Folds the journal into a new snapshot. Records that forks of this session still
+        build on stay in the journal; compacting a fork makes it self-contained.
+        """
+        if self._store:
+            return
+        key = self._path(session_id)
+        fork = self._fork_info(session_id)
+        with _session_lock(key):
+            journal = self._path(session_id, JOURNAL_FILE)
+            if not os.path.exists(journal):
+                return
+            _, last_seq, snapshot_seq = self._replay(session_id)
+            fold_to = self._foldable_seq(session_id, snapshot_seq, last_seq)
+            if fold_to <= snapshot_seq and self._has_snapshot(session_id):
+                return
+            state, _, _ = self._replay(session_id, upto=fold_to)
+            # The snapshot records the last folded seq, so a crash before the journal is
+            # rewritten cannot apply those records twice
+            self._write_snapshot(session_id, state, fold_to)
+            remaining = [r for r in self._journal_records(session_id) if r["seq"] > fold_to]
+            if remaining:
+                tmp_path = journal + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    for record in remaining:
+                        f.write(gzip.compress((json.dumps(record) + "\n").encode("utf-8")))
+                os.replace(tmp_path, journal)
+            else:
+                os.remove(journal)
+            if key in _saved:
+                _saved[key].update(snapshot_seq=fold_to, stamp=self._stamp(session_id))
+
+        if fork and self._has_snapshot(session_id):
+            # No longer reads through the parent, so release the parent's journal records
+            with _session_lock(self._path(fork["parent"])):
+                pins = [p for p in self._pins(fork["parent"]) if p["child"] != session_id]
+                self._write_json(self._path(fork["parent"], PINS_FILE), pins)
+
+    # --- Storage ---
+
+    def _exists(self, session_id):
+        return self._has_base(session_id) or os.path.exists(self._legacy_path(session_id))
+
+    def _has_snapshot(self, session_id):
+        return os.path.exists(self._path(session_id, SNAPSHOT_FILE))
+
+    def _has_base(self, session_id):
+        """True once the session has a snapshot or is a fork of another session."""
+        return self._has_snapshot(session_id) or os.path.exists(self._path(session_id, FORK_FILE))
+
+    def _fork_info(self, session_id):
+        path = self._path(session_id, FORK_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _pins(self, session_id):
+        path = self._path(session_id, PINS_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _foldable_seq(self, session_id, snapshot_seq, last_seq):
+        """The highest seq compaction may fold without dropping records a fork needs."""
+        pinned = [p["seq"] for p in self._pins(session_id) if p["seq"] >= snapshot_seq]
+        return min(pinned + [last_seq])
+
+    def _current_seq(self, session_id):
+        saved = _saved.get(self._path(session_id))
+        if saved is not None and saved.get("stamp") == self._stamp(session_id):
+            return saved["seq"]
+        records = self._journal_records(session_id)
+        if records:
+            return records[-1]["seq"]
+        return self._replay(session_id)[1]
+
+    def _base_state(self, parent_id, parent_seq):
+        """The parent's state as of `parent_seq`, decoded once per process."""
+        key = (self._path(parent_id), parent_seq)
+        text = _base_states.get(key)
+        if text is None:
+            state, _, _ = self._replay(parent_id, upto=parent_seq)
+            text = json.dumps(state)
+            if len(_base_states) >= MAX_BASE_STATES:
+                _base_states.pop(next(iter(_base_states)))
+            _base_states[key] = text
+        return json.loads(text)
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _stamp(self, session_id):
+        """Changes whenever the snapshot is rewritten or the journal grows."""
+        stamp = []
+        for filename in (SNAPSHOT_FILE, JOURNAL_FILE):
+            path = self._path(session_id, filename)
+            stamp.append(os.stat(path).st_mtime_ns if os.path.exists(path) else 0)
+            stamp.append(os.path.getsize(path) if os.path.exists(path) else 0)
+        return stamp
+
+    def _read(self, session_id):
+        state, seq, snapshot_seq = self._replay(session_id)
+        return state, {"shape": _shape(state), "seq": seq, "snapshot_seq": snapshot_seq,
+                       "stamp": self._stamp(session_id)}
+
+    def _replay(self, session_id, upto=None):
+        """
+        Returns (state, last applied seq, snapshot seq) from snapshot + journal (records
+        up to `upto` only, if given), from the parent's state for a fork, or from a
+        legacy JSON file.
+        """
+        snapshot_path = self._path(session_id, SNAPSHOT_FILE)
+        fork = None if os.path.exists(snapshot_path) else self._fork_info(session_id)
+        if fork:
+            state, seq = self._base_state(fork["parent"], fork["parent_seq"]), 0
+        elif os.path.exists(snapshot_path):
+            with gzip.open(snapshot_path, "rt", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            state, seq = snapshot["state"], snapshot["seq"]
+        else:
+            with open(self._legacy_path(session_id), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return self._state_from_dicts(data["agents"], data.get("world_state")), 0, 0
+
+        snapshot_seq = seq
+        if upto is not None and upto < snapshot_seq:
+            raise ValueError(f"Session {session_id} was compacted past seq {upto}.")
+        for record in self._journal_records(session_id):
+            if record["seq"] > seq and (upto is None or record["seq"] <= upto):
+                state = _apply(state, record["patch"])
+                seq = record["seq"]
+        return state, seq, snapshot_seq
+
+    @staticmethod
+    def _state_from_dicts(agent_dicts, world_state):
+        return {
+            "order": [a["name"] for a in agent_dicts],
+            "agents": {a["name"]: a for a in agent_dicts},
+            "world_state": world_state or {},
+        }
+
+    def _journal_records(self, session_id):
+        journal = self._path(session_id, JOURNAL_FILE)
+        if not os.path.exists(journal):
+            return []
+        records = []
+        try:
+            with gzip.open(journal, "rt", encoding="utf-8") as f:
+                for line in f:
+                    records.append(json.loads(line))
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError):
+            # A save interrupted mid-write leaves a truncated last record; keep the rest
+            print(f"WARNING: Ignoring truncated journal tail for session {session_id}.")
+        return records
+
+    def _append(self, session_id, record):
+        # Each record is its own gzip member; concatenated members read back as one stream
+        with open(self._path(session_id, JOURNAL_FILE), "ab") as f:
+            f.write(gzip.compress((json.dumps(record) + "\n").encode("utf-8")))
+
+    def _write_snapshot(self, session_id, state, seq):
+        os.makedirs(self._path(session_id), exist_ok=True)
+        path = self._path(session_id, SNAPSHOT_FILE)
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"session_id": session_id, "seq": seq, "state": state}, f)
+        os.replace(tmp_path, path)
+
+    def _needs_compaction(self, session_id, saved):
+        journal = self._path(session_id, JOURNAL_FILE)
+        if not os.path.exists(journal):
+            return False
+        foldable = self._foldable_seq(session_id, saved["snapshot_seq"], saved["seq"]) - saved["snapshot_seq"]
+        if foldable >= COMPACT_AFTER_RECORDS:
+            return True
+        # A fork without a snapshot is only materialized once its own journal is long
+        return (foldable > 0 and self._has_snapshot(session_id)
+                and os.path.getsize(journal) > os.path.getsize(self._path(session_id, SNAPSHOT_FILE)))
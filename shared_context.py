@@ -0,0 +1,184 @@
+"""
+Shared context segments.
+
+Large text that every agent should see (the session's broadcast context) is
+registered once and referred to as `[[shared-context:<hash>]]`. Agents' memories and
+session files only hold the reference; llm_client expands it when a prompt is sent.
+On Gemini, segments large enough for context caching are uploaded once per model as
+cached content instead of being resent with every prompt.
+"""
+import datetime
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REF_PATTERN = re.compile(r"\[\[shared-context:([0-9a-f]{16})\]\]")
+# Gemini only caches contexts above a minimum size; smaller segments are sent inline
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "32768"))
+CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "3600"))
+# After a failed upload, a model's segments are sent inline for this long before caching is tried again
+CONTEXT_CACHE_RETRY = int(os.getenv("CONTEXT_CACHE_RETRY_SECONDS", "300"))
+# Registered segments are kept up to this many characters; the least recently used go first.
+# (Sessions persist their segments in world_state, so an evicted one comes back on resume.)
+SHARED_CONTEXT_MAX_CHARS = int(os.getenv("SHARED_CONTEXT_MAX_MB", "256")) * 1024 * 1024
+CACHED_PLACEHOLDER = "(the shared context document provided at the start of this conversation)"
+
+
+def reference(key):
+    return f"[[shared-context:{key}]]"
+
+
+class SharedContext:
+    def __init__(self, max_chars=SHARED_CONTEXT_MAX_CHARS):
+        self.max_chars = max_chars
+        self._segments = OrderedDict()   # key -> text, least recently used first
+        self._chars = 0
+        self._lock = threading.Lock()
+        # (model name, key, instruction, tools) -> (CachedContent, expiry)
+        self._cached = {}
+        self._in_flight = {}       # same key -> Future of the CachedContent (None if the upload failed)
+        self._unavailable = {}     # model name -> time until which caching is not retried
+
+    def register(self, text):
+        """Stores `text` once and returns the reference to put in prompts and memories."""
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            self._store(key, text)
+        return reference(key)
+
+    def load(self, segments):
+        """Registers segments persisted by `segments()` (e.g. from a session's world_state)."""
+        with self._lock:
+            for key, text in segments.items():
+                self._store(key, text)
+
+    def _store(self, key, text):
+        if key in self._segments:
+            self._segments.move_to_end(key)
+            return
+        self._segments[key] = text
+        self._chars += len(text)
+        # The newest segment always stays, however large
+        while self._chars > self.max_chars and len(self._segments) > 1:
+            old_key, old_text = self._segments.popitem(last=False)
+            self._chars -= len(old_text)
+            for cache_key in [k for k in self._cached if k[1] == old_key]:
+                del self._cached[cache_key]
+
+    def _get(self, key):
+        with self._lock:
+            text = self._segments.get(key)
+            if text is not None:
+                self._segments.move_to_end(key)
+            return text
+
+    def segments(self, keys=None):
+        with self._lock:
+            if keys is None:
+                return dict(self._segments)
+            return {k: self._segments[k] for k in keys if k in self._segments}
+
+    def keys_in(self, text):
+        return REF_PATTERN.findall(text)
+
+    def expand(self, prompt, replacements=None):
+        """Returns `prompt` (a string, or lists/dicts of strings) with references expanded."""
+        if isinstance(prompt, str):
+            if "[[shared-context:" not in prompt:
+                return prompt
+            return REF_PATTERN.sub(lambda m: self._text(m.group(1), replacements), prompt)
+        if isinstance(prompt, list):
+            return [self.expand(p, replacements) for p in prompt]
+        if isinstance(prompt, dict):
+            return {k: self.expand(v, replacements) for k, v in prompt.items()}
+        return prompt
+
+    def _text(self, key, replacements):
+        if replacements and key in replacements:
+            return replacements[key]
+        text = self._get(key)
+        if text is None:
+            print(f"WARNING: Unknown shared context segment {key}; sending the reference as is.")
+            return reference(key)
+        return text
+
+    def prepare(self, model, name, prompt, estimate_tokens):
+        """
+        Returns the (model, prompt) to send. A single large segment goes into Gemini
+        context caching when the model supports it; everything else is expanded inline.
+        """
+        keys = set(self.keys_in(prompt)) if isinstance(prompt, str) else set()
+        if len(keys) == 1:
+            key = keys.pop()
+            text = self._get(key)
+            if text is not None and estimate_tokens(text) >= CONTEXT_CACHE_MIN_TOKENS:
+                cached_model = self._cached_model(model, name, key, text)
+                if cached_model is not None:
+                    return cached_model, self.expand(prompt, {key: CACHED_PLACEHOLDER})
+        return model, self.expand(prompt)
+
+    def _cached_model(self, model, name, key, text):
+        """A model reading `text` from Gemini's context cache, with `model`'s settings; None to send it inline."""
+        import google.generativeai as genai
+
+        cached = self._cached_content(model, name, key, text)
+        if cached is None:
+            return None
+        return genai.GenerativeModel.from_cached_content(
+            cached_content=cached,
+            generation_config=getattr(model, "_generation_config", None),
+            safety_settings=getattr(model, "_safety_settings", None))
+
+    def _cached_content(self, model, name, key, text):
+        # The system instruction and tools are part of the cached content, so part of its key
+        system_instruction = getattr(model, "_system_instruction", None)
+        tools = getattr(model, "_tools", None)
+        tool_config = getattr(model, "_tool_config", None)
+        cache_key = (name, key, repr(system_instruction), repr(tools.to_proto() if tools else None), repr(tool_config))
+        with self._lock:
+            if self._unavailable.get(name, 0) > time.time():
+                return None
+            entry = self._cached.get(cache_key)
+            if entry and entry[1] > time.time():
+                return entry[0]
+            # One upload per segment; concurrent prompts wait for it instead of uploading again
+            pending = self._in_flight.get(cache_key)
+            owner = pending is None
+            if owner:
+                pending = self._in_flight[cache_key] = Future()
+        if not owner:
+            return pending.result()
+
+        from google.generativeai import caching
+        cached = None
+        try:
+            cached = caching.CachedContent.create(
+                model=f"models/{name}", contents=[text], system_instruction=system_instruction,
+                tools=tools, tool_config=tool_config, ttl=datetime.timedelta(seconds=CONTEXT_CACHE_TTL))
+        except Exception as e:
+            print(f"Context caching unavailable for {name} ({e}); sending context inline "
+                  f"for the next {CONTEXT_CACHE_RETRY}s.")
+        finally:
+            with self._lock:
+                del self._in_flight[cache_key]
+                if cached is None:
+                    self._unavailable[name] = time.time() + CONTEXT_CACHE_RETRY
+                else:
+                    # Renew a little before the server drops it
+                    self._cached[cache_key] = (cached, time.time() + CONTEXT_CACHE_TTL * 0.9)
+            pending.set_result(cached)
+        return cached
+
+
+_shared_context = SharedContext()
+
+
+def get_shared_context():
+    return _shared_context
@@ -2,6 +2,7 @@ import asyncio
 import json
 import os
 import sys
+import time
 from dotenv import load_dotenv
 import google.generativeai as genai
 
@@ -16,7 +17,7 @@ print(f"DEBUG: tinytroupe exists: {os.path.exists('tinytroupe')}")
 print(f"DEBUG: tinytroupe/__init__.py exists: {os.path.exists('tinytroupe/__init__.py')}")
 
 # Check for API keys
-if not os.getenv("GEMINI_API_KEY"):
+if not os.getenv("GEMINI_API_KEY") and os.getenv("LLM_BACKEND", "gemini") != "mock":
     print("WARNING: GEMINI_API_KEY not found in .env.")
     print("TinyTroupe requires an LLM to function.")
     # We'll proceed, but it might fail if not configured globally elsewhere.
@@ -25,8 +26,8 @@ try:
     from TinyTroupe.agent import TinyPerson
     from TinyTroupe.environment import TinyWorld
     from TinyTroupe.factory import TinyPersonFactory
+    from TinyTroupe.protocol import Message
     import TinyTroupe.utils as utils
-    from TinyTroupe.utils import generate_content_with_retry
 except ImportError as e:
     print(f"Error: TinyTroupe not found or import failed. Details: {e}")
     import traceback
@@ -37,15 +38,33 @@ from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 from mcp_server import web_search, get_sentiment # Import local tools
 from session_manager import SessionManager
-from observability import StructuredLogger, Metrics
-from evaluator import Evaluator
+from persona_store import get_persona_store
+from sampling import sample_panel
+from tracing import current_span, span, trace
+from observability import METRICS_FILE, StructuredLogger, agent_context, get_metrics, timed_tool
+from evaluator import CRITERIA, EVAL_MODE, Evaluator
+from memory_policy import MemoryPolicy
+from shared_context import get_shared_context
+from retrieval import TOP_K, get_document_index
+from sentiment import MIN_CONFIDENCE, SENTIMENT_MODE, get_sentiment_engine
+from usage import UsageTracker, current_tracker, track_usage, usage_question
+from simulation_events import (AgentResponse, BudgetExceeded, EvaluationScore, QuestionSentiment, SessionStarted,
+                               SimulationComplete, SimulationError)
+import llm_client
+from llm_client import generate_content_async
+from llm_cache import get_llm_cache
+from search_cache import get_search_cache
+from mcp_pool import TOOL_BACKEND, get_mcp_pool
+
+# Agent turns, the judge and sentiment analysis all share one rate limiter
+llm_client.install()
 
 # ... (imports remain the same)
 
-async def analyze_responses(responses, question):
+async def analyze_responses(responses, question, use_cache=True):
     """Analyzes sentiment of agent responses using Gemini."""
     try:
-        model = genai.GenerativeModel('gemini-2.0-flash-lite-preview-02-05')
+        model = llm_client.get_model('gemini-2.0-flash-lite-preview-02-05')
         prompt = f"""
         Analyze the sentiment of the following focus group responses to the question: "{question}"
         
@@ -56,7 +75,7 @@ async def analyze_responses(responses, question):
         # Expect JSON output
         prompt += "\nProvide the output as a valid JSON object with keys: 'score' (1-10), 'label', 'summary'."
         
-        response_obj = generate_content_with_retry(model, prompt)
+        response_obj = await generate_content_async(model, prompt, kind="sentiment", use_cache=use_cache)
         text = response_obj.text.strip()
         
         if text.startswith("```json"):
@@ -69,22 +88,200 @@ async def analyze_responses(responses, question):
         print(f"Error analyzing sentiment: {e}")
         return {"score": 5, "label": "Neutral", "summary": "Error analyzing sentiment."}
 
-async def run_simulation(questions, additional_context="", num_agents=5, min_age=19, max_age=60, session_id=None):
+async def score_sentiment(actions, question, mode=SENTIMENT_MODE, use_cache=True):
+    """
+    Scores a question's (agent, response) pairs locally in one batch (sentiment.py).
+    The LLM (analyze_responses) is asked as well when `mode` is "llm" (a narrative
+    summary is wanted) or, in "auto" mode, when the local confidence is below
+    SENTIMENT_MIN_CONFIDENCE; its score, label and summary are then used.
+    """
+    engine = get_sentiment_engine()
+    local = engine.score([(name, str(content)) for name, content in actions])
+    analysis = {
+        "score": local["score"],
+        "label": local["label"],
+        "summary": engine.summarize(local),
+        "confidence": local["confidence"],
+        "agent_sentiment": local["agents"],
+        "source": "local",
+    }
+    if mode == "llm" or (mode != "local" and local["confidence"] < MIN_CONFIDENCE):
+        responses = "".join(f"{name}: {content}\n" for name, content in actions)
+        llm_analysis = await analyze_responses(responses, question, use_cache=use_cache)
+        analysis.update(score=llm_analysis.get("score", 5), label=llm_analysis.get("label", "Neutral"),
+                        summary=llm_analysis.get("summary", ""), source="llm")
+    return analysis
+
+def web_search_tool():
+    """web_search for agents: in process, or through the pooled MCP sessions when TOOL_BACKEND=mcp."""
+    if TOOL_BACKEND == "mcp":
+        return timed_tool("web_search", get_mcp_pool().tool_function("web_search"))
+    return timed_tool("web_search", web_search)
+
+async def iter_agent_turns(agents, max_concurrency=5, use_cache=None):
+    """
+    Runs one turn for every agent concurrently, with at most `max_concurrency`
+    act() calls in flight, yielding (panel index, name, content) as each agent finishes.
+    Every answer is delivered to the rest of the room once all agents have acted.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def act(index, agent):
+        async with semaphore:
+            # act() is a blocking LLM call, so run it off the event loop
+            with llm_client.cache_enabled(use_cache), agent_context(agent.name), span("agent.act", agent=agent.name):
+                result = await asyncio.to_thread(agent.act)
+        return index, result.content if isinstance(result, Message) else result
+
+    tasks = [asyncio.ensure_future(act(i, agent)) for i, agent in enumerate(agents)]
+    actions = [None] * len(agents)
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, content = await next_done
+            actions[index] = (agents[index].name, content)
+            yield index, agents[index].name, content
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    # Deliver everyone's answer to the rest of the room, as a sequential world turn would
+    for agent_name, action in actions:
+        message = Message(sender=agent_name, content=action, type="text")
+        for peer in agents:
+            if peer.name != agent_name:
+                peer.listen(message)
+
+async def iter_world_turn(world, use_cache=None):
+    """
+    Runs one sequential `world.run(1)` turn (TinyWorld's own turn order and message
+    delivery) in a worker thread, yielding (panel index, name, content) as each agent
+    finishes acting. Each act() runs under its agent's context and "agent.act" span.
+    """
+    loop = asyncio.get_running_loop()
+    finished = asyncio.Queue()
+    agents = list(world.agents)
+
+    def instrument(index, agent):
+        act = agent.act
+        originals[agent.name] = agent.__dict__.get("act")
+
+        def traced_act(*args, **kwargs):
+            with agent_context(agent.name), span("agent.act", agent=agent.name):
+                result = act(*args, **kwargs)
+            content = result.content if isinstance(result, Message) else result
+            loop.call_soon_threadsafe(finished.put_nowait, (index, agent.name, content))
+            return result
+        agent.act = traced_act
+
+    def run():
+        try:
+            with llm_client.cache_enabled(use_cache), span("world.run"):
+                world.run(1)
+        finally:
+            loop.call_soon_threadsafe(finished.put_nowait, None)
+
+    originals = {}
+    for index, agent in enumerate(agents):
+        instrument(index, agent)
+    try:
+        turn = asyncio.ensure_future(asyncio.to_thread(run))
+        while True:
+            item = await finished.get()
+            if item is None:
+                break
+            yield item
+        await turn
+    finally:
+        for agent in agents:
+            if originals.get(agent.name) is None:
+                del agent.act   # the class's act() again
+            else:
+                agent.act = originals[agent.name]
+
+async def run_agent_turns(agents, max_concurrency=5, use_cache=None):
+    """Like iter_agent_turns, but returns the actions in panel order once every agent is done."""
+    actions = [None] * len(agents)
+    async for index, agent_name, content in iter_agent_turns(agents, max_concurrency, use_cache):
+        actions[index] = (agent_name, content)
+    return actions
+
+async def apply_memory_policy(agents, policy, max_concurrency=5):
+    """Bounds every agent's episodic memory; summarization calls run concurrently."""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def apply(agent):
+        async with semaphore:
+            with agent_context(agent.name), span("memory.apply", agent=agent.name):
+                return await asyncio.to_thread(policy.apply, agent)
+
+    folded = await asyncio.gather(*(apply(agent) for agent in agents))
+    return sum(folded)
+
+async def run_simulation(questions, additional_context="", **options):
+    """
+    Runs the focus group and returns the results dict (or {"error": ...}).
+    Takes the same options as stream_simulation and simply collects its final event.
+    """
+    results_data = {}
+    async for event in stream_simulation(questions, additional_context, **options):
+        if isinstance(event, SimulationError):
+            return {"error": event.error}
+        if isinstance(event, SimulationComplete):
+            results_data = event.results
+    return results_data
+
+async def stream_simulation(questions, additional_context="", **options):
+    """
+    Runs the focus group, yielding events from simulation_events as they happen:
+    SessionStarted, then per question AgentResponse, EvaluationScore and
+    QuestionSentiment, and finally SimulationComplete (or SimulationError).
+    The run is traced as one "simulation" span (see tracing.py). Its token usage is
+    tracked against `token_budget` / `cost_budget` (default RUN_TOKEN_BUDGET /
+    RUN_COST_BUDGET); once over budget, BudgetExceeded is yielded and the remaining
+    questions are skipped.
+    """
+    tracker = UsageTracker(options.pop("token_budget", None), options.pop("cost_budget", None))
+    with trace("simulation", questions=len(questions) if isinstance(questions, list) else 1,
+              num_agents=options.get("num_agents", 5)), track_usage(tracker):
+        async for event in _stream_simulation(questions, additional_context, **options):
+            yield event
+
+async def _stream_simulation(questions, additional_context="", num_agents=5, min_age=19, max_age=60, session_id=None, max_concurrency=1, judge_batch_size=10, use_cache=True, personas_file="personas.json", sampling=None, seed=None, fork=False, memory_policy=None, document=None, retrieval_k=TOP_K, sentiment_mode=SENTIMENT_MODE, eval_mode=EVAL_MODE):
     print("Starting CrowdSim AI...")
+    if sentiment_mode not in ("auto", "llm", "local"):
+        print(f"WARNING: Unknown sentiment mode '{sentiment_mode}', using 'auto'.")
+        sentiment_mode = "auto"
+    # Wall-clock seconds spent in each phase of the run
+    phase_timings = {"setup": 0.0, "agent_turns": 0.0, "judge": 0.0, "sentiment": 0.0, "memory": 0.0, "session_save": 0.0}
+    phase_start = time.perf_counter()
     
     session_manager = SessionManager()
     if not session_id:
         session_id = session_manager.create_session_id()
         print(f"Created New Session ID: {session_id}")
         is_new_session = True
+    elif fork:
+        # Branch the conversation: the parent session is left as it was
+        try:
+            session_id = session_manager.fork_session(session_id)
+        except FileNotFoundError as e:
+            yield SimulationError(f"Failed to fork session: {e}")
+            return
+        print(f"Running in forked Session ID: {session_id}")
+        is_new_session = False
     else:
         print(f"Resuming Session ID: {session_id}")
         is_new_session = False
 
     # Initialize Observability
-    logger = StructuredLogger()
-    metrics = Metrics()
-    evaluator = Evaluator()
+    # Log records share the trace's id, so logs and spans can be joined
+    run_span = current_span()
+    logger = StructuredLogger(trace_id=run_span.trace_id if run_span else None)
+    metrics = get_metrics()
+    usage_tracker = current_tracker() or UsageTracker()
+    evaluator = Evaluator(use_cache=use_cache, mode=eval_mode)
+    # Keeps prompts bounded for panels resumed over many sessions
+    memory_policy = memory_policy or MemoryPolicy(use_cache=use_cache)
     
     logger.log("simulation_start", {"session_id": session_id, "num_agents": num_agents})
 
@@ -93,30 +290,27 @@ async def run_simulation(questions, additional_context="", num_agents=5, min_age
         questions = [questions]
 
     agents = []
+    # Shared context segments this session refers to; persisted once in its world_state
+    shared_context = get_shared_context()
+    session_segments = {}
     if is_new_session:
-        # 1. Load Personas (Standard Creation)
+        # 1. Load Personas (Standard Creation), parsed once per process
         try:
-            with open("personas.json", "r") as f:
-                personas_data = json.load(f)
+            persona_store = get_persona_store(personas_file)
         except FileNotFoundError:
-            print("Error: personas.json not found.")
-            return {"error": "personas.json not found"}
-
-        # Filter by age
-        filtered_personas = [
-            p for p in personas_data 
-            if min_age <= p["age"] <= max_age
-        ]
+            print(f"Error: {personas_file} not found.")
+            yield SimulationError(f"{personas_file} not found")
+            return
 
-        if not filtered_personas:
-            return {"error": f"No agents found in age range {min_age}-{max_age}."}
+        # Filter by age (index lookup)
+        if len(persona_store.age_range(min_age, max_age)) == 0:
+            yield SimulationError(f"No agents found in age range {min_age}-{max_age}.")
+            return
 
-        # Select agents
-        import random
-        if len(filtered_personas) > num_agents:
-            selected_personas = random.sample(filtered_personas, num_agents)
-        else:
-            selected_personas = filtered_personas
+        # Select agents (uniform by default; quota/stratified/weighted via `sampling`)
+        selected_ids = sample_panel(persona_store, num_agents, min_age=min_age, max_age=max_age,
+                                    seed=seed, **(sampling or {}))
+        selected_personas = persona_store.get_many(selected_ids)
 
         for p_data in selected_personas:
             agent = TinyPerson(p_data["name"])
@@ -126,29 +320,44 @@ async def run_simulation(questions, additional_context="", num_agents=5, min_age
             agent.define("interests", p_data["interests"])
             
             # Register Tools
-            agent.add_tool("web_search", web_search, "Performs a web search using DuckDuckGo. Use this tool when you need to find real-time information, news, or product details.")
+            agent.add_tool("web_search", web_search_tool(), "Performs a web search using DuckDuckGo. Use this tool when you need to find real-time information, news, or product details.")
             
             agents.append(agent)
             print(f"Created agent: {p_data['name']} ({p_data['age']})")
     else:
         # Load agents from session
         try:
-            agents, _ = session_manager.load_session(session_id)
+            agents, world_state = session_manager.load_session(session_id)
+            session_segments = (world_state or {}).get("shared_context", {})
+            shared_context.load(session_segments)
             print(f"Loaded {len(agents)} agents from session.")
             # Re-register tools (functions aren't pickled)
             for agent in agents:
-                 agent.add_tool("web_search", web_search, "Performs a web search using DuckDuckGo. Use this tool when you need to find real-time information, news, or product details.")
+                 agent.add_tool("web_search", web_search_tool(), "Performs a web search using DuckDuckGo. Use this tool when you need to find real-time information, news, or product details.")
         except Exception as e:
-            return {"error": f"Failed to load session: {e}"}
+            yield SimulationError(f"Failed to load session: {e}")
+            return
+
+    yield SessionStarted(session_id, [a.name for a in agents])
 
     # 2. Create World
-    world = TinyWorld("CrowdSimAI_Room", agents)
+    world = TinyWorld("CrowdSimAI_Room", list(agents))
     world.make_everyone_accessible()
 
+    # Long documents are indexed and only the chunks matching each question are sent
+    document_index = get_document_index(document) if document else None
+    if document_index is not None and len(document_index) <= retrieval_k:
+        # Short enough to send whole, like the rest of the context
+        additional_context = f"{document}\n\n{additional_context}".strip()
+        document_index = None
+
     # Broadcast Context first
     if additional_context:
         print(f"\nBroadcast Context: {additional_context}")
-        world.broadcast(f"Context for this session: {additional_context}")
+        # Agents remember a reference; the text is expanded when a prompt is sent
+        context_ref = shared_context.register(additional_context)
+        session_segments.update(shared_context.segments(shared_context.keys_in(context_ref)))
+        world.broadcast(f"Context for this session: {context_ref}")
 
     results_data = {
         "overall_sentiment": 0,
@@ -161,62 +370,140 @@ async def run_simulation(questions, additional_context="", num_agents=5, min_age
     total_score = 0
     total_quality = {"relevance": 0, "coherence": 0, "fidelity": 0}
     response_count = 0
+    # Responses scored per evaluation tier, and how far the heuristics were from the judge on audits
+    tier_counts = {"local": 0, "judge": 0, "audit": 0}
+    audit_errors = []
     full_conversation_log = ""
+    phase_timings["setup"] = time.perf_counter() - phase_start
+
+    if not is_new_session:
+        # Sessions saved before the policy existed (or with a larger budget) may be over it
+        phase_start = time.perf_counter()
+        await apply_memory_policy(agents, memory_policy, max_concurrency)
+        phase_timings["memory"] += time.perf_counter() - phase_start
 
     # 3. Interaction Loop per Question
-    import time
+    # (Rate limiting happens per LLM call in llm_client, so there is no pause between questions)
+    answered = 0
     for i, question in enumerate(questions):
-        # Rate limiting: Pause between questions to reset quota window
-        if i > 0:
-            print("Pausing for 10 seconds to respect API rate limits...")
-            time.sleep(10)
-
-        print(f"\n--- Processing Question {i+1}: {question} ---")
-        world.broadcast(f"Question {i+1}: {question}")
+        # Budgets are checked between questions and again after the agent turns, so a run
+        # overshoots by at most one round of agent turns
+        reason = usage_tracker.exceeded()
+        if reason:
+            print(f"Stopping early: {reason}")
+            logger.log("budget_exceeded", {"reason": reason, "questions_answered": i})
+            results_data["stopped_early"] = {"reason": reason, "questions_answered": i,
+                                             "questions_skipped": len(questions) - i}
+            yield BudgetExceeded(reason, i, usage_tracker.total())
+            break
+        with span("question", index=i + 1, question=question), usage_question(i + 1):
+            print(f"\n--- Processing Question {i+1}: {question} ---")
+            question_start = time.perf_counter()
+            # The registry evicts least recently used segments in long-lived processes;
+            # make sure this run's are present before its prompts refer to them
+            shared_context.load(session_segments)
+            if document_index is not None:
+                excerpts_ref = shared_context.register("\n---\n".join(document_index.top_chunks(question, retrieval_k)))
+                session_segments.update(shared_context.segments(shared_context.keys_in(excerpts_ref)))
+                world.broadcast(f"Relevant excerpts from the attached document: {excerpts_ref}")
+            world.broadcast(f"Question {i+1}: {question}")
         
-        # Run for 1 turn (everyone responds once)
-        actions = world.run(1)
+            # Run for 1 turn (everyone responds once)
+            phase_start = time.perf_counter()
+            actions = [None] * len(agents)
+            # use_cache=False turns the cache off; otherwise agent turns are cached only when
+            # "agent" is in LLM_CACHE_KINDS
+            agent_cache = None if use_cache else False
+            if max_concurrency > 1:
+                turns = iter_agent_turns(agents, max_concurrency, agent_cache)
+            else:
+                turns = iter_world_turn(world, agent_cache)
+            async for index, agent_name, content in turns:
+                actions[index] = (agent_name, content)
+                yield AgentResponse(i, question, agent_name, content)
+            phase_timings["agent_turns"] += time.perf_counter() - phase_start
+
+            # Past the budget, this question is finished without further LLM calls; the run
+            # stops before the next one
+            over_budget = usage_tracker.exceeded() is not None
+            question_evaluator = Evaluator(use_cache=use_cache, mode="local") if over_budget else evaluator
+
+            # Fold events that aged out of the recent window before the next turn
+            # (a session saved over its memory budget is folded when it is resumed)
+            phase_start = time.perf_counter()
+            if not over_budget:
+                folded = await apply_memory_policy(agents, memory_policy, max_concurrency)
+                if folded:
+                    logger.log("memory_summarized", {"question": question, "events_folded": folded})
+            phase_timings["memory"] += time.perf_counter() - phase_start
         
-        # Collect responses for this turn
-        current_responses = ""
-        for agent_name, action in actions:
-            current_responses += f"{agent_name}: {action}\n"
+            # Collect responses for this turn
+            current_responses = ""
+            eval_items = []
+            for agent_name, action in actions:
+                current_responses += f"{agent_name}: {action}\n"
             
-            # Log Action
-            logger.log("agent_action", {"agent": agent_name, "action": action, "question": question})
+                # Log Action
+                logger.log("agent_action", {"agent": agent_name, "action": action, "question": question})
+            
+                # Find the agent object to get persona details
+                agent_obj = next((a for a in agents if a.name == agent_name), None)
+                if agent_obj:
+                    persona_desc = f"{agent_obj.attributes.get('age')} year old {agent_obj.attributes.get('occupation')}, {agent_obj.attributes.get('personality')}"
+                    eval_items.append({"agent": agent_name, "response": action, "persona": persona_desc})
+
+            # Evaluate Responses: local heuristics, the LLM judge (several per call) where they are unsure
+            phase_start = time.perf_counter()
+            with span("judge", responses=len(eval_items)) as current:
+                eval_scores = await question_evaluator.evaluate(question, eval_items, chunk_size=judge_batch_size)
+                if current:
+                    current.set(judged=sum(s["tier"] != "local" for s in eval_scores))
+            phase_timings["judge"] += time.perf_counter() - phase_start
+            for item, eval_score in zip(eval_items, eval_scores):
+                logger.log("agent_evaluation", {"agent": item["agent"], "scores": eval_score})
+                yield EvaluationScore(i, item["agent"], eval_score)
             
-            # Evaluate Response (LLM-as-a-Judge)
-            # Find the agent object to get persona details
-            agent_obj = next((a for a in agents if a.name == agent_name), None)
-            if agent_obj:
-                persona_desc = f"{agent_obj.attributes.get('age')} year old {agent_obj.attributes.get('occupation')}, {agent_obj.attributes.get('personality')}"
-                eval_score = await evaluator.evaluate_response(question, action, persona_desc)
-                
-                logger.log("agent_evaluation", {"agent": agent_name, "scores": eval_score})
-                
                 total_quality["relevance"] += eval_score.get("relevance", 0)
                 total_quality["coherence"] += eval_score.get("coherence", 0)
                 total_quality["fidelity"] += eval_score.get("fidelity", 0)
                 response_count += 1
+                tier_counts[eval_score["tier"]] += 1
+                if eval_score["tier"] == "audit":
+                    audit_errors += [abs(eval_score[key] - eval_score["heuristic"][key]) for key in CRITERIA]
         
-        full_conversation_log += f"\n### Question {i+1}: {question}\n{current_responses}\n"
+            full_conversation_log += f"\n### Question {i+1}: {question}\n{current_responses}\n"
 
-        # Analyze Sentiment for this question
-        analysis = await analyze_responses(current_responses, question)
-        print(f"Analysis: {analysis}")
+            # Analyze Sentiment for this question
+            phase_start = time.perf_counter()
+            with span("sentiment") as current:
+                analysis = await score_sentiment(actions, question, mode="local" if over_budget else sentiment_mode,
+                                                 use_cache=use_cache)
+                if current:
+                    current.set(source=analysis["source"], confidence=analysis["confidence"])
+            phase_timings["sentiment"] += time.perf_counter() - phase_start
+            print(f"Analysis: {analysis}")
         
-        results_data["question_details"].append({
-            "question": question,
-            "score": analysis.get("score", 5),
-            "label": analysis.get("label", "Neutral"),
-            "summary": analysis.get("summary", ""),
-            "responses": current_responses
-        })
-        total_score += analysis.get("score", 5)
+            results_data["question_details"].append({
+                "question": question,
+                "score": analysis.get("score", 5),
+                "label": analysis.get("label", "Neutral"),
+                "summary": analysis.get("summary", ""),
+                "sentiment_source": analysis["source"],
+                "sentiment_confidence": analysis["confidence"],
+                "agent_sentiment": analysis["agent_sentiment"],
+                "evaluations": [dict({key: s[key] for key in CRITERIA}, agent=item["agent"], tier=s["tier"])
+                                for item, s in zip(eval_items, eval_scores)],
+                "responses": current_responses
+            })
+            total_score += analysis.get("score", 5)
+            metrics.record("crowdsim_question_seconds", time.perf_counter() - question_start)
+            answered += 1
+            yield QuestionSentiment(i, question, analysis.get("score", 5), analysis.get("label", "Neutral"),
+                                    analysis.get("summary", ""))
 
     # 4. Finalize Results
-    if questions:
-        results_data["overall_sentiment"] = round(total_score / len(questions), 1)
+    if answered:
+        results_data["overall_sentiment"] = round(total_score / answered, 1)
         
     if response_count > 0:
         results_data["quality_metrics"] = {
@@ -224,14 +511,25 @@ async def run_simulation(questions, additional_context="", num_agents=5, min_age
             "coherence": round(total_quality["coherence"] / response_count, 1),
             "fidelity": round(total_quality["fidelity"] / response_count, 1)
         }
+    results_data["evaluation"] = {
+        "mode": evaluator.mode,
+        "tiers": tier_counts,
+        # Mean gap (in points) between heuristic and judge scores on the audited responses
+        "audit_mean_abs_error": round(sum(audit_errors) / len(audit_errors), 2) if audit_errors else None,
+    }
     
     results_data["full_logs"] = full_conversation_log
     
     # Generate Report Text
+    stopped_note = ""
+    if "stopped_early" in results_data:
+        stopped = results_data["stopped_early"]
+        stopped_note = f"**Stopped early:** {stopped['reason']}; {stopped['questions_skipped']} question(s) skipped.\n"
     report = f"""# Focus Group Report
 
 ## Overall Sentiment Score: {results_data['overall_sentiment']}/10
 
+{stopped_note}
 ## Participant Demographics
 {', '.join([f"{a.name} ({a.attributes['age']})" for a in agents])}
 
@@ -240,23 +538,57 @@ async def run_simulation(questions, additional_context="", num_agents=5, min_age
     for qd in results_data["question_details"]:
         report += f"\n### Q: {qd['question']}\n"
         report += f"**Sentiment:** {qd['score']}/10 ({qd['label']})\n"
+        report += f"**Scored by:** {'LLM' if qd['sentiment_source'] == 'llm' else 'local lexicon'} (local confidence {qd['sentiment_confidence']})\n"
         report += f"**Summary:** {qd['summary']}\n"
+        report += "**Response scores (relevance/coherence/fidelity, tier):** " + "; ".join(
+            f"{e['agent']} {e['relevance']}/{e['coherence']}/{e['fidelity']} ({e['tier']})" for e in qd["evaluations"]) + "\n"
     
+    evaluation = results_data["evaluation"]
+    report += (f"\n## Evaluation\nScores by tier: {evaluation['tiers']['local']} local heuristics, "
+               f"{evaluation['tiers']['judge']} LLM judge (uncertain), {evaluation['tiers']['audit']} LLM judge (audit sample).\n")
+    if evaluation["audit_mean_abs_error"] is not None:
+        report += f"Heuristics were {evaluation['audit_mean_abs_error']} points from the judge on average on audited responses.\n"
+
     report += f"\n## Conversation Logs\n{full_conversation_log}"
     
     results_data["report"] = report
     results_data["session_id"] = session_id
+    llm_cache = get_llm_cache()
+    if llm_cache:
+        results_data["cache_stats"] = llm_cache.stats()
+    results_data["search_stats"] = get_search_cache().stats()
     
     # Save Session
-    session_manager.save_session(session_id, agents)
+    phase_start = time.perf_counter()
+    with span("session.save"):
+        session_manager.save_session(session_id, agents, world_state={"shared_context": session_segments},
+                                     last_question=questions[answered - 1] if answered else None)
+    phase_timings["session_save"] = time.perf_counter() - phase_start
+    if METRICS_FILE:
+        metrics.write_prometheus(METRICS_FILE)
+    results_data["phase_timings"] = {k: round(v, 4) for k, v in phase_timings.items()}
+    results_data["usage"] = usage_tracker.summary()
     
-    return results_data
+    yield SimulationComplete(results_data)
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--session_id", type=str, help="Session ID to resume")
+    parser.add_argument("--fork", action="store_true", help="Run in a fork of --session_id instead of resuming it")
+    parser.add_argument("--max_concurrency", type=int, default=1, help="Max agent turns in flight at once (1 = sequential)")
+    parser.add_argument("--backend", choices=["gemini", "mock"], help="LLM backend (default: LLM_BACKEND or gemini)")
+    parser.add_argument("--sentiment_mode", choices=["auto", "llm", "local"], default=SENTIMENT_MODE,
+                        help="Local sentiment scores, with the LLM only when unsure (auto), always (llm) or never (local)")
+    parser.add_argument("--eval_mode", choices=["cascade", "llm", "local"], default=EVAL_MODE,
+                        help="Heuristics with the judge for uncertain responses (cascade), the judge for all (llm), or heuristics only (local)")
+    parser.add_argument("--token_budget", type=int, help="Stop after the question that takes the run over this many tokens")
+    parser.add_argument("--cost_budget", type=float, help="Stop after the question that takes the run over this cost (USD)")
     args = parser.parse_args()
+    if args.backend:
+        llm_client.set_backend(args.backend)
     
     default_stimulus = "What do you think of this $1000 smart toaster?"
-    asyncio.run(run_simulation(default_stimulus, session_id=args.session_id))
+    asyncio.run(run_simulation(default_stimulus, session_id=args.session_id, fork=args.fork, max_concurrency=args.max_concurrency,
+                               token_budget=args.token_budget, cost_budget=args.cost_budget,
+                               sentiment_mode=args.sentiment_mode, eval_mode=args.eval_mode))
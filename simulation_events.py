@@ -0,0 +1,53 @@
+"""
+Events yielded by simulation.stream_simulation, in the order they happen.
+"""
+from dataclasses import dataclass, field
+
+
+@dataclass
+class SessionStarted:
+    session_id: str
+    agents: list
+
+
+@dataclass
+class AgentResponse:
+    question_index: int
+    question: str
+    agent: str
+    response: str
+
+
+@dataclass
+class EvaluationScore:
+    question_index: int
+    agent: str
+    scores: dict
+
+
+@dataclass
+class QuestionSentiment:
+    question_index: int
+    question: str
+    score: float
+    label: str
+    summary: str
+
+
+@dataclass
+class BudgetExceeded:
+    """The run's token or cost budget ran out; the remaining questions are skipped."""
+    reason: str
+    questions_answered: int
+    usage: dict = field(default_factory=dict)
+
+
+@dataclass
+class SimulationComplete:
+    """The same dict run_simulation returns."""
+    results: dict = field(default_factory=dict)
+
+
+@dataclass
+class SimulationError:
+    error: str
@@ -0,0 +1,240 @@
+"""
+SQLite-backed session storage.
+
+Session metadata (created/updated time, panel size, last question) lives in an
+indexed table, and each agent is its own zlib-compressed row, so listing sessions
+is one indexed query and loading a session only materializes the agents that are
+actually used. Selected with SessionManager(backend="sqlite") or SESSION_BACKEND=sqlite.
+
+A forked session gets its own session row, but its agent rows only point at the
+parent's rows (`base_session`) until the child saves them, so forking a large panel
+copies no agent state. Before a session overwrites or drops agent rows that a fork
+still points at, those rows are copied into the fork.
+
+Existing JSON/journal sessions can be copied over with:
+
+    python sqlite_session_store.py migrate [sessions_dir]
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections.abc import Sequence
+from TinyTroupe.agent import TinyPerson
+
+DB_FILE = "sessions.sqlite"
+
+
+def _pack(agent_dict):
+    return zlib.compress(json.dumps(agent_dict).encode("utf-8"))
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class LazyAgentList(Sequence):
+    """
+    The agents of a stored session, hydrated into TinyPerson objects on first access.
+    Agent names are available up front through `names`.
+    """
+
+    def __init__(self, store, session_id, names):
+        self._store = store
+        self._session_id = session_id
+        self.names = list(names)
+        self._agents = [None] * len(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if self._agents[index] is None:
+            self._agents[index] = TinyPerson.from_dict(self._store.load_agent_dict(self._session_id, self.names[index]))
+        return self._agents[index]
+
+    def is_hydrated(self, index):
+        return self._agents[index] is not None
+
+    def hydrated(self):
+        """Agents that have been materialized (and so may have changed)."""
+        return [agent for agent in self._agents if agent is not None]
+
+
+class SQLiteSessionStore:
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                panel_size INTEGER NOT NULL,
+                last_question TEXT,
+                world_state TEXT,
+                parent_id TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_created ON sessions (created_at);
+            CREATE INDEX IF NOT EXISTS idx_sessions_panel_size ON sessions (panel_size);
+            CREATE INDEX IF NOT EXISTS idx_sessions_last_question ON sessions (last_question);
+            CREATE TABLE IF NOT EXISTS agents (
+                session_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                state BLOB NOT NULL,
+                base_session TEXT,
+                PRIMARY KEY (session_id, name)
+            );
+        """)
+        # Databases created before forking was added lack the fork columns
+        for table, column in (("sessions", "parent_id"), ("agents", "base_session")):
+            if column not in [r[1] for r in self._conn.execute(f"PRAGMA table_info({table})")]:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_agents_base ON agents (base_session, name)")
+        self._conn.commit()
+
+    def save_session(self, session_id, agents, world_state=None, last_question=None):
+        """
+        Upserts the session row and the agents' rows. For a LazyAgentList only the
+        agents that were hydrated are rewritten; the rest are unchanged on disk.
+        """
+        names = agents.names if isinstance(agents, LazyAgentList) else [a.name for a in agents]
+        changed = agents.hydrated() if isinstance(agents, LazyAgentList) else list(agents)
+        self._write(session_id, names, {a.name: a.to_dict() for a in changed}, world_state, last_question)
+        print(f"Session saved to {self.path} ({len(changed)} of {len(names)} agents written)")
+
+    def import_session(self, session_id, agent_dicts, world_state=None, last_question=None, created_at=None):
+        """Stores plain agent dicts (e.g. from a JSON session) without hydrating them."""
+        names = [a["name"] for a in agent_dicts]
+        self._write(session_id, names, {a["name"]: a for a in agent_dicts}, world_state, last_question, created_at)
+
+    def _write(self, session_id, names, agent_dicts, world_state, last_question, created_at=None):
+        now = time.time()
+        positions = {name: i for i, name in enumerate(names)}
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO sessions (session_id, created_at, updated_at, panel_size, last_question, world_state)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (session_id) DO UPDATE SET
+                    updated_at = excluded.updated_at,
+                    panel_size = excluded.panel_size,
+                    last_question = COALESCE(excluded.last_question, sessions.last_question),
+                    world_state = excluded.world_state
+            """, (session_id, created_at or now, now, len(names), last_question, json.dumps(world_state or {})))
+            self._detach_forks(session_id, list(agent_dicts), names)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO agents (session_id, name, position, state, base_session) VALUES (?, ?, ?, ?, NULL)",
+                [(session_id, name, positions[name], _pack(d)) for name, d in agent_dicts.items()])
+            # Keep positions in step with the panel and drop agents no longer in it
+            self._conn.executemany("UPDATE agents SET position = ? WHERE session_id = ? AND name = ?",
+                                   [(i, session_id, name) for i, name in enumerate(names) if name not in agent_dicts])
+            placeholders = ",".join("?" * len(names))
+            self._conn.execute(f"DELETE FROM agents WHERE session_id = ? AND name NOT IN ({placeholders})",
+                               [session_id] + names)
+
+    def _detach_forks(self, session_id, rewritten, names):
+        """Copies rows of `session_id` that are about to change into the forks that point at them."""
+        if not self._conn.execute("SELECT 1 FROM agents WHERE base_session = ? LIMIT 1", (session_id,)).fetchone():
+            return
+        copy = """
+            UPDATE agents SET
+                state = (SELECT p.state FROM agents p WHERE p.session_id = ? AND p.name = agents.name),
+                base_session = NULL
+            WHERE base_session = ? AND name {} IN ({})
+        """
+        if rewritten:
+            self._conn.execute(copy.format("", ",".join("?" * len(rewritten))), [session_id, session_id] + rewritten)
+        self._conn.execute(copy.format("NOT", ",".join("?" * len(names))), [session_id, session_id] + names)
+
+    def fork_session(self, parent_id, child_id):
+        """Creates `child_id` sharing every agent row of `parent_id`. Returns the child's ID."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT 1 FROM sessions WHERE session_id = ?", (parent_id,)).fetchone()
+            if row is None:
+                raise FileNotFoundError(f"Session {parent_id} not found in {self.path}.")
+            self._conn.execute("""
+                INSERT INTO sessions (session_id, created_at, updated_at, panel_size, last_question, world_state, parent_id)
+                SELECT ?, ?, ?, panel_size, last_question, world_state, session_id FROM sessions WHERE session_id = ?
+            """, (child_id, now, now, parent_id))
+            # Point at the row that actually holds the state, so reads are a single hop
+            self._conn.execute("""
+                INSERT INTO agents (session_id, name, position, state, base_session)
+                SELECT ?, name, position, X'', COALESCE(base_session, session_id) FROM agents WHERE session_id = ?
+            """, (child_id, parent_id))
+        print(f"Forked session {parent_id} into {child_id}")
+        return child_id
+
+    def load_session(self, session_id):
+        with self._lock:
+            row = self._conn.execute("SELECT world_state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if row is None:
+                raise FileNotFoundError(f"Session {session_id} not found in {self.path}.")
+            names = [r[0] for r in self._conn.execute(
+                "SELECT name FROM agents WHERE session_id = ? ORDER BY position", (session_id,))]
+        return LazyAgentList(self, session_id, names), json.loads(row[0] or "{}")
+
+    def load_agent_dict(self, session_id, name):
+        with self._lock:
+            row = self._conn.execute("SELECT state, base_session FROM agents WHERE session_id = ? AND name = ?",
+                                     (session_id, name)).fetchone()
+            if row is not None and row[1] is not None:
+                row = self._conn.execute("SELECT state FROM agents WHERE session_id = ? AND name = ?",
+                                         (row[1], name)).fetchone()
+        if row is None:
+            raise KeyError(f"Agent {name} not found in session {session_id}.")
+        return _unpack(row[0])
+
+    def list_sessions(self):
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT session_id FROM sessions ORDER BY created_at DESC")]
+
+    def session_info(self, limit=100, offset=0, min_panel_size=None):
+        """Session metadata, newest first, straight from the indexed table."""
+        query = "SELECT session_id, created_at, updated_at, panel_size, last_question FROM sessions"
+        params = []
+        if min_panel_size is not None:
+            query += " WHERE panel_size >= ?"
+            params.append(min_panel_size)
+        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        keys = ("session_id", "created_at", "updated_at", "panel_size", "last_question")
+        return [dict(zip(keys, row)) for row in rows]
+
+
+def migrate(session_dir="sessions"):
+    """Copies every JSON/journal session in `session_dir` into the SQLite store."""
+    from session_manager import SessionManager
+
+    source = SessionManager(session_dir, backend="journal")
+    target = SQLiteSessionStore(os.path.join(session_dir, DB_FILE))
+    migrated = 0
+    for session_id in source.list_sessions():
+        state, _, _ = source._replay(session_id)
+        agent_dicts = [state["agents"][name] for name in state["order"]]
+        created_at = os.path.getmtime(source._path(session_id) if os.path.isdir(source._path(session_id))
+                                      else source._legacy_path(session_id))
+        target.import_session(session_id, agent_dicts, state.get("world_state"), created_at=created_at)
+        migrated += 1
+        print(f"Migrated session {session_id} ({len(agent_dicts)} agents)")
+    print(f"Migrated {migrated} sessions to {target.path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python sqlite_session_store.py migrate [sessions_dir]")
+        sys.exit(1)
+    migrate(*sys.argv[2:3])
@@ -0,0 +1,75 @@
+import asyncio
+import sys
+import os
+import threading
+import time
+sys.path.append(os.getcwd())
+os.environ["LLM_BACKEND"] = "mock"
+from TinyTroupe.environment import TinyWorld
+from TinyTroupe.protocol import Message
+from simulation import iter_agent_turns, iter_world_turn, run_agent_turns
+
+class SlowAgent:
+    """Stand-in agent whose act() blocks for a while and records how many acts overlap."""
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def __init__(self, name, delay):
+        self.name = name
+        self.delay = delay
+        self.heard = []
+        self.heard_when_acting = None
+
+    def act(self):
+        self.heard_when_acting = len(self.heard)
+        with SlowAgent.lock:
+            SlowAgent.active += 1
+            SlowAgent.peak = max(SlowAgent.peak, SlowAgent.active)
+        time.sleep(self.delay)
+        with SlowAgent.lock:
+            SlowAgent.active -= 1
+        return Message(sender=self.name, content=f"{self.name} answers", type="text")
+
+    def listen(self, message):
+        self.heard.append(message.content)
+
+def make_panel(size=8):
+    # Later agents finish first, so completion order differs from panel order
+    return [SlowAgent(f"Agent{i}", 0.05 + 0.02 * (size - i)) for i in range(size)]
+
+def test_agent_turns():
+    print("Testing Agent Turns...")
+    for max_concurrency in (1, 3, 8):
+        SlowAgent.peak = 0
+        agents = make_panel()
+
+        # 1. Results come back in panel order, whatever order the agents finish in
+        actions = asyncio.run(run_agent_turns(agents, max_concurrency))
+        assert actions == [(a.name, f"{a.name} answers") for a in agents]
+
+        # 2. At most max_concurrency act() calls overlap, and the limit is actually used
+        # (above the default thread pool's size, the pool is the limit)
+        print(f"max_concurrency={max_concurrency}: peak {SlowAgent.peak} concurrent acts")
+        assert min(max_concurrency, 3) <= SlowAgent.peak <= max_concurrency
+
+        # 3. Everyone hears everyone else's answer exactly once
+        for agent in agents:
+            assert sorted(agent.heard) == sorted(f"{a.name} answers" for a in agents if a is not agent)
+
+    # 4. Concurrent turns stream in completion order; a sequential world turn streams in
+    # panel order, with each agent hearing the answers given before theirs
+    async def order(turns):
+        return [index async for index, _, _ in turns]
+    agents = make_panel(4)
+    assert asyncio.run(order(iter_agent_turns(agents, 4))) == [3, 2, 1, 0]
+    assert [a.heard_when_acting for a in agents] == [0, 0, 0, 0]
+    agents = make_panel(4)
+    assert asyncio.run(order(iter_world_turn(TinyWorld("Room", agents)))) == [0, 1, 2, 3]
+    assert [a.heard_when_acting for a in agents] == [0, 1, 2, 3]
+    assert "act" not in vars(agents[0])
+
+    print("SUCCESS: Agent turns verified.")
+
+if __name__ == "__main__":
+    test_agent_turns()
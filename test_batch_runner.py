@@ -0,0 +1,46 @@
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.getcwd())
+os.environ["LLM_BACKEND"] = "mock"
+os.environ["LLM_CACHE"] = "0"
+from batch_runner import expand_matrix, run_batch, split_budget
+
+def test_batch_runner():
+    print("Testing Batch Runner...")
+    matrix = {
+        "questions": [["Would you buy a smart mug?", "At $40?"], "Would you try a meal kit?"],
+        "age_ranges": [[19, 40], [200, 300]],
+        "panel_sizes": [3],
+    }
+
+    # 1. One variant per combination, with ids that do not change between runs
+    variants = expand_matrix(matrix)
+    assert len(variants) == 4
+    assert [v["variant_id"] for v in variants] == [v["variant_id"] for v in expand_matrix(matrix)]
+
+    # 2. Each worker gets its share of the rate budget
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = "60"
+    assert float(split_budget(4)["LLM_REQUESTS_PER_MINUTE"]) == 15
+
+    # 3. Failed variants are retried alone; the file has one row per variant
+    out_path = os.path.join(tempfile.mkdtemp(), "results.jsonl")
+    rows = run_batch(matrix, out_path, workers=2, retries=1)
+    with open(out_path) as f:
+        saved = [json.loads(line) for line in f]
+    assert [r["variant_id"] for r in saved] == [v["variant_id"] for v in variants]
+    ok = [r for r in rows if r["status"] == "ok"]
+    failed = [r for r in rows if r["status"] == "error"]
+    assert len(ok) == 2 and all(r["attempts"] == 1 for r in ok)
+    assert len(failed) == 2 and all(r["attempts"] == 2 for r in failed)
+
+    # 4. Re-running resumes: finished variants are not run again
+    rows = run_batch(matrix, out_path, workers=1, retries=0)
+    assert [r["session_id"] for r in rows if r["status"] == "ok"] == [r["session_id"] for r in ok]
+    assert all(r["attempts"] == 3 for r in rows if r["status"] == "error")
+
+    print("SUCCESS: Batch runner verified.")
+
+if __name__ == "__main__":
+    test_batch_runner()
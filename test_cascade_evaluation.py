@@ -0,0 +1,78 @@
+import asyncio
+import json
+import sys
+import time
+import os
+sys.path.append(os.getcwd())
+os.environ["LLM_BACKEND"] = "mock"
+os.environ["LLM_CACHE"] = "0"
+from evaluator import Evaluator, heuristic_scores
+from simulation import run_simulation
+import llm_client
+
+QUESTION = "Would you buy a smart mug?"
+PERSONA = "30 year old Barista, friendly and talkative"
+
+def test_cascade_evaluation():
+    print("Testing Cascaded Evaluation...")
+
+    # 1. Heuristics separate on-topic answers from empty or off-topic ones
+    good = heuristic_scores(QUESTION, "I'd probably buy a smart mug; as a barista I like my coffee hot.", PERSONA)
+    off_topic = heuristic_scores(QUESTION, "pizza pizza pizza", PERSONA)
+    print(f"Good: {good}, off-topic: {off_topic}")
+    assert good["overall"] > 3.5 and off_topic["overall"] < 2.5
+    assert heuristic_scores(QUESTION, "", PERSONA)["overall"] == 1.0
+
+    # 2. Only uncertain responses and the audit sample reach the judge
+    items = [{"agent": f"A{i}", "response": f"I'd buy a smart mug if it keeps coffee hot ({i}).", "persona": PERSONA}
+             for i in range(40)]
+    items.append({"agent": "Unsure", "response": "I like pizza.", "persona": PERSONA})
+    llm_client.reset_call_stats()
+    scores = asyncio.run(Evaluator(audit_rate=0.1).evaluate(QUESTION, items, chunk_size=50))
+    tiers = [s["tier"] for s in scores]
+    print(f"Tiers: { {t: tiers.count(t) for t in set(tiers)} }")
+    assert tiers[-1] == "judge" and 1 <= tiers.count("audit") <= 10 and tiers.count("local") >= 30
+    assert llm_client.call_stats()["judge"]["requests"] == 1
+    # The audit sample is the same on every run
+    assert [s["tier"] for s in asyncio.run(Evaluator(audit_rate=0.1).evaluate(QUESTION, items))] == tiers
+
+    # 3. "llm" judges everything, "local" nothing
+    assert {s["tier"] for s in asyncio.run(Evaluator(mode="llm").evaluate(QUESTION, items[:3]))} == {"judge"}
+    llm_client.reset_call_stats()
+    assert {s["tier"] for s in asyncio.run(Evaluator(mode="local").evaluate(QUESTION, items))} == {"local"}
+    assert "judge" not in llm_client.call_stats()
+
+    # 4. Responses a mangled batch reply left out are re-judged concurrently
+    class SlowJudge:
+        model_name = "slow-judge"
+
+        def generate_content(self, prompt, **kwargs):
+            if "JSON array" in prompt:
+                return type("Response", (), {"text": "Sorry, I can't do that."})()
+            time.sleep(0.3)
+            return type("Response", (), {"text": json.dumps({"relevance": 4, "coherence": 4, "fidelity": 4})})()
+
+    evaluator = Evaluator(mode="llm")
+    evaluator.model = SlowJudge()
+    previous = llm_client.get_backend()
+    llm_client.set_backend("gemini")
+    try:
+        start = time.perf_counter()
+        scores = asyncio.run(evaluator.evaluate_batch(QUESTION, items[:5], chunk_size=5))
+        elapsed = time.perf_counter() - start
+    finally:
+        llm_client.set_backend(previous)
+    print(f"5 fallback judgements in {elapsed:.2f}s")
+    assert all(s["relevance"] == 4 for s in scores) and elapsed < 1.0
+
+    # 5. Runs report the tier behind every score
+    results = asyncio.run(run_simulation([QUESTION, "At $40?"], num_agents=4, seed=1))
+    evaluation = results["evaluation"]
+    assert sum(evaluation["tiers"].values()) == 8
+    assert all(len(qd["evaluations"]) == 4 for qd in results["question_details"])
+    assert "## Evaluation" in results["report"] and "(local)" in results["report"]
+
+    print("SUCCESS: Cascaded evaluation verified.")
+
+if __name__ == "__main__":
+    test_cascade_evaluation()
@@ -26,5 +26,15 @@ async def test_evaluation():
     score_bad = await evaluator.evaluate_response(question, response_bad, persona_bad)
     print(f"Scores: {score_bad}")
 
+    # Test Case 3: Both responses scored in one batched judge call
+    print("\nEvaluating Batch...")
+    items = [
+        {"response": response_good, "persona": persona_good},
+        {"response": response_bad, "persona": persona_bad},
+    ]
+    batch_scores = await evaluator.evaluate_batch(question, items)
+    print(f"Batch Scores: {batch_scores}")
+    assert len(batch_scores) == len(items)
+
 if __name__ == "__main__":
     asyncio.run(test_evaluation())
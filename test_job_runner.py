@@ -0,0 +1,50 @@
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.getcwd())
+os.environ["LLM_BACKEND"] = "mock"
+os.environ["LLM_CACHE"] = "0"
+from job_runner import JobExecutor, JobRejected
+
+def wait(executor, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = executor.get(job_id)
+        if job["status"] in ("done", "error", "cancelled"):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(job_id)
+
+def test_job_runner():
+    print("Testing Job Runner...")
+    job_dir = tempfile.mkdtemp()
+    executor = JobExecutor(workers=2, max_agents=5, max_concurrency=2, job_dir=job_dir)
+
+    # 1. Jobs run in the background and report progress, events and results
+    first = executor.submit(["Would you buy a smart mug?", "At $40?"], num_agents=3, max_concurrency=8, seed=1)
+    second = executor.submit("Would you try a meal kit?", num_agents=4, seed=2)
+    assert executor.get(first)["status"] in ("queued", "running")
+    job = wait(executor, first)
+    print(f"Job progress: {job['progress']}")
+    assert job["status"] == "done" and len(job["result"]["agents"]) == 3
+    assert job["progress"]["responses"] == 6 and job["progress"]["questions_done"] == 2
+    assert sum(e["type"] == "AgentResponse" for e in job["events"]) == 6
+    assert wait(executor, second)["status"] == "done"
+
+    # 2. Finished jobs can be read back by a new executor (e.g. after a restart)
+    assert JobExecutor(workers=1, job_dir=job_dir).get(first)["result"]["report"] == job["result"]["report"]
+
+    # 3. Jobs over the worker limits are rejected, failures are reported
+    try:
+        executor.submit("Too big?", num_agents=50)
+        assert False, "expected JobRejected"
+    except JobRejected:
+        pass
+    failed = wait(executor, executor.submit("Anyone?", num_agents=3, min_age=200, max_age=300))
+    assert failed["status"] == "error" and "age range" in failed["error"]
+
+    print("SUCCESS: Job runner verified.")
+
+if __name__ == "__main__":
+    test_job_runner()
@@ -0,0 +1,54 @@
+import sys
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+sys.path.append(os.getcwd())
+from llm_cache import CACHE_KINDS, LLMCache, cache_key
+import llm_client
+
+def test_llm_cache():
+    print("Testing LLM Response Cache...")
+    path = os.path.join(tempfile.mkdtemp(), "cache.sqlite")
+
+    # 1. Same model + prompt hits, a different model misses
+    cache = LLMCache(path=path, max_bytes=10_000, ttl=3600)
+    key = cache_key("gemini-test", "What do you think of the toaster?")
+    assert cache.get(key, "judge") is None
+    cache.put(key, "gemini-test", '{"relevance": 5}')
+    assert cache.get(key, "judge").text == '{"relevance": 5}'
+    assert cache.get(cache_key("other-model", "What do you think of the toaster?"), "judge") is None
+    stats = cache.stats()
+    print(f"Stats: {stats}")
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+    # 2. Entries survive a restart (on-disk)
+    cache = LLMCache(path=path, max_bytes=10_000, ttl=3600)
+    assert cache.get(key) is not None
+
+    # 3. Least recently used entries are evicted past the size cap
+    for i in range(20):
+        cache.put(cache_key("gemini-test", f"prompt {i}"), "gemini-test", "x" * 1000)
+        time.sleep(0.001)
+    assert cache.stats()["bytes"] <= 10_000
+    assert cache.get(cache_key("gemini-test", "prompt 0")) is None
+    assert cache.get(cache_key("gemini-test", "prompt 19")) is not None
+
+    # 4. Expired entries are not served
+    cache = LLMCache(path=path, max_bytes=10_000, ttl=0)
+    assert cache.get(cache_key("gemini-test", "prompt 19")) is None
+
+    # 5. Agent turns are only cached on request, and tool-call replies never (only text is kept)
+    if "LLM_CACHE_KINDS" not in os.environ:
+        assert "agent" not in CACHE_KINDS and "judge" in CACHE_KINDS
+    call = SimpleNamespace(function_call={"name": "web_search"})
+    text = SimpleNamespace(function_call=None, text="Hi")
+
+    def reply(parts):
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=parts))])
+    assert llm_client._has_function_call(reply([text, call])) and not llm_client._has_function_call(reply([text]))
+
+    print("SUCCESS: Cache verified.")
+
+if __name__ == "__main__":
+    test_llm_cache()
@@ -0,0 +1,67 @@
+import asyncio
+import sys
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.getcwd())
+from mcp_pool import MCPPool, MCPPoolError
+
+def test_mcp_pool():
+    print("Testing MCP Pool...")
+    pool = MCPPool(size=2).wait_ready(timeout=60)
+    try:
+        # 1. Tools are discovered and called through a plain synchronous function
+        assert {"web_search", "get_sentiment", "save_report"} <= set(pool.tools)
+        get_sentiment = pool.tool_function("get_sentiment")
+        assert json.loads(get_sentiment("I absolutely love this new feature!"))["label"] == "Positive"
+        assert json.loads(get_sentiment(text="This is awful."))["label"] == "Negative"
+
+        # 2. Concurrent calls share the warm sessions; no server starts per call
+        start = time.perf_counter()
+        with ThreadPoolExecutor(8) as threads:
+            results = list(threads.map(get_sentiment, ["Great product!"] * 40))
+        elapsed = time.perf_counter() - start
+        print(f"40 concurrent calls in {elapsed:.2f}s, stats: {pool.stats()}")
+        assert all(json.loads(r)["label"] == "Positive" for r in results)
+        assert pool.stats()["reconnects"] == 0
+
+        # 3. A broken session is reopened and calls keep working meanwhile
+        pool._loop.call_soon_threadsafe(pool._connections[0].broken.set)
+        assert json.loads(get_sentiment("Nice."))["label"] == "Positive"
+        deadline = time.time() + 30
+        while (pool.stats()["sessions"] < 2 or pool.stats()["reconnects"] < 1) and time.time() < deadline:
+            time.sleep(0.2)
+        assert pool.stats()["sessions"] == 2 and pool.stats()["reconnects"] == 1
+
+        # 4. Unknown tools and tool errors are reported, not retried as broken sessions
+        for call in (lambda: pool.tool_function("no_such_tool"), lambda: pool.call_tool("no_such_tool")):
+            try:
+                call()
+                assert False, "expected MCPPoolError"
+            except MCPPoolError:
+                pass
+        assert pool.stats()["sessions"] == 2 and pool.stats()["reconnects"] == 1
+
+        # 5. A session that stops answering is recycled and the call retried on another one
+        async def hang(*args, **kwargs):
+            await asyncio.Event().wait()
+
+        pool.call_timeout = 1
+        pool._connections[0].session.call_tool = hang
+        pool._connections[1].in_flight += 1   # steer the call to the silent session
+        try:
+            assert json.loads(get_sentiment("Lovely."))["label"] == "Positive"
+        finally:
+            pool._connections[1].in_flight -= 1
+        deadline = time.time() + 30
+        while (pool.stats()["sessions"] < 2 or pool.stats()["reconnects"] < 2) and time.time() < deadline:
+            time.sleep(0.2)
+        assert pool.stats()["sessions"] == 2 and pool.stats()["reconnects"] == 2
+    finally:
+        pool.close()
+
+    print("SUCCESS: MCP pool verified.")
+
+if __name__ == "__main__":
+    test_mcp_pool()
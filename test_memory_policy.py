@@ -0,0 +1,49 @@
+import sys
+import os
+sys.path.append(os.getcwd())
+os.environ["LLM_CACHE"] = "0"
+import llm_client
+from TinyTroupe.agent import TinyPerson
+from memory_policy import MemoryPolicy, is_summary
+
+def test_memory_policy():
+    print("Testing Memory Policy...")
+    llm_client.set_backend("mock")
+    llm_client.reset_call_stats()
+    policy = MemoryPolicy(recent_events=10, chunk_events=5, max_tokens=400, min_recent_events=2)
+    agent = TinyPerson("LongLived")
+
+    # 1. Nothing happens until a whole chunk has aged out of the recent window
+    for i in range(14):
+        agent.listen(f"Question {i}: What do you think of product {i}?")
+    assert policy.apply(agent) == 0
+    assert len(agent.episodic_memory.memory) == 14
+
+    # 2. The oldest chunk is folded into one summary event; recent events stay verbatim
+    agent.listen("Question 14: What do you think of product 14?")
+    assert policy.apply(agent) == 5
+    memory = agent.episodic_memory.memory
+    print(f"Summary: {memory[0]['content']}")
+    assert is_summary(memory[0]) and len(memory) == 11
+    assert "product 5?" in str(memory[1])
+
+    # 3. Later chunks roll into the same summary, one call per chunk
+    for i in range(15, 40):
+        agent.listen(f"Question {i}: What do you think of product {i}?")
+        policy.apply(agent)
+    memory = agent.episodic_memory.memory
+    assert sum(is_summary(e) for e in memory) == 1 and len(memory) < 16
+    print(f"Summary calls: {llm_client.call_stats()['summary']}")
+    assert llm_client.call_stats()["summary"]["model_calls"] == 6
+
+    # 4. Large events push older ones into the summary to stay within the token budget
+    for i in range(6):
+        agent.listen("A long answer. " * 20)
+    policy.apply(agent)
+    memory = agent.episodic_memory.memory
+    assert policy._tokens(memory[0], memory[1:]) <= 400
+
+    print("SUCCESS: Memory policy verified.")
+
+if __name__ == "__main__":
+    test_memory_policy()
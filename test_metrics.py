@@ -0,0 +1,60 @@
+import asyncio
+import sys
+import os
+import random
+import urllib.request
+sys.path.append(os.getcwd())
+os.environ["LLM_BACKEND"] = "mock"
+os.environ["LLM_CACHE"] = "0"
+import llm_client
+from observability import Histogram, agent_context, get_metrics, timed_tool
+from simulation import run_simulation
+
+def test_metrics():
+    print("Testing Latency Histograms...")
+
+    # 1. Quantiles track the real distribution within a bucket's width
+    rng = random.Random(0)
+    values = sorted(rng.lognormvariate(-1, 1) for _ in range(20000))
+    histogram = Histogram()
+    for v in values:
+        histogram.observe(v)
+    for q in (0.5, 0.95, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        print(f"p{int(q * 100)}: {histogram.quantile(q):.4f} (exact {exact:.4f})")
+        assert abs(histogram.quantile(q) - exact) / exact < 0.15
+    assert len(histogram.counts) == len(histogram.buckets) + 1
+
+    # 2. LLM and tool calls are recorded automatically, tagged by kind, model and agent
+    # (the registry is process-wide, so start from an empty one)
+    get_metrics().reset()
+    llm_client.set_backend("mock")
+    model = llm_client.get_model("gemini-2.0-flash")
+    with agent_context("Alice"):
+        llm_client.generate_content_with_retry(model, "Question 1: Do you like tea?")
+        timed_tool("web_search", lambda query: "results")("tea")
+    llm_client.generate_content_with_retry(model, "Rate this", kind="judge")
+    series = {(name, tags.get("kind"), tags.get("agent")) for name, tags, _ in get_metrics().series()}
+    assert ("crowdsim_llm_call_seconds", "agent", "Alice") in series
+    assert ("crowdsim_llm_call_seconds", "judge", "") in series
+    assert ("crowdsim_tool_call_seconds", None, "Alice") in series
+
+    # 3. Prometheus exposition, from text or over HTTP
+    text = get_metrics().to_prometheus()
+    assert "# TYPE crowdsim_llm_call_seconds histogram" in text
+    assert 'crowdsim_llm_call_seconds_count{agent="Alice",kind="agent",model="gemini-2.0-flash",outcome="ok"} 1' in text
+    server = get_metrics().serve_prometheus(0)
+    body = urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics").read().decode()
+    server.shutdown()
+    assert 'le="+Inf"' in body
+
+    # 4. Agent turns are labelled with the agent in sequential runs too
+    results = asyncio.run(run_simulation("Would you buy a smart mug?", num_agents=3, seed=1, max_concurrency=1))
+    agent_labels = {tags.get("agent") for name, tags, _ in get_metrics().series()
+                    if name == "crowdsim_llm_call_seconds" and tags.get("kind") == "agent"}
+    assert agent_labels == {"Alice"} | set(results["agents"])
+
+    print("SUCCESS: Latency histograms verified.")
+
+if __name__ == "__main__":
+    test_metrics()
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import sys
+import os
+sys.path.append(os.getcwd())
+os.environ["LLM_CACHE"] = "0"
+import llm_client
+from mock_llm import MockModel
+from evaluator import Evaluator
+
+def test_mock_llm():
+    print("Testing Mock LLM Backend...")
+    previous = llm_client.get_backend()
+    llm_client.set_backend("mock", seed=7)
+    try:
+        _check_mock_backend()
+    finally:
+        llm_client.set_backend(previous)
+    print("SUCCESS: Mock backend verified.")
+
+def _check_mock_backend():
+    # 1. Same seed + prompt gives the same reply, even from a fresh model
+    prompt = "Question 1: What do you think of a subscription service for coffee beans?"
+    first = MockModel(seed=7).generate_content(prompt).text
+    second = MockModel(seed=7).generate_content(prompt).text
+    print(f"Agent reply: {first}")
+    assert first == second
+
+    # 2. Judge replies are valid JSON the Evaluator can use, single and batched
+    evaluator = Evaluator()
+    score = asyncio.run(evaluator.evaluate_response("Do you like coffee?", "Yes, every morning.", "30 year old Barista"))
+    assert set(score) == {"relevance", "coherence", "fidelity"}
+    items = [{"response": f"Answer {i}", "persona": "30 year old Barista"} for i in range(5)]
+    batch = asyncio.run(evaluator.evaluate_batch("Do you like coffee?", items, chunk_size=3))
+    print(f"Batch scores: {batch}")
+    assert len(batch) == 5 and all(1 <= s["relevance"] <= 5 for s in batch)
+
+    # 3. Sentiment replies carry score/label/summary
+    sentiment = json.loads(MockModel().generate_content(
+        "Analyze the sentiment...\nProvide the output as a valid JSON object with keys: 'score' (1-10), 'label', 'summary'.").text)
+    assert {"score", "label", "summary"} <= set(sentiment)
+
+    # 4. Injected 429s are retried by llm_client
+    llm_client.set_backend("mock", seed=7, error_rate=0.5)
+    response = llm_client.generate_content_with_retry(llm_client.get_model("mock-429"), "Hello", max_retries=20)
+    assert response.text
+
+    # Retry bookkeeping is dropped once a prompt gets through
+    flaky = MockModel(error_rate=0.5, seed=7)
+    for i in range(50):
+        while True:
+            try:
+                flaky.generate_content(f"Prompt {i}")
+                break
+            except Exception:
+                pass
+    assert flaky.calls > 50 and flaky._attempts == {}
+
+if __name__ == "__main__":
+    test_mock_llm()
@@ -0,0 +1,47 @@
+import sys
+import os
+import glob
+import gzip
+import json
+import tempfile
+sys.path.append(os.getcwd())
+from observability import LogWriter, StructuredLogger, get_log_writer
+
+def test_observability():
+    print("Testing Structured Logger...")
+    log_dir = tempfile.mkdtemp()
+
+    # 1. Many loggers share one writer; each record is written once, with its own trace_id
+    writer = get_log_writer()
+    loggers = [StructuredLogger() for _ in range(20)]
+    assert all(logger._writer is writer for logger in loggers)
+    assert len({logger.trace_id for logger in loggers}) == 20
+
+    path = os.path.join(log_dir, "simulation.jsonl")
+    writer = LogWriter(path, max_bytes=1_000_000, backups=2)
+    run_a, run_b = StructuredLogger(trace_id="run-a"), StructuredLogger(trace_id="run-b")
+    run_a._writer = run_b._writer = writer
+    for i in range(50):
+        run_a.log("agent_action", {"i": i})
+        run_b.log("agent_action", {"i": i})
+    writer.flush()
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 100
+    assert sum(r["trace_id"] == "run-a" for r in records) == 50
+
+    # 2. Past max_bytes the file is gzipped away; only the newest archives are kept
+    writer.max_bytes = 10_000
+    for i in range(2000):
+        run_a.log("agent_action", {"i": i, "text": "x" * 50})
+    writer.flush()
+    archives = glob.glob(os.path.join(log_dir, "simulation-*.jsonl.gz"))
+    print(f"Archives: {len(archives)}, current file: {os.path.getsize(path) if os.path.exists(path) else 0} bytes")
+    assert len(archives) == 2
+    with gzip.open(archives[0], "rt") as f:
+        assert json.loads(f.readline())["event_type"] == "agent_action"
+
+    print("SUCCESS: Structured logger verified.")
+
+if __name__ == "__main__":
+    test_observability()
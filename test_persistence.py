@@ -31,5 +31,27 @@ def test_persistence():
     else:
         print("FAILURE: Agent forgot the secret code.")
 
+    # 5. Resume, add more memories and save again: only the new events are journaled
+    for i in range(40):
+        loaded_agent.listen(f"Fact number {i}.")
+    manager.save_session(session_id, loaded_agents)
+    loaded_agents[0].listen("The new code is 67890.")
+    manager.save_session(session_id, loaded_agents)
+    # An in-place edit of an early event (as when MemoryPolicy truncates the summary) is journaled too
+    memory = loaded_agent.episodic_memory.memory
+    memory[0] = dict(memory[0], content="The secret code was changed.")
+    manager.save_session(session_id, loaded_agents)
+    journal = os.path.join(manager.session_dir, session_id, "journal.jsonl.gz")
+    print(f"Journal size: {os.path.getsize(journal)} bytes")
+
+    # 6. Replay snapshot + journal, and again after compaction
+    for stage in ("journal", "compacted"):
+        reloaded = manager.load_session(session_id)[0][0].episodic_memory.retrieve_all()
+        assert reloaded == loaded_agent.episodic_memory.retrieve_all()
+        assert "67890" in str(reloaded[-1]) and "changed" in str(reloaded[0])
+        manager.compact_session(session_id)
+    assert not os.path.exists(journal)
+    print("SUCCESS: Journaled session replayed correctly.")
+
 if __name__ == "__main__":
     test_persistence()
@@ -0,0 +1,39 @@
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.getcwd())
+from persona_store import PersonaStore, convert, get_persona_store
+
+def test_persona_store():
+    print("Testing Persona Store...")
+    with open("personas.json", "r") as f:
+        personas = json.load(f)
+
+    # 1. Age filter matches the old list comprehension
+    store = PersonaStore.from_personas(personas)
+    expected = [i for i, p in enumerate(personas) if 25 <= p["age"] <= 40]
+    assert list(store.filter(min_age=25, max_age=40)) == expected
+    assert store.get(expected[0]) == personas[expected[0]]
+
+    # 2. Attribute filters combine with the age range
+    occupation = personas[0]["occupation"]
+    interest = personas[0]["interests"][0]
+    expected = [i for i, p in enumerate(personas)
+                if p["age"] >= 19 and p["occupation"] == occupation and interest in p["interests"]]
+    assert list(store.filter(min_age=19, occupations=[occupation], interests=interest)) == expected
+    assert len(store.filter(occupations=["Astronaut Chef"])) == 0
+
+    # 3. A converted store is memory-mapped back with identical answers
+    directory = os.path.join(tempfile.mkdtemp(), "personas_store")
+    convert("personas.json", directory)
+    mapped = get_persona_store(directory)
+    assert len(mapped) == len(personas)
+    assert list(mapped.filter(min_age=25, max_age=40)) == list(store.filter(min_age=25, max_age=40))
+    assert mapped.get(len(personas) - 1) == personas[-1]
+    assert get_persona_store(directory) is mapped  # loaded once per process
+
+    print(f"SUCCESS: Persona store verified ({len(store)} personas).")
+
+if __name__ == "__main__":
+    test_persona_store()
@@ -0,0 +1,32 @@
+import sys
+import os
+sys.path.append(os.getcwd())
+from retrieval import chunk_text, get_document_index
+
+def test_retrieval():
+    print("Testing Document Retrieval...")
+    with open("dataset.txt", "r", encoding="utf-8") as f:
+        document = f.read()
+
+    # 1. Chunks overlap and together cover the whole document
+    chunks = chunk_text(document, chunk_words=50, overlap=10)
+    assert len(chunks) > 4
+    assert chunks[0].split()[-10:] == chunks[1].split()[:10]
+    assert chunks[-1].split()[-1] == document.split()[-1]
+
+    # 2. A question only gets the chunks that match it
+    index = get_document_index(document, chunk_words=50, overlap=10)
+    best = index.top_chunks("How much storage does it have? Is there a 2 TB option?", k=2)
+    print(f"Top chunk: {best[0][:80]}...")
+    assert len(best) == 2 and any("2 TB" in chunk for chunk in best)
+
+    # 3. The index is built once per document
+    assert get_document_index(document, chunk_words=50, overlap=10) is index
+
+    # 4. Questions with no matching terms still get some context
+    assert len(index.top_chunks("zzz qqq", k=3)) == 3
+
+    print("SUCCESS: Document retrieval verified.")
+
+if __name__ == "__main__":
+    test_retrieval()
@@ -0,0 +1,58 @@
+import sys
+import os
+import json
+sys.path.append(os.getcwd())
+import numpy as np
+from persona_store import PersonaStore
+from sampling import sample_panel
+
+def test_sampling():
+    print("Testing Panel Sampling...")
+    rng = np.random.default_rng(0)
+    occupations = ["Teacher", "Nurse", "Engineer", "Artist"]
+    personas = [
+        {"name": f"P{i}", "age": int(age), "occupation": occupations[i % 4], "interests": []}
+        for i, age in enumerate(rng.integers(18, 70, 20000))
+    ]
+    store = PersonaStore.from_personas(personas)
+
+    # 1. Same seed, same panel; different seed, different panel
+    first = sample_panel(store, 50, min_age=25, max_age=45, seed=1)
+    assert list(first) == list(sample_panel(store, 50, min_age=25, max_age=45, seed=1))
+    assert list(first) != list(sample_panel(store, 50, min_age=25, max_age=45, seed=2))
+    assert all(25 <= personas[i]["age"] <= 45 for i in first)
+    assert len(set(first)) == 50
+    # Speaking order is shuffled too, for every method
+    assert list(first) != sorted(first)
+    for method in ("stratified", "weighted"):
+        assert list(sample_panel(store, 50, method=method, seed=1)) != sorted(sample_panel(store, 50, method=method, seed=1))
+
+    # 2. Quota sampling hits the requested mix exactly
+    quotas = {"18-29": 0.5, "30-39": 0.3, "50-59": 0.2}
+    panel = sample_panel(store, 100, method="quota", by="age_band", quotas=quotas, seed=3)
+    bands = [next(b for b in ("18-29", "30-39", "40-49", "50-59", "60-120")
+                  if int(b.split("-")[0]) <= personas[i]["age"] <= int(b.split("-")[1])) for i in panel]
+    assert (bands.count("18-29"), bands.count("30-39"), bands.count("50-59")) == (50, 30, 20)
+
+    # 3. A quota larger than its stratum is topped up from the other strata
+    tiny = sample_panel(store, 40, min_age=18, max_age=30, method="quota", by="occupation",
+                        quotas={"Teacher": 1.0}, seed=4)
+    assert len(tiny) == 40
+
+    # 4. Weighted draws favour heavier strata; zero weight is never drawn
+    weighted = sample_panel(store, 400, method="weighted", by="occupation",
+                            weights={"Engineer": 5.0, "Artist": 0.0}, seed=5)
+    picked = [personas[i]["occupation"] for i in weighted]
+    assert "Artist" not in picked
+    assert picked.count("Engineer") > picked.count("Teacher")
+
+    # 5. Stratified draws keep population shares
+    stratified = sample_panel(store, 400, method="stratified", by="occupation", seed=6)
+    counts = json.dumps({o: sum(personas[i]["occupation"] == o for i in stratified) for o in occupations})
+    print(f"Stratified occupation counts: {counts}")
+    assert all(sum(personas[i]["occupation"] == o for i in stratified) == 100 for o in occupations)
+
+    print("SUCCESS: Sampling verified.")
+
+if __name__ == "__main__":
+    test_sampling()
@@ -0,0 +1,65 @@
+import sys
+import os
+import time
+import tempfile
+import threading
+sys.path.append(os.getcwd())
+from search_cache import SearchCache, normalize_query
+
+def test_search_cache():
+    print("Testing Search Cache...")
+    calls = []
+
+    def fetch(query, limit):
+        calls.append(query)
+        time.sleep(0.2)
+        return [{"title": f"{query} {i}", "href": f"https://example.com/{i}", "body": "..."} for i in range(limit)]
+
+    # 1. Near-identical queries share one entry; entries expire and the cache is capped
+    assert normalize_query("Smart  Mug, price?") == normalize_query("smart mug price") == "smart mug price"
+    assert normalize_query("flights paris london") != normalize_query("flights london paris")
+    cache = SearchCache(ttl=60, max_entries=2)
+    first = cache.search("Smart Mug price", 3, fetch)
+    assert cache.search("smart mug, PRICE?", 3, fetch) is first and len(calls) == 1
+    cache.search("meal kit", 3, fetch)
+    cache.search("coffee", 3, fetch)
+    assert cache.stats()["entries"] == 2
+    cache.ttl = 0
+    cache.search("coffee", 3, fetch)
+    assert len(calls) == 4
+
+    # 2. Identical searches in flight at the same moment send one request
+    cache = SearchCache(ttl=60)
+    calls.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.search("smart mug review", 2, fetch)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"Stats: {cache.stats()}")
+    assert len(calls) == 1 and len(results) == 8 and all(r is results[0] for r in results)
+    assert cache.stats()["coalesced"] == 7
+
+    # 3. Failures reach every waiter and are not cached
+    def failing(query, limit):
+        raise RuntimeError("rate limited")
+    try:
+        cache.search("broken", 2, failing)
+        assert False, "expected RuntimeError"
+    except RuntimeError:
+        pass
+    assert cache.search("broken", 2, fetch)
+
+    # 4. Recorded results are replayed offline
+    fixtures = os.path.join(tempfile.mkdtemp(), "web_search.json")
+    SearchCache(mode="record", fixtures_path=fixtures).search("Smart mug price", 3, fetch)
+    replay = SearchCache(mode="replay", fixtures_path=fixtures)
+    assert len(replay.search("smart mug, PRICE?", 2, failing)) == 2
+    assert replay.search("never searched", 2, failing) == []
+
+    print("SUCCESS: Search cache verified.")
+
+if __name__ == "__main__":
+    test_search_cache()
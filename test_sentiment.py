@@ -0,0 +1,57 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.getcwd())
+os.environ["LLM_BACKEND"] = "mock"
+os.environ["LLM_CACHE"] = "0"
+from textblob import TextBlob
+from sentiment import get_sentiment_engine
+from simulation import run_simulation, score_sentiment
+import llm_client
+
+TEXTS = [
+    "I really like the smart mug. It seems genuinely useful for someone like me.",
+    "Honestly, I'm not convinced about the mug. It feels like a gimmick.",
+    "This is not a good idea at all, terrible value.",
+    "I have mixed feelings; the idea is good but the value is unclear.",
+    "I could see myself trying it if friends recommended it.",
+    "This is not a very good toaster.",
+    "I love it!!!",
+]
+
+def test_sentiment():
+    print("Testing Sentiment Engine...")
+    engine = get_sentiment_engine()
+
+    # 1. The scores match TextBlob's per-text polarity, negations and exclamations included
+    polarity, _, _ = engine.polarities(TEXTS)
+    for text, p in zip(TEXTS, polarity):
+        assert abs(p - TextBlob(text).sentiment.polarity) < 1e-6, text
+
+    # 2. A clear panel is confident; a split one is not
+    clear = engine.score([("A", "I love it, great value."), ("B", "Excellent, really good."), ("C", "Nice and useful.")])
+    split = engine.score([("A", "I love it."), ("B", "Terrible, awful idea."), ("C", "It is fine.")])
+    print(f"Clear: {clear['label']} ({clear['confidence']}), split: {split['label']} ({split['confidence']})")
+    assert clear["label"] == "Positive" and clear["score"] > 5 and clear["confidence"] >= 0.6
+    assert split["confidence"] < 0.6 and set(split["agents"]) == {"A", "B", "C"}
+
+    # 3. The LLM is only asked when unsure, or when a narrative summary is requested
+    llm_client.reset_call_stats()
+    confident = asyncio.run(score_sentiment([("A", "I love it, great value."), ("B", "Excellent, really good.")], "Q?"))
+    assert confident["source"] == "local" and "sentiment" not in llm_client.call_stats()
+    unsure = asyncio.run(score_sentiment([("A", "I love it."), ("B", "Terrible, awful idea.")], "Q?"))
+    assert unsure["source"] == "llm" and llm_client.call_stats()["sentiment"]["requests"] == 1
+    assert asyncio.run(score_sentiment([("A", "Great.")], "Q?", mode="llm"))["source"] == "llm"
+
+    # 4. Runs report per-agent scores and how each question was scored
+    llm_client.reset_call_stats()
+    results = asyncio.run(run_simulation(["Would you buy a smart mug?", "At $40?"], num_agents=4, seed=1,
+                                         sentiment_mode="local"))
+    assert "sentiment" not in llm_client.call_stats()
+    for qd in results["question_details"]:
+        assert qd["sentiment_source"] == "local" and len(qd["agent_sentiment"]) == 4
+
+    print("SUCCESS: Sentiment engine verified.")
+
+if __name__ == "__main__":
+    test_sentiment()
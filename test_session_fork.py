@@ -0,0 +1,80 @@
+import sys
+import os
+import tempfile
+sys.path.append(os.getcwd())
+from TinyTroupe.agent import TinyPerson
+import session_manager as sm
+from session_manager import SessionManager
+
+def memories(agent):
+    return str(agent.episodic_memory.retrieve_all())
+
+def make_panel():
+    agents = []
+    for i in range(3):
+        agent = TinyPerson(f"Agent{i}")
+        agent.define("age", 30 + i)
+        agent.listen(f"I grew up in town {i}.")
+        agents.append(agent)
+    return agents
+
+def check_fork(manager, name):
+    print(f"Testing session forking ({name})...")
+    manager.save_session("parent", make_panel())
+
+    # 1. Children start from the parent's state and diverge independently
+    child_a = manager.fork_session("parent")
+    child_b = manager.fork_session("parent", "child_b")
+    assert child_b == "child_b"
+    assert {"parent", child_a, child_b} <= set(manager.list_sessions())
+
+    agents_a, _ = manager.load_session(child_a)
+    assert "town 1" in memories(agents_a[1])
+    agents_a[1].listen("Branch A: the price went up.")
+    manager.save_session(child_a, agents_a)
+
+    agents_b, _ = manager.load_session(child_b)
+    agents_b[1].listen("Branch B: the price went down.")
+    manager.save_session(child_b, agents_b)
+
+    # 2. The parent moves on without affecting its children
+    parent, _ = manager.load_session("parent")
+    parent[1].listen("Parent: no price change.")
+    manager.save_session("parent", parent)
+
+    a, _ = manager.load_session(child_a)
+    b, _ = manager.load_session(child_b)
+    p, _ = manager.load_session("parent")
+    assert "Branch A" in memories(a[1]) and "Branch B" not in memories(a[1]) and "Parent" not in memories(a[1])
+    assert "Branch B" in memories(b[1]) and "Branch A" not in memories(b[1])
+    assert "Parent" in memories(p[1]) and "Branch" not in memories(p[1])
+    assert "town 0" in memories(b[0])
+
+    # 3. Forks of forks see the whole lineage
+    grandchild = manager.fork_session(child_a)
+    g, _ = manager.load_session(grandchild)
+    assert "Branch A" in memories(g[1]) and "town 2" in memories(g[2])
+    return child_a, child_b
+
+def test_session_fork():
+    session_dir = tempfile.mkdtemp()
+    manager = SessionManager(session_dir, backend="journal")
+    child_a, child_b = check_fork(manager, "journal")
+
+    # Compacting the parent keeps the journal records its children still need
+    manager.compact_session("parent")
+    sm._base_states.clear()
+    b, _ = manager.load_session(child_b)
+    assert "Branch B" in memories(b[1]) and "Parent" not in memories(b[1])
+
+    # A compacted child is self-contained and releases its pin on the parent
+    manager.compact_session(child_b)
+    assert child_b not in [p["child"] for p in manager._pins("parent")]
+    b, _ = manager.load_session(child_b)
+    assert "Branch B" in memories(b[1]) and "town 1" in memories(b[1])
+
+    check_fork(SessionManager(tempfile.mkdtemp(), backend="sqlite"), "sqlite")
+    print("SUCCESS: Session forking verified.")
+
+if __name__ == "__main__":
+    test_session_fork()
@@ -0,0 +1,49 @@
+import sys
+import os
+import tempfile
+sys.path.append(os.getcwd())
+from TinyTroupe.agent import TinyPerson
+from session_manager import SessionManager
+from sqlite_session_store import LazyAgentList, migrate
+
+def test_session_store():
+    print("Testing SQLite Session Store...")
+    session_dir = tempfile.mkdtemp()
+
+    # 1. A JSON/journal session migrates into SQLite
+    agents = []
+    for i in range(5):
+        agent = TinyPerson(f"Agent{i}")
+        agent.define("age", 20 + i)
+        agent.listen(f"My lucky number is {i}.")
+        agents.append(agent)
+    SessionManager(session_dir, backend="journal").save_session("migrated", agents)
+    migrate(session_dir)
+
+    manager = SessionManager(session_dir, backend="sqlite")
+    assert manager.list_sessions() == ["migrated"]
+
+    # 2. Loading materializes agents only when they are accessed
+    loaded, _ = manager.load_session("migrated")
+    assert isinstance(loaded, LazyAgentList)
+    assert loaded.names == [f"Agent{i}" for i in range(5)]
+    assert not any(loaded.is_hydrated(i) for i in range(5))
+    assert "3" in str(loaded[3].episodic_memory.retrieve_all())
+    assert loaded.is_hydrated(3) and not loaded.is_hydrated(0)
+
+    # 3. Saving writes back only the hydrated agent; the others are untouched
+    loaded[3].listen("My new lucky number is 42.")
+    manager.save_session("migrated", loaded, last_question="What is your lucky number?")
+    reloaded, _ = manager.load_session("migrated")
+    assert "42" in str(reloaded[3].episodic_memory.retrieve_all())
+    assert "0" in str(reloaded[0].episodic_memory.retrieve_all())
+
+    # 4. Metadata comes from the indexed sessions table
+    info = manager.session_info()[0]
+    print(f"Session info: {info}")
+    assert info["panel_size"] == 5 and info["last_question"] == "What is your lucky number?"
+
+    print("SUCCESS: SQLite session store verified.")
+
+if __name__ == "__main__":
+    test_session_store()
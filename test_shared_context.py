@@ -0,0 +1,107 @@
+import sys
+import os
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.getcwd())
+os.environ["LLM_CACHE"] = "0"
+import llm_client
+from TinyTroupe.agent import TinyPerson
+from session_manager import SessionManager
+import shared_context
+from shared_context import SharedContext, get_shared_context
+
+class RecordingModel:
+    model_name = "recording-model"
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return type("Response", (), {"text": "ok"})()
+
+def test_shared_context():
+    print("Testing Shared Context...")
+    document = "Spec sheet: the toaster has 12 slots and a touch screen. " * 200
+
+    # 1. The same text always gets the same short reference
+    context = SharedContext()
+    ref = context.register(document)
+    assert ref == context.register(document) and len(ref) < 40
+    assert context.expand(f"Context for this session: {ref}") == f"Context for this session: {document}"
+    assert context.expand([{"parts": [ref]}]) == [{"parts": [document]}]
+
+    # 2. llm_client expands references just before the model call
+    ref = get_shared_context().register(document)
+    model = RecordingModel()
+    previous = llm_client.get_backend()
+    llm_client.set_backend("gemini")
+    try:
+        llm_client.generate_content_with_retry(model, f"Context for this session: {ref}\nQuestion 1: Thoughts?", kind="judge")
+    finally:
+        llm_client.set_backend(previous)
+    assert document in model.prompts[0] and "[[shared-context:" not in model.prompts[0]
+
+    # 3. Agents and session files hold the reference, the world state holds the text once
+    agents = [TinyPerson(f"Agent{i}") for i in range(10)]
+    for agent in agents:
+        agent.listen(f"Context for this session: {ref}")
+    session_dir = tempfile.mkdtemp()
+    manager = SessionManager(session_dir, backend="journal")
+    manager.save_session("shared", agents, world_state={"shared_context": get_shared_context().segments(get_shared_context().keys_in(ref))})
+    loaded, world_state = manager.load_session("shared")
+    assert ref in str(loaded[0].episodic_memory.retrieve_all())
+    assert json.dumps(world_state).count("12 slots") == 200
+
+    # 4. The registry is bounded: least recently used segments are dropped first
+    context = SharedContext(max_chars=250)
+    refs = [context.register(f"Segment {i}: " + "x" * 90) for i in range(2)]
+    context.expand(refs[0])   # used since segment 1 was registered, so segment 1 goes first
+    refs.append(context.register("Segment 2: " + "x" * 90))
+    assert set(context.segments()) == {context.keys_in(refs[0])[0], context.keys_in(refs[2])[0]}
+
+    # 5. Large segments are uploaded once, with the model's instruction, and keep its settings
+    import google.generativeai as genai
+    from google.generativeai import caching
+    uploads = []
+
+    def create(**kwargs):
+        uploads.append(kwargs)
+        time.sleep(0.2)
+        if kwargs["model"] == "models/no-cache-model":
+            raise RuntimeError("caching not supported")
+        return "cachedContents/test"
+
+    def from_cached_content(cached_content, generation_config=None, safety_settings=None):
+        return (cached_content, generation_config, safety_settings)
+
+    original = caching.CachedContent.create, genai.GenerativeModel.from_cached_content
+    caching.CachedContent.create, genai.GenerativeModel.from_cached_content = create, from_cached_content
+    try:
+        context = SharedContext()
+        ref = context.register(document)
+        model = genai.GenerativeModel("gemini-2.0-flash", system_instruction="Be brief.",
+                                      generation_config={"temperature": 0.2})
+        with ThreadPoolExecutor(4) as threads:
+            prepared = list(threads.map(lambda _: context.prepare(model, "gemini-2.0-flash", ref, lambda t: 10 ** 6), range(4)))
+        assert len(uploads) == 1 and uploads[0]["system_instruction"] is model._system_instruction
+        expected = ("cachedContents/test", model._generation_config, model._safety_settings)
+        assert all(p == (expected, shared_context.CACHED_PLACEHOLDER) for p in prepared)
+
+        # A failed upload falls back to inline context and is tried again later
+        shared_context.CONTEXT_CACHE_RETRY = 0.5
+        assert context.prepare(model, "no-cache-model", ref, lambda t: 10 ** 6) == (model, document)
+        assert context.prepare(model, "no-cache-model", ref, lambda t: 10 ** 6) == (model, document)
+        assert len(uploads) == 2
+        time.sleep(0.6)
+        context.prepare(model, "no-cache-model", ref, lambda t: 10 ** 6)
+        assert len(uploads) == 3
+    finally:
+        caching.CachedContent.create, genai.GenerativeModel.from_cached_content = original
+
+    print("SUCCESS: Shared context verified.")
+
+if __name__ == "__main__":
+    test_shared_context()
@@ -0,0 +1,51 @@
+import asyncio
+import sys
+import time
+import os
+sys.path.append(os.getcwd())
+os.environ["LLM_BACKEND"] = "mock"
+os.environ["LLM_CACHE"] = "0"
+from simulation import stream_simulation, run_simulation
+import llm_client
+from simulation_events import AgentResponse, EvaluationScore, QuestionSentiment, SessionStarted, SimulationComplete
+
+async def collect(**options):
+    return [event async for event in stream_simulation(["Would you buy a smart mug?", "At $40?"], **options)]
+
+def test_streaming():
+    print("Testing Streaming Simulation...")
+    for max_concurrency in (1, 4):
+        events = asyncio.run(collect(num_agents=4, max_concurrency=max_concurrency, seed=1))
+        kinds = [type(e) for e in events]
+
+        # Session first, report last, and each question's answers before its sentiment
+        assert kinds[0] is SessionStarted and kinds[-1] is SimulationComplete
+        assert kinds.count(AgentResponse) == 8 and kinds.count(EvaluationScore) == 8
+        first_sentiment = kinds.index(QuestionSentiment)
+        assert all(e.question_index == 0 for e in events[:first_sentiment] if isinstance(e, AgentResponse))
+        assert events[-1].results["question_details"][0]["score"] == events[first_sentiment].score
+
+    # Sequential turns stream each answer as soon as that agent has acted, not at the end of the turn
+    async def answer_times():
+        times = []
+        async for event in stream_simulation("Would you buy a smart mug?", num_agents=4, max_concurrency=1, seed=1):
+            if isinstance(event, AgentResponse):
+                times.append(time.perf_counter())
+        return times
+    previous = llm_client.get_backend()
+    llm_client.set_backend("mock", latency="0.2")
+    try:
+        times = asyncio.run(answer_times())
+    finally:
+        llm_client.set_backend(previous)
+    assert len(times) == 4 and times[-1] - times[0] >= 0.4
+
+    # run_simulation returns the final event's results
+    results = asyncio.run(run_simulation("Would you buy a smart mug?", num_agents=3, seed=1))
+    assert len(results["agents"]) == 3 and "report" in results
+    assert "error" in asyncio.run(run_simulation("Anyone?", min_age=200, max_age=300))
+
+    print("SUCCESS: Streaming simulation verified.")
+
+if __name__ == "__main__":
+    test_streaming()
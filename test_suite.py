@@ -7,6 +7,10 @@ from TinyTroupe.agent import TinyPerson
 from TinyTroupe.protocol import Message
 from evaluator import Evaluator
 from mcp_server import web_search, get_sentiment
+import llm_client
+
+# Agent calls go through llm_client too, so LLM_BACKEND=mock runs this offline
+llm_client.install()
 
 # Ensure we can import local modules
 sys.path.append(os.getcwd())
@@ -3,6 +3,10 @@ import os
 sys.path.append(os.getcwd())
 from TinyTroupe.agent import TinyPerson
 from mcp_server import web_search
+import llm_client
+
+# Agent calls go through llm_client too, so LLM_BACKEND=mock runs this offline
+llm_client.install()
 
 def test_tool_usage():
     print("Testing Tool Integration...")
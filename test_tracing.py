@@ -0,0 +1,77 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import tempfile
+sys.path.append(os.getcwd())
+import tracing
+from tracing import TraceExporter, critical_path, current_span, load_trace, self_times, span, trace
+
+def test_tracing():
+    print("Testing Tracing...")
+    tracing._exporter = TraceExporter(tempfile.mkdtemp())
+
+    # 1. Spans nest through asyncio tasks and threads; the trace is written when the root ends
+    async def agent(name):
+        with span("agent.act", agent=name):
+            await asyncio.to_thread(lambda: span_in_thread(name))
+
+    def span_in_thread(name):
+        with span("llm.call", kind="agent"):
+            time.sleep(0.02)
+
+    async def run():
+        with trace("simulation") as root:
+            with span("question", index=0):
+                await asyncio.gather(agent("A"), agent("B"))
+            with span("session.save"):
+                time.sleep(0.01)
+            return root.trace_id
+
+    trace_id = asyncio.run(run())
+    assert current_span() is None
+    path = os.path.join(tracing._exporter.directory, f"{trace_id}.json")
+    with open(path) as f:
+        otlp = json.load(f)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert len(otlp) == 7 and all(s["traceId"] == trace_id for s in otlp)
+
+    spans = load_trace(path)
+    by_id = {s["id"]: s for s in spans}
+    for s in spans:
+        if s["name"] == "llm.call":
+            assert by_id[s["parent"]]["name"] == "agent.act"
+        if s["name"] == "agent.act":
+            assert by_id[s["parent"]]["name"] == "question"
+
+    # 2. Critical path runs through both sequential steps; overlapping children count once
+    names = [s["name"] for _, s in critical_path(spans)]
+    print(f"Critical path: {names}")
+    assert names == ["simulation", "question", "agent.act", "llm.call", "session.save"]
+    totals = self_times(spans)
+    assert totals["question"] < 0.015 and totals["agent.act"] < 0.015
+
+    # 3. Errors are recorded on the span
+    try:
+        with trace("failing") as s:
+            failing_id = s.trace_id
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    with open(os.path.join(tracing._exporter.directory, f"{failing_id}.json")) as f:
+        status = json.load(f)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["status"]
+    assert status == {"code": 2, "message": "RuntimeError: boom"}
+
+    # 4. Spans outside a trace are not recorded, and only the newest traces are kept
+    with span("llm.call") as s:
+        assert s is None
+    tracing._exporter = TraceExporter(tempfile.mkdtemp(), max_files=3)
+    for _ in range(5):
+        with trace("simulation"):
+            time.sleep(0.01)
+    assert len(os.listdir(tracing._exporter.directory)) == 3
+
+    print("SUCCESS: Tracing verified.")
+
+if __name__ == "__main__":
+    test_tracing()
@@ -0,0 +1,57 @@
+import asyncio
+import sys
+import os
+sys.path.append(os.getcwd())
+os.environ["LLM_BACKEND"] = "mock"
+os.environ["LLM_CACHE"] = "0"
+os.environ["LLM_REQUESTS_PER_MINUTE"] = "100000"
+from simulation import stream_simulation, run_simulation
+from simulation_events import BudgetExceeded, QuestionSentiment, SimulationComplete
+from usage import UsageTracker, usage_question
+from mock_llm import MockUsage
+
+QUESTIONS = ["Would you buy a smart mug?", "At $40?", "Would you gift one?"]
+
+def test_usage():
+    print("Testing Usage Accounting...")
+
+    # 1. Calls are summed per model, kind, agent and question and priced
+    tracker = UsageTracker(token_budget=0, cost_budget=0, prices={"gemini-2.0": {"input": 1.0, "output": 2.0}})
+    with usage_question(1):
+        tracker.record("gemini-2.0-flash-lite", "agent", MockUsage(1000, 500), agent="Ann")
+    tracker.record("gemini-2.0-flash-lite", "judge", None, cache_hit=True)
+    summary = tracker.summary()
+    assert summary["total"]["total_tokens"] == 1500 and summary["total"]["cache_hits"] == 1
+    assert summary["total"]["cost_usd"] == 0.002
+    assert summary["by_agent"] == {"Ann": summary["by_question"]["1"]}
+    assert summary["by_kind"]["judge"]["calls"] == 1 and tracker.exceeded() is None
+
+    # 2. A run reports its usage in the results
+    for max_concurrency in (1, 4):
+        results = asyncio.run(run_simulation(QUESTIONS[:2], num_agents=3, seed=1, max_concurrency=max_concurrency,
+                                             eval_mode="llm", sentiment_mode="llm"))
+        usage = results["usage"]
+        print(f"Usage (concurrency {max_concurrency}): {usage['total']}")
+        assert usage["total"]["total_tokens"] > 0 and usage["total"]["cost_usd"] > 0
+        assert set(usage["by_question"]) == {"1", "2"}
+        assert {"agent", "judge", "sentiment"} <= set(usage["by_kind"])
+        assert sum(q["calls"] for q in usage["by_question"].values()) == usage["total"]["calls"]
+        assert set(usage["by_agent"]) == set(results["agents"])
+
+    # 3. Over budget the run finishes the question without more LLM calls and stops, with the results so far
+    async def collect():
+        return [e async for e in stream_simulation(QUESTIONS, num_agents=3, seed=1, token_budget=1,
+                                                   eval_mode="llm", sentiment_mode="llm")]
+    events = asyncio.run(collect())
+    assert sum(isinstance(e, QuestionSentiment) for e in events) == 1
+    stop = next(e for e in events if isinstance(e, BudgetExceeded))
+    results = events[-1].results
+    assert isinstance(events[-1], SimulationComplete) and stop.questions_answered == 1
+    assert results["stopped_early"]["questions_skipped"] == 2 and len(results["question_details"]) == 1
+    assert "Stopped early" in results["report"]
+    assert set(results["usage"]["by_kind"]) == {"agent"}
+
+    print("SUCCESS: Usage accounting verified.")
+
+if __name__ == "__main__":
+    test_usage()
@@ -0,0 +1,265 @@
+"""
+Hierarchical tracing spans.
+
+`trace(name, **attributes)` opens a trace's root span (e.g. one simulation run), and
+`span(name, **attributes)` times a block nested under the span that is current in the
+calling context (contextvars, so nesting follows asyncio tasks and asyncio.to_thread).
+Spans outside any trace (a standalone LLM call, a tool used on its own) are not
+recorded. When a root span ends, the whole trace is written to
+`traces/<trace_id>.json` in the OpenTelemetry (OTLP) JSON layout; only the newest
+TRACE_MAX_FILES traces are kept.
+
+    python tracing.py traces/<trace_id>.json
+
+prints the span tree, the critical path and the self time per span name.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+TRACING_ENABLED = os.getenv("TRACING", "1") != "0"
+TRACE_MAX_FILES = int(os.getenv("TRACE_MAX_FILES", "200"))
+
+_current_span = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class TraceExporter:
+    """Collects finished spans per trace and writes each trace when its root span ends."""
+
+    def __init__(self, directory=TRACE_DIR, max_files=TRACE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def finish(self, span):
+        with self._lock:
+            spans = self._spans.setdefault(span.trace_id, [])
+            spans.append(span.to_otlp())
+            if span.parent_span_id is not None:
+                return
+            del self._spans[span.trace_id]
+        self._write(span.trace_id, spans)
+
+    def _write(self, trace_id, spans):
+        os.makedirs(self.directory, exist_ok=True)
+        document = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "crowdsim-ai"}}]},
+            "scopeSpans": [{"scope": {"name": "crowdsim.tracing"}, "spans": spans}],
+        }]}
+        path = os.path.join(self.directory, f"{trace_id}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(document, f)
+        os.replace(path + ".tmp", path)
+        self._prune()
+
+    def _prune(self):
+        """Deletes the oldest trace files beyond `max_files`."""
+        try:
+            files = [e for e in os.scandir(self.directory) if e.name.endswith(".json")]
+        except OSError:
+            return
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=lambda e: e.stat().st_mtime)
+        for entry in files[:len(files) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass   # removed by another process meanwhile
+
+
+_exporter = TraceExporter()
+
+
+def current_span():
+    return _current_span.get()
+
+
+@contextlib.contextmanager
+def trace(name, **attributes):
+    """Times the block as the root of a new trace (or as a child span if one is already open)."""
+    with _span(name, attributes, root=True) as current:
+        yield current
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    """Times the block as a child of the current span; yields None outside a trace."""
+    with _span(name, attributes, root=False) as current:
+        yield current
+
+
+@contextlib.contextmanager
+def _span(name, attributes, root):
+    parent = _current_span.get()
+    if not TRACING_ENABLED or (parent is None and not root):
+        yield None
+        return
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Ended in another context (e.g. an async generator closed elsewhere)
+            _current_span.set(parent)
+        _exporter.finish(current)
+
+
+def load_trace(path):
+    """Spans of an OTLP JSON trace file as dicts with start/end in seconds."""
+    with open(path, "r", encoding="utf-8") as f:
+        document = json.load(f)
+    spans = []
+    for resource in document["resourceSpans"]:
+        for scope in resource["scopeSpans"]:
+            for s in scope["spans"]:
+                spans.append({
+                    "id": s["spanId"], "parent": s.get("parentSpanId"), "name": s["name"],
+                    "start": int(s["startTimeUnixNano"]) / 1e9, "end": int(s["endTimeUnixNano"]) / 1e9,
+                    "attributes": {a["key"]: next(iter(a["value"].values())) for a in s.get("attributes", [])},
+                })
+    return spans
+
+
+def _children(spans):
+    children = {}
+    for s in spans:
+        children.setdefault(s["parent"], []).append(s)
+    for group in children.values():
+        group.sort(key=lambda s: s["start"])
+    return children
+
+
+def self_times(spans):
+    """Seconds per span name not covered by any child span (overlapping children count once)."""
+    children = _children(spans)
+    totals = {}
+    for s in spans:
+        covered, cursor = 0.0, s["start"]
+        for child in children.get(s["id"], []):
+            start, end = max(child["start"], cursor), min(child["end"], s["end"])
+            if end > start:
+                covered += end - start
+                cursor = end
+        totals[s["name"]] = totals.get(s["name"], 0.0) + (s["end"] - s["start"]) - covered
+    return totals
+
+
+def critical_path(spans):
+    """
+    The chain of spans that determined the trace's duration, as (depth, span) pairs.
+    Under each span, walks back from its end through the child that finished last,
+    then the child that finished last before that one started, and so on.
+    """
+    children = _children(spans)
+
+    def walk(s, depth):
+        chain, cursor = [], s["end"]
+        while True:
+            candidates = [c for c in children.get(s["id"], []) if c["end"] <= cursor + 1e-6 and c not in chain]
+            if not candidates:
+                break
+            chain.append(max(candidates, key=lambda c: c["end"]))
+            cursor = chain[-1]["start"]
+        path = [(depth, s)]
+        for child in reversed(chain):
+            path += walk(child, depth + 1)
+        return path
+
+    root = next((s for s in spans if s["parent"] is None), None)
+    return walk(root, 0) if root else []
+
+
+def _label(s):
+    detail = ", ".join(f"{k}={v}" for k, v in s["attributes"].items() if k in ("agent", "question", "kind", "tool"))
+    return f"{s['name']}" + (f" [{detail}]" if detail else "")
+
+
+def print_summary(path, max_depth=4):
+    spans = load_trace(path)
+    children = _children(spans)
+    root = next(s for s in spans if s["parent"] is None)
+    print(f"Trace {os.path.basename(path)}: {len(spans)} spans, {root['end'] - root['start']:.3f}s")
+
+    print("\nSpan tree:")
+    def show(s, depth):
+        print(f"{'  ' * depth}{s['end'] - s['start']:8.3f}s  {_label(s)}")
+        if depth < max_depth:
+            for child in children.get(s["id"], []):
+                show(child, depth + 1)
+    show(root, 0)
+
+    print("\nCritical path:")
+    for depth, s in critical_path(spans):
+        print(f"{'  ' * depth}{s['end'] - s['start']:8.3f}s  {_label(s)}")
+
+    print("\nSelf time by span:")
+    for name, seconds in sorted(self_times(spans).items(), key=lambda item: -item[1]):
+        print(f"  {seconds:8.3f}s  {name}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python tracing.py <traces/trace_id.json | trace_id>")
+        sys.exit(1)
+    target = sys.argv[1]
+    if not os.path.exists(target):
+        target = os.path.join(TRACE_DIR, f"{target}.json")
+    print_summary(target)
@@ -0,0 +1,148 @@
+"""
+Token and cost accounting.
+
+Every call through llm_client.generate_content_with_retry reports its usage_metadata
+to the UsageTracker current in the calling context. A simulation run installs one
+with `track_usage(tracker)`, so concurrent runs (jobs, batch workers) keep separate
+totals. Usage is summed per model, call kind, agent and question and priced from
+LLM_PRICES (USD per million tokens). A tracker with a token or cost budget reports
+when it has been exceeded; the simulation checks this between questions and stops
+early with the results so far.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# USD per million tokens, matched on the longest model-name prefix. "cached" is the
+# rate for prompt tokens served from a Gemini context cache.
+DEFAULT_PRICES = {
+    "gemini-2.0-flash-lite": {"input": 0.075, "output": 0.30, "cached": 0.01875},
+    "gemini-2.0-flash": {"input": 0.10, "output": 0.40, "cached": 0.025},
+    "gemini-1.5-flash": {"input": 0.075, "output": 0.30, "cached": 0.01875},
+    "gemini-1.5-pro": {"input": 1.25, "output": 5.00, "cached": 0.3125},
+}
+
+# 0 = no budget
+TOKEN_BUDGET = int(os.getenv("RUN_TOKEN_BUDGET", "0"))
+COST_BUDGET = float(os.getenv("RUN_COST_BUDGET", "0"))
+
+_tracker = contextvars.ContextVar("usage_tracker", default=None)
+_question = contextvars.ContextVar("usage_question", default=None)
+
+
+def load_prices():
+    prices = dict(DEFAULT_PRICES)
+    overrides = os.getenv("LLM_PRICES")
+    if overrides:
+        try:
+            prices.update(json.loads(overrides))
+        except (json.JSONDecodeError, TypeError, ValueError):
+            print("WARNING: LLM_PRICES is not valid JSON, using the default prices.")
+    return prices
+
+
+def _empty():
+    return {"calls": 0, "cache_hits": 0, "prompt_tokens": 0, "output_tokens": 0,
+            "cached_tokens": 0, "total_tokens": 0, "cost_usd": 0.0}
+
+
+def _add(totals, entry):
+    for key, value in entry.items():
+        totals[key] += value
+
+
+class UsageTracker:
+    """Thread-safe usage totals for one run, with an optional token and/or cost budget."""
+
+    def __init__(self, token_budget=None, cost_budget=None, prices=None):
+        self.token_budget = TOKEN_BUDGET if token_budget is None else token_budget
+        self.cost_budget = COST_BUDGET if cost_budget is None else cost_budget
+        self.prices = prices if prices is not None else load_prices()
+        self._lock = threading.Lock()
+        self._total = _empty()
+        self._groups = {"model": {}, "kind": {}, "agent": {}, "question": {}}
+
+    def price(self, model):
+        matches = [prefix for prefix in self.prices if model.startswith(prefix)]
+        return self.prices[max(matches, key=len)] if matches else None
+
+    def record(self, model, kind, usage=None, agent=None, cache_hit=False):
+        """
+        Adds one call. `usage` is the response's usage_metadata (None for cache hits,
+        which cost nothing). Returns the call's entry.
+        """
+        prompt = getattr(usage, "prompt_token_count", 0) or 0
+        output = getattr(usage, "candidates_token_count", 0) or 0
+        cached = getattr(usage, "cached_content_token_count", 0) or 0
+        total = getattr(usage, "total_token_count", 0) or prompt + output
+        rates = self.price(model) or {}
+        cost = ((prompt - cached) * rates.get("input", 0) + cached * rates.get("cached", rates.get("input", 0))
+                + output * rates.get("output", 0)) / 1_000_000
+        entry = {"calls": 1, "cache_hits": int(cache_hit), "prompt_tokens": prompt, "output_tokens": output,
+                 "cached_tokens": cached, "total_tokens": total, "cost_usd": cost}
+        question = _question.get()
+        keys = (("model", model), ("kind", kind), ("agent", agent or None),
+                ("question", None if question is None else str(question)))
+        with self._lock:
+            _add(self._total, entry)
+            for group, key in keys:
+                if key is not None:
+                    _add(self._groups[group].setdefault(key, _empty()), entry)
+        return entry
+
+    def total(self):
+        with self._lock:
+            return dict(self._total)
+
+    def exceeded(self):
+        """Why the budget has been exceeded (a message), or None."""
+        total = self.total()
+        if self.token_budget and total["total_tokens"] > self.token_budget:
+            return f"token budget exceeded ({total['total_tokens']} > {self.token_budget} tokens)"
+        if self.cost_budget and total["cost_usd"] > self.cost_budget:
+            return f"cost budget exceeded (${total['cost_usd']:.4f} > ${self.cost_budget:.4f})"
+        return None
+
+    def summary(self):
+        def rounded(totals):
+            return dict(totals, cost_usd=round(totals["cost_usd"], 6))
+
+        with self._lock:
+            return {
+                "total": rounded(self._total),
+                "budget": {"tokens": self.token_budget or None, "cost_usd": self.cost_budget or None},
+                **{f"by_{group}": {key: rounded(totals) for key, totals in entries.items()}
+                   for group, entries in self._groups.items()},
+            }
+
+
+def current_tracker():
+    return _tracker.get()
+
+
+@contextlib.contextmanager
+def _bind(var, value):
+    token = var.set(value)
+    try:
+        yield value
+    finally:
+        try:
+            var.reset(token)
+        except ValueError:
+            # Ended in another context (e.g. an async generator closed elsewhere)
+            var.set(None)
+
+
+def track_usage(tracker):
+    """Sends the usage of LLM calls made inside this block (and tasks/threads it starts) to `tracker`."""
+    return _bind(_tracker, tracker)
+
+
+def usage_question(index):
+    """Attributes LLM calls made inside this block to question `index`."""
+    return _bind(_question, index)